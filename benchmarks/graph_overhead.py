@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""Benchmark of dependency graph scheduling overhead.
+
+Runs graphs of no-op commands, so the measured time is almost entirely
+framework overhead: scheduling, parsing and output routing of every node.
+
+Usage:
+python benchmarks/graph_overhead.py [--nodes N] [--jobs N] [--pool thread|process]
+
+Requires the package to be installed (``pip install -e .``).
+"""
+
+import argparse
+import time
+
+from cli_builder import CLI
+
+
+def build_cli(nodes: int, width: int) -> CLI:
+    """Build a CLI with a layered graph of no-op commands.
+
+    Args:
+        nodes: Number of commands in the graph
+        width: Number of commands per layer
+
+    Returns:
+        CLI whose "target" command depends on every layer
+    """
+    cli = CLI(name="bench")
+
+    for index in range(nodes):
+        layer = index // width
+        depends_on = [f"n{i}" for i in range((layer - 1) * width, layer * width)] if layer else []
+
+        @cli.command(name=f"n{index}", depends_on=depends_on)
+        def node() -> int:
+            return 0
+
+    @cli.command(name="target", depends_on=[f"n{i}" for i in range(nodes - width, nodes)])
+    def target() -> int:
+        return 0
+
+    return cli.seal()
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--pool", choices=["thread", "process"], default="thread")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cli = build_cli(args.nodes, args.width)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        cli.run_graph("target", jobs=args.jobs, pool=args.pool)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    per_node = best / (args.nodes + 1) * 1e6
+    print(f"{args.nodes + 1} nodes, {args.pool} pool, {args.jobs} jobs")
+    print(f"best: {best * 1e3:.1f} ms total, {per_node:.1f} us per node")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
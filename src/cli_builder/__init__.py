@@ -1,7 +1,23 @@
 """CLI builder application module."""
 
+from .cancellation import CommandCancelled, check_cancelled, is_cancelled, on_cancel
+from .choices import Choices, DynamicChoices
 from .cli import CLI
 from .command import Command
 from .constants import CLIConstants, Constant, ConstantMeta
+from .timeouts import CommandTimeout
 
-__all__ = ["CLI", "Command", "CLIConstants", "Constant", "ConstantMeta"]
+__all__ = [
+    "CLI",
+    "Choices",
+    "Command",
+    "CLIConstants",
+    "Constant",
+    "ConstantMeta",
+    "DynamicChoices",
+    "CommandCancelled",
+    "CommandTimeout",
+    "check_cancelled",
+    "is_cancelled",
+    "on_cancel",
+]
@@ -0,0 +1,167 @@
+"""Repeated in-process execution of commands with latency statistics."""
+
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import attrs
+
+DEFAULT_ITERATIONS = 100
+DEFAULT_WARMUP = 3
+
+STATISTICS = ("min", "median", "p95", "p99", "max", "mean")
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Compute a percentile with linear interpolation.
+
+    Args:
+        values: Sorted sample values
+        fraction: Percentile as a fraction (0.95 for p95)
+
+    Returns:
+        Interpolated value
+    """
+    if not values:
+        return math.nan
+    position = (len(values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Compute latency statistics of samples.
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Mapping of ``STATISTICS`` names to seconds
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {name: math.nan for name in STATISTICS}
+    return {
+        "min": ordered[0],
+        "median": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+        "mean": sum(ordered) / len(ordered),
+    }
+
+
+@attrs.define(slots=True, kw_only=True)
+class BenchResult:
+    """Timings of a benchmark run."""
+
+    invocation: List[str] = attrs.field()
+    parse: List[float] = attrs.field(factory=list)
+    execute: List[float] = attrs.field(factory=list)
+    warmup: int = attrs.field(default=0)
+    elapsed: float = attrs.field(default=0.0)
+
+    @property
+    def iterations(self) -> int:
+        """Get the number of measured iterations.
+
+        Returns:
+            Iterations excluding warmup
+        """
+        return len(self.execute)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the result into JSON-compatible data.
+
+        Returns:
+            Statistics in seconds per phase and throughput
+        """
+        total = [p + e for p, e in zip(self.parse, self.execute)]
+        busy = sum(total)
+        return {
+            "invocation": list(self.invocation),
+            "iterations": self.iterations,
+            "warmup": self.warmup,
+            "elapsed": self.elapsed,
+            "ops_per_sec": self.iterations / busy if busy else math.inf,
+            "parse": summarize(self.parse),
+            "execute": summarize(self.execute),
+            "total": summarize(total),
+        }
+
+    def format(self) -> str:
+        """Format the result as a table.
+
+        Returns:
+            Multi-line report with milliseconds per phase
+        """
+        data = self.to_dict()
+        lines = [
+            f"{' '.join(self.invocation)}: {self.iterations} iterations "
+            f"({self.warmup} warmup), {data['ops_per_sec']:.1f} ops/sec",
+            f"{'phase':<8}" + "".join(f"{name:>11}" for name in STATISTICS),
+        ]
+        for phase in ("parse", "execute", "total"):
+            values = "".join(f"{data[phase][name] * 1000:>9.3f}ms" for name in STATISTICS)
+            lines.append(f"{phase:<8}{values}")
+        return "\n".join(lines)
+
+
+def run_benchmark(
+    invocation: List[str],
+    parse: Callable[[], Any],
+    execute: Callable[[Any], int],
+    iterations: Optional[int] = None,
+    duration: Optional[float] = None,
+    warmup: int = DEFAULT_WARMUP,
+) -> BenchResult:
+    """Run an invocation repeatedly, timing parsing and execution apart.
+
+    Runs ``iterations`` times or until ``duration`` seconds passed,
+    whichever comes first (``DEFAULT_ITERATIONS`` if neither is given),
+    after ``warmup`` untimed runs.
+
+    Args:
+        invocation: Command line arguments, for the report
+        parse: Function parsing the invocation (None result means failure)
+        execute: Function executing a parsed invocation, returning an exit code
+        iterations: Number of measured runs
+        duration: Time budget for measured runs in seconds
+        warmup: Number of runs before measuring
+
+    Returns:
+        Collected timings
+
+    Raises:
+        RuntimeError: If parsing or execution fails
+    """
+    if iterations is None and duration is None:
+        iterations = DEFAULT_ITERATIONS
+
+    def once(result: Optional[BenchResult]) -> None:
+        start = time.perf_counter()
+        parsed = parse()
+        parsed_at = time.perf_counter()
+        if parsed is None:
+            raise RuntimeError(f"invalid invocation: {' '.join(invocation)}")
+        code = execute(parsed)
+        done = time.perf_counter()
+        if code != 0:
+            raise RuntimeError(f"'{' '.join(invocation)}' failed with exit code {code}")
+        if result is not None:
+            result.parse.append(parsed_at - start)
+            result.execute.append(done - parsed_at)
+
+    for _ in range(warmup):
+        once(None)
+
+    result = BenchResult(invocation=invocation, warmup=warmup)
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else math.inf
+    while iterations is None or result.iterations < iterations:
+        once(result)
+        if time.perf_counter() >= deadline:
+            break
+    result.elapsed = time.perf_counter() - start
+    return result
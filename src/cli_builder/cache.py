@@ -0,0 +1,201 @@
+"""On-disk memoization of command results."""
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import attrs
+
+from .storage import atomic_write, file_lock
+
+
+@attrs.define(frozen=True, slots=True, kw_only=True)
+class CachePolicy:
+    """Caching settings of a command."""
+
+    ttl: Optional[float] = attrs.field(default=None)
+    max_entries: int = attrs.field(default=256)
+    max_bytes: int = attrs.field(default=64 * 1024 * 1024)
+
+
+@attrs.define(frozen=True, slots=True, kw_only=True)
+class CacheEntry:
+    """Cached command result."""
+
+    result: Any = attrs.field()
+    stdout: str = attrs.field(default="")
+    created: float = attrs.field(factory=time.time)
+
+
+def _normalize(value: Any) -> Any:
+    """Convert a parsed argument value into a stable JSON-compatible form.
+
+    Args:
+        value: Parsed argument value
+
+    Returns:
+        Normalized value
+    """
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items(), key=lambda i: str(i[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return repr(value)
+
+
+def invocation_key(command_name: str, kwargs: Dict[str, Any]) -> str:
+    """Build a stable key identifying a command invocation.
+
+    Args:
+        command_name: Command name
+        kwargs: Parsed command arguments
+
+    Returns:
+        Hex digest of the command name and normalized arguments
+    """
+    payload = json.dumps([command_name, _normalize(kwargs)], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Directory of cached command results with LRU eviction.
+
+    Every entry is a separate pickle file written atomically, so several
+    processes can share the directory. The modification time of an entry
+    file is its last access time; eviction removes the least recently used
+    entries under an exclusive lock.
+    """
+
+    SUFFIX = ".pkl"
+
+    def __init__(self, directory: str):
+        """Initialize cache.
+
+        Args:
+            directory: Cache directory
+        """
+        self.directory = directory
+
+    @staticmethod
+    def make_key(command_name: str, kwargs: Dict[str, Any]) -> str:
+        """Build a cache key from a command invocation.
+
+        Args:
+            command_name: Command name
+            kwargs: Parsed command arguments
+
+        Returns:
+            Hex digest identifying the invocation
+        """
+        return invocation_key(command_name, kwargs)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[CacheEntry]:
+        """Get a cached entry.
+
+        Args:
+            key: Cache key
+            ttl: Maximum entry age in seconds (None for no limit)
+
+        Returns:
+            Cached entry or None on a miss (also for an unreadable entry,
+            which is deleted)
+        """
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as handle:
+                entry = pickle.load(handle)
+        except OSError:
+            return None
+        except Exception:
+            # Truncated, corrupt or written by incompatible code
+            entry = None
+        if not isinstance(entry, CacheEntry):
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+            return None
+
+        if ttl is not None and time.time() - entry.created > ttl:
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+            return None
+
+        # Mark as recently used
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry, policy: CachePolicy) -> bool:
+        """Store an entry and evict old entries beyond the policy limits.
+
+        Args:
+            key: Cache key
+            entry: Entry to store
+            policy: Size limits to enforce
+
+        Returns:
+            True if the entry was stored
+        """
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        if len(data) > policy.max_bytes:
+            return False
+
+        atomic_write(self.__path(key), data)
+        self.evict(policy)
+        return True
+
+    def __entries(self) -> List[Tuple[int, int, str]]:
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self, policy: CachePolicy) -> None:
+        """Remove least recently used entries exceeding the policy limits.
+
+        Args:
+            policy: Size limits to enforce
+        """
+        with file_lock(os.path.join(self.directory, ".lock")):
+            kept = 0
+            total = 0
+            for _, size, path in sorted(self.__entries(), reverse=True):
+                if kept < policy.max_entries and total + size <= policy.max_bytes:
+                    kept += 1
+                    total += size
+                    continue
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with file_lock(os.path.join(self.directory, ".lock")):
+            for _, _, path in self.__entries():
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
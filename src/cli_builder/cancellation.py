@@ -0,0 +1,193 @@
+"""Cooperative cancellation of running commands."""
+
+import contextlib
+import ctypes
+import threading
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Type
+
+
+class CommandCancelled(BaseException):
+    """Raised inside a command whose invocation was cancelled.
+
+    Derives from ``BaseException`` (like ``asyncio.CancelledError``) so
+    broad ``except Exception`` blocks in commands do not swallow it.
+    """
+
+
+class CancelToken:
+    """Cancellation flag shared between a running command and its controller."""
+
+    __slots__ = ("_event", "_callbacks", "_lock")
+
+    def __init__(self) -> None:
+        """Initialize token."""
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """Check whether cancellation was requested.
+
+        Returns:
+            True if the invocation should stop
+        """
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Request cancellation and run the registered callbacks once."""
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            # Cancellation must not fail because of a cleanup hook
+            with contextlib.suppress(Exception):
+                callback()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Register a function called when cancellation is requested.
+
+        The function is called at once if the token is already cancelled.
+
+        Args:
+            callback: Function without arguments
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        with contextlib.suppress(Exception):
+            callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        """Unregister a function added with ``add_callback``.
+
+        Args:
+            callback: Registered function (ignored if not registered)
+        """
+        with self._lock:
+            with contextlib.suppress(ValueError):
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep until cancellation is requested or the timeout expires.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            True if cancellation was requested
+        """
+        return self._event.wait(timeout)
+
+
+_token_var: "ContextVar[Optional[CancelToken]]" = ContextVar("cli_builder_cancel", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    """Get the cancellation token of the running invocation.
+
+    Returns:
+        Token or None outside cancellable invocations
+    """
+    return _token_var.get()
+
+
+def is_cancelled() -> bool:
+    """Check whether the running invocation was cancelled.
+
+    Returns:
+        True if the invocation should stop
+    """
+    token = _token_var.get()
+    return token is not None and token.cancelled
+
+
+def check_cancelled() -> None:
+    """Stop the running invocation if it was cancelled.
+
+    Long-running commands call this periodically to react promptly.
+
+    Raises:
+        CommandCancelled: If cancellation was requested
+    """
+    if is_cancelled():
+        raise CommandCancelled()
+
+
+def on_cancel(callback: Callable[[], None]) -> bool:
+    """Register a cleanup hook of the running invocation.
+
+    The hook runs as soon as the invocation is cancelled or times out,
+    from the thread requesting cancellation, so it can release resources
+    a blocked command is waiting on (close a socket, kill a subprocess).
+
+    Args:
+        callback: Function without arguments
+
+    Returns:
+        True if registered, False outside cancellable invocations
+    """
+    token = _token_var.get()
+    if token is None:
+        return False
+    token.add_callback(callback)
+    return True
+
+
+def bind_token(token: CancelToken):
+    """Bind a token to the current context.
+
+    Args:
+        token: Token of the invocation
+
+    Returns:
+        Context variable reset token
+    """
+    return _token_var.set(token)
+
+
+def unbind_token(reset_token) -> None:
+    """Restore the token bound before ``bind_token``.
+
+    Args:
+        reset_token: Value returned by ``bind_token``
+    """
+    _token_var.reset(reset_token)
+
+
+def raise_in_thread(
+    thread: threading.Thread, exc_type: Type[BaseException] = CommandCancelled
+) -> bool:
+    """Asynchronously raise an exception in another thread.
+
+    The exception is delivered when the thread next executes Python
+    bytecode, so threads blocked in C calls react once the call returns.
+
+    Args:
+        thread: Target thread
+        exc_type: Exception class to raise
+
+    Returns:
+        True if the exception was scheduled
+    """
+    if thread.ident is None or not thread.is_alive():
+        return False
+
+    set_async_exc = ctypes.pythonapi.PyThreadState_SetAsyncExc
+    modified = set_async_exc(ctypes.c_ulong(thread.ident), ctypes.py_object(exc_type))
+    if modified > 1:  # pragma: no cover - undo on inconsistent state
+        set_async_exc(ctypes.c_ulong(thread.ident), None)
+        return False
+    return modified == 1
+
+
+def withdraw_exception(thread: threading.Thread) -> None:
+    """Cancel an exception scheduled with ``raise_in_thread`` not delivered yet.
+
+    Args:
+        thread: Target thread
+    """
+    if thread.ident is not None:
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread.ident), None)
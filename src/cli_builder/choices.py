@@ -0,0 +1,427 @@
+"""Allowed values of arguments and options."""
+
+import argparse
+import bisect
+import collections.abc
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from .log import get_logger
+from .storage import atomic_write
+
+_logger = get_logger("choices")
+
+# Choices shown in usage and help before the list is summarized
+MAX_DISPLAYED_CHOICES = 10
+
+# Seconds values of dynamic choices are reused before the provider runs again
+DEFAULT_CHOICES_TTL = 300.0
+
+# Candidates named in an ambiguous prefix error
+MAX_AMBIGUOUS_SHOWN = 5
+
+
+class Choices:
+    """Allowed values with constant-time membership checks.
+
+    argparse validates a value with ``value in choices`` and lists every
+    choice in usage and help. Values are kept in a frozenset for
+    validation and in a tuple for display, which is summarized beyond
+    ``max_displayed`` values. With ``case_sensitive=False`` or
+    ``prefix=True``, input is mapped to the canonical value first, so
+    commands always receive one of ``values``.
+
+    Example:
+        @cli.option("region", choices=Choices(regions, case_sensitive=False, prefix=True))
+    """
+
+    __slots__ = (
+        "values",
+        "case_sensitive",
+        "prefix",
+        "max_displayed",
+        "__members",
+        "__keys",
+        "__sorted_keys",
+    )
+
+    def __init__(
+        self,
+        values: Iterable[Any],
+        *,
+        case_sensitive: bool = True,
+        prefix: bool = False,
+        max_displayed: int = MAX_DISPLAYED_CHOICES,
+    ):
+        """Initialize choices.
+
+        Args:
+            values: Allowed values in display order (duplicates are dropped)
+            case_sensitive: Whether text must match the case of a value
+            prefix: Accept an unambiguous prefix of a value
+            max_displayed: Number of values shown in usage and help
+        """
+        self.values = tuple(dict.fromkeys(values))
+        self.case_sensitive = case_sensitive
+        self.prefix = prefix
+        self.max_displayed = max_displayed
+        self.__members = frozenset(self.values)
+        self.__keys: Dict[str, Any] = {}
+        if self.normalizes:
+            for value in self.values:
+                self.__keys.setdefault(self.__key(value), value)
+        self.__sorted_keys: List[str] = sorted(self.__keys) if prefix else []
+
+    @classmethod
+    def of(cls, choices: Any) -> Union["Choices", "DynamicChoices"]:
+        """Normalize allowed values.
+
+        Args:
+            choices: ``Choices`` or ``DynamicChoices`` instance, provider
+                function or iterable of values (including an ``Enum`` class)
+
+        Returns:
+            ``choices`` itself if already normalized, dynamic choices for a
+            provider function, else new exact choices
+        """
+        if isinstance(choices, (cls, DynamicChoices)):
+            return choices
+        # Enum classes and other iterable types are callable too
+        if callable(choices) and not isinstance(choices, (type, collections.abc.Iterable)):
+            return DynamicChoices(choices)
+        return cls(choices)
+
+    @property
+    def normalizes(self) -> bool:
+        """Check whether input is mapped to values before validation.
+
+        Returns:
+            True for case-insensitive or prefix matching
+        """
+        return not self.case_sensitive or self.prefix
+
+    def __key(self, value: Any) -> str:
+        text = str(value)
+        return text if self.case_sensitive else text.casefold()
+
+    def __contains__(self, value: Any) -> bool:
+        try:
+            return value in self.__members
+        except TypeError:
+            return False
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return (
+            f"Choices({len(self.values)} values, case_sensitive={self.case_sensitive}, "
+            f"prefix={self.prefix})"
+        )
+
+    def resolve(self, value: Any) -> Any:
+        """Map input to the value it selects.
+
+        Args:
+            value: Converted input
+
+        Returns:
+            Matching value, or the input unchanged if nothing matches
+
+        Raises:
+            argparse.ArgumentTypeError: If the input is a prefix of
+                several values
+        """
+        if value in self.__members or not self.normalizes:
+            return value
+        key = self.__key(value)
+        if key in self.__keys:
+            return self.__keys[key]
+        if not self.prefix:
+            return value
+        start = bisect.bisect_left(self.__sorted_keys, key)
+        matches = []
+        for candidate in self.__sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            matches.append(self.__keys[candidate])
+            if len(matches) > MAX_AMBIGUOUS_SHOWN:
+                break
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            shown = ", ".join(repr(match) for match in matches[:MAX_AMBIGUOUS_SHOWN])
+            more = ", ..." if len(matches) > MAX_AMBIGUOUS_SHOWN else ""
+            raise argparse.ArgumentTypeError(
+                f"ambiguous choice: {value!r} could match {shown}{more}"
+            )
+        return value
+
+    def converter(self, convert: Optional[Callable[[str], Any]] = None) -> Callable[[str], Any]:
+        """Wrap an argparse ``type`` function to resolve its result.
+
+        Args:
+            convert: Original type function
+
+        Returns:
+            Type function returning resolved values
+        """
+
+        def resolve(text: str) -> Any:
+            return self.resolve(convert(text) if convert is not None else text)
+
+        resolve.__name__ = getattr(convert, "__name__", "value")
+        return resolve
+
+    @property
+    def is_long(self) -> bool:
+        """Check whether the values are too many to display.
+
+        Returns:
+            True if there are more than ``max_displayed`` values
+        """
+        return len(self.values) > self.max_displayed
+
+    def summary(self) -> str:
+        """Describe the values for help text.
+
+        Returns:
+            The first ``max_displayed`` values and the number of others
+        """
+        shown = ", ".join(str(value) for value in self.values[: self.max_displayed])
+        hidden = len(self.values) - self.max_displayed
+        return f"{shown}, ... ({hidden} more)" if hidden > 0 else shown
+
+
+class DynamicChoices:
+    """Choices computed by a provider function when first needed.
+
+    The provider runs on the first validation, completion or help output
+    that needs the values, not when the CLI is set up. Its result is
+    reused for ``ttl`` seconds (forever if None), also across processes
+    when a cache file is used. In ``background`` mode, set by
+    ``CLI.enable_background_choices`` and the interactive shell, expired
+    values keep being served while a thread calls the provider, so
+    validation only waits for a provider that has never produced values.
+
+    Example:
+        @cli.option("host", choices=DynamicChoices(fetch_hosts, ttl=600, persist=True))
+    """
+
+    def __init__(
+        self,
+        provider: Callable[[], Iterable[Any]],
+        *,
+        ttl: Optional[float] = DEFAULT_CHOICES_TTL,
+        persist: bool = False,
+        cache_path: Optional[str] = None,
+        case_sensitive: bool = True,
+        prefix: bool = False,
+        max_displayed: int = MAX_DISPLAYED_CHOICES,
+    ):
+        """Initialize choices.
+
+        Args:
+            provider: Function returning the allowed values
+            ttl: Seconds before values are fetched again (None: never)
+            persist: Cache values on disk; the CLI picks a file in its state
+                directory unless ``cache_path`` is given
+            cache_path: JSON file caching the values (implies ``persist``)
+            case_sensitive: Whether text must match the case of a value
+            prefix: Accept an unambiguous prefix of a value
+            max_displayed: Number of values shown in help
+        """
+        self.provider = provider
+        self.ttl = ttl
+        self.persist = persist or cache_path is not None
+        self.cache_path = cache_path
+        self.case_sensitive = case_sensitive
+        self.prefix = prefix
+        self.max_displayed = max_displayed
+        self.background = False
+        self.__lock = threading.Lock()
+        self.__snapshot: Optional[Choices] = None
+        self.__fetched_at = 0.0
+        self.__refreshing = False
+
+    @property
+    def normalizes(self) -> bool:
+        """Check whether input is mapped to values before validation.
+
+        Returns:
+            True for case-insensitive or prefix matching
+        """
+        return not self.case_sensitive or self.prefix
+
+    def __expired(self) -> bool:
+        return self.ttl is not None and time.time() - self.__fetched_at >= self.ttl
+
+    def __store(self, values: List[Any], fetched_at: float) -> None:
+        self.__snapshot = Choices(
+            values,
+            case_sensitive=self.case_sensitive,
+            prefix=self.prefix,
+            max_displayed=self.max_displayed,
+        )
+        self.__fetched_at = fetched_at
+
+    def __load(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as handle:
+                data = json.load(handle)
+            self.__store(list(data["values"]), float(data["fetched_at"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def __save(self, values: List[Any], fetched_at: float) -> None:
+        if not self.cache_path:
+            return
+        try:
+            data = json.dumps({"fetched_at": fetched_at, "values": values})
+            atomic_write(self.cache_path, data.encode("utf-8"))
+        except (OSError, TypeError, ValueError) as e:
+            _logger.debug("Could not cache choices in %s: %s", self.cache_path, e)
+
+    def current(self) -> Choices:
+        """Get the values, calling the provider if they are missing or expired.
+
+        Returns:
+            Current values
+
+        Raises:
+            Exception: Whatever the provider raises when no earlier values
+                are available
+        """
+        snapshot = self.__snapshot
+        if snapshot is not None and not self.__expired():
+            return snapshot
+        with self.__lock:
+            if self.__snapshot is None:
+                self.__load()
+            snapshot = self.__snapshot
+            if snapshot is not None and not self.__expired():
+                return snapshot
+            if snapshot is not None and self.background:
+                self.__start_refresh()
+                return snapshot
+            try:
+                values = list(self.provider())
+            except Exception:
+                if snapshot is None:
+                    raise
+                _logger.warning("Choices provider failed, using cached values", exc_info=True)
+                return snapshot
+            fetched_at = time.time()
+            self.__store(values, fetched_at)
+            result = self.__snapshot
+        self.__save(values, fetched_at)
+        return result
+
+    def refresh(self) -> None:
+        """Call the provider now and replace the values."""
+        values = list(self.provider())
+        fetched_at = time.time()
+        with self.__lock:
+            self.__store(values, fetched_at)
+        self.__save(values, fetched_at)
+
+    def prefetch(self) -> None:
+        """Load cached values and refresh them in the background if needed."""
+        with self.__lock:
+            if self.__snapshot is None:
+                self.__load()
+            if self.__snapshot is None or self.__expired():
+                self.__start_refresh()
+
+    def __start_refresh(self) -> None:
+        if self.__refreshing:
+            return
+        self.__refreshing = True
+        threading.Thread(
+            target=self.__refresh_in_background, name="choices-refresh", daemon=True
+        ).start()
+
+    def __refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            _logger.warning("Refreshing choices failed", exc_info=True)
+        finally:
+            with self.__lock:
+                self.__refreshing = False
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self.current()
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.current())
+
+    def __len__(self) -> int:
+        return len(self.current())
+
+    def __repr__(self) -> str:
+        return f"DynamicChoices({self.provider!r}, ttl={self.ttl})"
+
+    def resolve(self, value: Any) -> Any:
+        """Map input to the value it selects (see ``Choices.resolve``).
+
+        Args:
+            value: Converted input
+
+        Returns:
+            Matching value, or the input unchanged if nothing matches
+        """
+        return self.current().resolve(value)
+
+    def converter(self, convert: Optional[Callable[[str], Any]] = None) -> Callable[[str], Any]:
+        """Wrap an argparse ``type`` function to resolve its result.
+
+        Args:
+            convert: Original type function
+
+        Returns:
+            Type function returning resolved values
+        """
+
+        def resolve(text: str) -> Any:
+            return self.resolve(convert(text) if convert is not None else text)
+
+        resolve.__name__ = getattr(convert, "__name__", "value")
+        return resolve
+
+    def summary(self) -> str:
+        """Describe the values for help text.
+
+        Returns:
+            The first ``max_displayed`` values and the number of others
+        """
+        return self.current().summary()
+
+
+class ChoicesHelpFormatter(argparse.HelpFormatter):
+    """Help formatter expanding ``%(choices)s`` to a summary of ``Choices``.
+
+    argparse joins every choice into the help text; for ``Choices`` the
+    first values and a count are shown instead, and dynamic choices are
+    only evaluated when help is actually printed.
+    """
+
+    def _expand_help(self, action: argparse.Action) -> str:
+        choices = action.choices
+        if not isinstance(choices, (Choices, DynamicChoices)):
+            return super()._expand_help(action)
+        params = dict(vars(action), prog=self._prog)
+        for name in list(params):
+            if params[name] is argparse.SUPPRESS:
+                del params[name]
+            elif hasattr(params[name], "__name__"):
+                params[name] = params[name].__name__
+        params["choices"] = choices.summary()
+        return self._get_help_string(action) % params
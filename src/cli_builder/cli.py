@@ -1,16 +1,74 @@
 """Base CLI implementation."""
 
 import argparse
+import atexit
+import contextlib
+import functools
 import inspect
+import io
+import logging
 import os
 import platform
 import sys
-from typing import Any, Callable, Dict, List, Optional, Union, get_type_hints
+import threading
+import time
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    get_type_hints,
+)
 
 import attrs
 
+from .bench import DEFAULT_WARMUP, run_benchmark
+from .cache import CacheEntry, CachePolicy, ResultCache, invocation_key
+from .choices import Choices, DynamicChoices
 from .command import Command
 from .constants import CLIConstants
+from .formats import OUTPUT_FORMATS, dumps, has_output, render
+from .graph import OK, SKIPPED, CommandGraph
+from .incremental import IncrementalSpec, IncrementalState
+from .journal import Journal, journal_key
+from .limits import LIMIT_EXIT_CODE, LimitExceeded, ResourceLimits, apply_limits, parse_size
+from .log import BufferedStreamHandler, get_logger, install_handler, log_level, verbosity_level
+from .memtrace import MemoryTracker, trace_memory
+from .metrics import MetricsRegistry, MetricsServer, merge_into_file, write_textfile
+from .metrics import render as render_metrics
+from .output import (
+    BROKEN_PIPE_EXIT_CODE,
+    hold_open,
+    is_streamable,
+    on_exhausted,
+    silence_broken_pipe,
+    write_lines,
+)
+from .profiling import PROFILERS, run_profiled
+from .repl import Shell
+from .resources import ResourcePool, ResourceRegistry
+from .search import DEFAULT_LIMIT, SearchIndex, commands_key, load_index, save_index
+from .sinks import open_output_file
+from .storage import default_state_dir
+from .streams import TeeStream, current_stderr, current_stdout, redirect_output
+from .suggestions import SuggestingArgumentParser
+from .timeouts import TIMEOUT_EXIT_CODE, CommandTimeout, call_with_timeout, run_coroutine
+from .tracing import NullSpan, Span, Tracer
+from .watch import WatchLoop, format_changes
+from .workers import POOL_KINDS, WorkerPool
+
+_logger = get_logger("cli")
+
+# Global options applying to a whole pipeline, taken from its first stage
+PIPELINE_WIDE_OPTIONS = ("output", "output_file", "profile", "trace_memory", "verbose", "quiet")
+
+# Global options that cannot be combined with a pipeline
+NON_PIPELINE_OPTIONS = ("watch", "with_deps")
 
 
 @attrs.define(slots=True, frozen=True, kw_only=True)
@@ -22,12 +80,18 @@ class CLI:
     DEFAULT_COMMAND_DESCRIPTION = CLIConstants.DEFAULT_COMMAND_DESCRIPTION
     COMMAND_DEST = CLIConstants.COMMAND_DEST
     HELP_COMMAND_NAME = CLIConstants.HELP_COMMAND_NAME
+    SHELL_COMMAND_NAME = CLIConstants.SHELL_COMMAND_NAME
+    BENCH_COMMAND_NAME = CLIConstants.BENCH_COMMAND_NAME
+    PIPELINE_SEPARATOR = CLIConstants.PIPELINE_SEPARATOR
+    MAP_PLACEHOLDER = CLIConstants.MAP_PLACEHOLDER
+    GLOBAL_DEST_PREFIX = CLIConstants.GLOBAL_DEST_PREFIX
 
     # Public attributes
     name: str = attrs.field()
     description: str = attrs.field(default="")
     auto_generate_help: bool = attrs.field(default=False)
     version: str = attrs.field(default="0.1.0")
+    state_dir: Optional[str] = attrs.field(default=None)
 
     # Private attributes
     _CLI__commands: Dict[str, Command] = attrs.field(factory=dict, init=False)
@@ -37,9 +101,32 @@ class CLI:
     _CLI__temp_args: Dict[str, List[Dict[str, Any]]] = attrs.field(factory=dict, init=False)
     _CLI__temp_opts: Dict[str, List[Dict[str, Any]]] = attrs.field(factory=dict, init=False)
     _CLI__temp_cmd_names: Dict[str, str] = attrs.field(factory=dict, init=False)
+    _CLI__temp_settings: Dict[str, Dict[str, Any]] = attrs.field(factory=dict, init=False)
     _CLI__help_string: str = attrs.field(default="", init=False)
     _CLI__detailed_help_string: str = attrs.field(default="", init=False)
     _CLI__list_string: str = attrs.field(default="", init=False)
+    _CLI__lock: threading.RLock = attrs.field(
+        factory=threading.RLock, init=False, eq=False, repr=False
+    )
+    _CLI__sealed: bool = attrs.field(default=False, init=False)
+    _CLI__caches: Dict[str, ResultCache] = attrs.field(factory=dict, init=False)
+    _CLI__resources: ResourceRegistry = attrs.field(
+        factory=ResourceRegistry, init=False, eq=False, repr=False
+    )
+    _CLI__memory: MemoryTracker = attrs.field(
+        factory=MemoryTracker, init=False, eq=False, repr=False
+    )
+    _CLI__metrics: Optional[MetricsRegistry] = attrs.field(
+        default=None, init=False, eq=False, repr=False
+    )
+    _CLI__metrics_textfile: Optional[str] = attrs.field(default=None, init=False)
+    _CLI__search_index: Optional[Tuple[str, SearchIndex]] = attrs.field(
+        default=None, init=False, eq=False, repr=False
+    )
+    _CLI__tracer: Optional[Tracer] = attrs.field(default=None, init=False, eq=False, repr=False)
+    _CLI__log_handler: BufferedStreamHandler = attrs.field(
+        factory=install_handler, init=False, eq=False, repr=False
+    )
 
     def __attrs_post_init__(self):
         """Initialize CLI after attrs initialization."""
@@ -47,13 +134,308 @@ class CLI:
         object.__setattr__(
             self,
             "_CLI__parser",
-            argparse.ArgumentParser(prog=self.name, description=self.description),
+            SuggestingArgumentParser(prog=self.name, description=self.description),
         )
         object.__setattr__(
             self,
             "_CLI__subparsers",
-            self.__parser.add_subparsers(title="commands", dest=self.COMMAND_DEST, required=False),
+            self.__parser.add_subparsers(
+                title="commands",
+                dest=self.COMMAND_DEST,
+                metavar=self.COMMAND_DEST,
+                required=False,
+            ),
+        )
+        self.__add_global_options()
+
+    def __add_global_options(self) -> None:
+        """Add framework options accepted before the command name."""
+        group = self.__parser.add_argument_group("global options")
+        group.add_argument(
+            "--verbose",
+            "-v",
+            dest=f"{self.GLOBAL_DEST_PREFIX}verbose",
+            action="count",
+            default=0,
+            help="Log more details (-v for info, -vv for debug messages)",
+        )
+        group.add_argument(
+            "--quiet",
+            "-q",
+            dest=f"{self.GLOBAL_DEST_PREFIX}quiet",
+            action="count",
+            default=0,
+            help="Log less (-q for errors only, -qq for critical errors only)",
+        )
+        group.add_argument(
+            "--no-cache",
+            dest=f"{self.GLOBAL_DEST_PREFIX}no_cache",
+            action="store_true",
+            help="Bypass cached results of cached commands",
+        )
+        group.add_argument(
+            "--force",
+            dest=f"{self.GLOBAL_DEST_PREFIX}force",
+            action="store_true",
+            help="Run incremental commands even if their inputs are unchanged",
+        )
+        group.add_argument(
+            "--with-deps",
+            dest=f"{self.GLOBAL_DEST_PREFIX}with_deps",
+            action="store_true",
+            help="Run the commands the command depends on first",
+        )
+        group.add_argument(
+            "--jobs",
+            "-j",
+            dest=f"{self.GLOBAL_DEST_PREFIX}jobs",
+            type=int,
+            default=None,
+            metavar="N",
+            help="Maximum number of commands run in parallel",
+        )
+        group.add_argument(
+            "--pool",
+            dest=f"{self.GLOBAL_DEST_PREFIX}pool",
+            choices=POOL_KINDS,
+            default="thread",
+            help="Worker pool used for parallel execution (default: thread)",
         )
+        group.add_argument(
+            "--output",
+            dest=f"{self.GLOBAL_DEST_PREFIX}output",
+            choices=OUTPUT_FORMATS,
+            default="text",
+            help="Format of command results (default: text)",
+        )
+        group.add_argument(
+            "--output-file",
+            dest=f"{self.GLOBAL_DEST_PREFIX}output_file",
+            default=None,
+            metavar="PATH",
+            help="Write standard output to PATH, compressed by extension "
+            "(.gz, .bz2, .xz, .zst)",
+        )
+        group.add_argument(
+            "--watch",
+            dest=f"{self.GLOBAL_DEST_PREFIX}watch",
+            action="append",
+            default=None,
+            metavar="PATH",
+            help="Re-run the command when PATH changes (can be repeated)",
+        )
+        group.add_argument(
+            "--map",
+            dest=f"{self.GLOBAL_DEST_PREFIX}map",
+            action="store_true",
+            help="Run the command once per line of standard input, replacing {} "
+            "in its arguments (or appending the line) in parallel",
+        )
+        group.add_argument(
+            "--keep-order",
+            dest=f"{self.GLOBAL_DEST_PREFIX}keep_order",
+            action="store_true",
+            help="With --map, write output in input order",
+        )
+        group.add_argument(
+            "--resume",
+            dest=f"{self.GLOBAL_DEST_PREFIX}resume",
+            action="store_true",
+            help="With --map, skip items completed by a previous run of the same command",
+        )
+        group.add_argument(
+            "--timeout",
+            dest=f"{self.GLOBAL_DEST_PREFIX}timeout",
+            type=float,
+            default=None,
+            metavar="SECONDS",
+            help=f"Stop the command after SECONDS (exit code {TIMEOUT_EXIT_CODE})",
+        )
+        group.add_argument(
+            "--max-memory",
+            dest=f"{self.GLOBAL_DEST_PREFIX}max_memory",
+            type=parse_size,
+            default=None,
+            metavar="SIZE",
+            help="Memory the command may allocate, e.g. 512M "
+            f"(exit code {LIMIT_EXIT_CODE}; not enforced in thread pools)",
+        )
+        group.add_argument(
+            "--max-cpu-seconds",
+            dest=f"{self.GLOBAL_DEST_PREFIX}max_cpu_seconds",
+            type=float,
+            default=None,
+            metavar="SECONDS",
+            help=f"CPU time the command may use (exit code {LIMIT_EXIT_CODE}; "
+            "not enforced in thread pools)",
+        )
+        group.add_argument(
+            "--profile",
+            dest=f"{self.GLOBAL_DEST_PREFIX}profile",
+            nargs="?",
+            const="",
+            default=None,
+            metavar="FILE",
+            help="Profile the command and print the top functions; --profile=FILE also "
+            "writes the profile (pstats, or collapsed stacks with --profiler sampling)",
+        )
+        group.add_argument(
+            "--trace-memory",
+            dest=f"{self.GLOBAL_DEST_PREFIX}trace_memory",
+            action="store_true",
+            help="Report peak and retained memory of the command and its top "
+            "allocation sites",
+        )
+        group.add_argument(
+            "--profiler",
+            dest=f"{self.GLOBAL_DEST_PREFIX}profiler",
+            choices=PROFILERS,
+            default="cprofile",
+            help="Profiler used by --profile (default: cprofile)",
+        )
+
+    def enable_metrics(self, textfile: Optional[str] = None, persist: bool = True) -> None:
+        """Record invocation counts, failures and latencies per command.
+
+        Metrics are kept in memory while the process runs. With
+        ``persist`` they are added to the totals in the state directory
+        when the process exits (or on ``flush_metrics``), so counters
+        accumulate across runs; ``textfile`` then receives the totals in
+        Prometheus format for the node exporter textfile collector.
+        Invocations in process pool workers are not recorded.
+
+        Args:
+            textfile: Path of a ``*.prom`` file to write the totals to
+            persist: Accumulate metrics across runs in the state directory
+        """
+        with self.__lock:
+            if self.__metrics is None:
+                object.__setattr__(self, "_CLI__metrics", MetricsRegistry())
+                if persist:
+                    atexit.register(self.__flush_metrics_at_exit)
+            object.__setattr__(self, "_CLI__metrics_textfile", textfile)
+
+    def flush_metrics(self) -> None:
+        """Add metrics recorded since the last flush to the persisted totals."""
+        if self.__metrics is None:
+            return
+        deltas = self.__metrics.deltas()
+        if not deltas:
+            return
+        totals = merge_into_file(self.__state_path("metrics.json"), deltas)
+        if self.__metrics_textfile:
+            write_textfile(self.__metrics_textfile, render_metrics(self.name, totals))
+
+    def __flush_metrics_at_exit(self) -> None:
+        """Flush metrics when the interpreter exits, reporting failures."""
+        try:
+            self.flush_metrics()
+        except OSError as e:
+            print(f"Could not save metrics: {e}", file=sys.stderr)
+
+    def metrics_text(self) -> str:
+        """Render metrics recorded by this process in Prometheus format.
+
+        Returns:
+            Exposition text (empty if metrics are not enabled)
+        """
+        if self.__metrics is None:
+            return ""
+        return render_metrics(self.name, self.__metrics.snapshot())
+
+    def serve_metrics(self, port: int = 0, host: str = "127.0.0.1") -> MetricsServer:
+        """Serve metrics of this process over HTTP, e.g. in a long-running shell.
+
+        Enables in-memory metrics if needed.
+
+        Args:
+            port: Port to listen on (0 picks a free port)
+            host: Interface to listen on
+
+        Returns:
+            Running server (see ``MetricsServer.address`` and ``close``)
+        """
+        if self.__metrics is None:
+            self.enable_metrics(persist=False)
+        return MetricsServer(self.metrics_text, host=host, port=port)
+
+    def enable_tracing(self, path: Optional[str] = None) -> None:
+        """Record spans of invocations and write them as a trace when the process exits.
+
+        The parse and execute phases of every ``run`` are recorded
+        automatically; commands add their own spans with ``span``. The
+        trace uses the Chrome trace event format understood by Perfetto
+        and ``chrome://tracing``.
+
+        Args:
+            path: Trace file (default: ``trace.json`` in the state directory)
+        """
+        with self.__lock:
+            if self.__tracer is None:
+                atexit.register(self.__write_trace_at_exit)
+            tracer = Tracer(path or self.__state_path("trace.json"), process_name=self.name)
+            object.__setattr__(self, "_CLI__tracer", tracer)
+
+    def span(self, name: str, **attributes: Any) -> Union[Span, NullSpan]:
+        """Create a tracing span, as a context manager or a function decorator.
+
+        Example:
+            with cli.span("download", url=url) as span:
+                span.set_attribute("bytes", len(data))
+
+        Args:
+            name: Span name
+            **attributes: Attributes attached to the span
+
+        Returns:
+            Span, or a span doing nothing if tracing is not enabled (as a
+            decorator it still traces calls once tracing is enabled)
+        """
+        tracer = self.__tracer
+        if tracer is None:
+            return NullSpan(self.__current_tracer, name, attributes)
+        return tracer.span(name, **attributes)
+
+    def __current_tracer(self) -> Optional[Tracer]:
+        """Get the tracer of the CLI, if tracing is enabled."""
+        return self.__tracer
+
+    def write_trace(self) -> None:
+        """Write the spans recorded so far to the trace file."""
+        if self.__tracer is not None:
+            self.__tracer.write()
+
+    def __write_trace_at_exit(self) -> None:
+        """Write the trace when the interpreter exits, reporting failures."""
+        try:
+            self.write_trace()
+        except OSError as e:
+            print(f"Could not save trace: {e}", file=sys.stderr)
+
+    @property
+    def logger(self) -> logging.Logger:
+        """Get the logger of this CLI for use in commands.
+
+        Its level follows the global ``-v``/``-q`` options. Pass message
+        arguments separately (``cli.logger.debug("got %s", value)``) so
+        suppressed messages are never formatted.
+
+        Returns:
+            Logger named ``cli_builder.<name>``
+        """
+        return get_logger(self.name)
+
+    def __state_path(self, *parts: str) -> str:
+        """Build a path inside the CLI state directory.
+
+        Args:
+            *parts: Path components relative to the state directory
+
+        Returns:
+            Absolute path
+        """
+        base = self.state_dir or default_state_dir(self.name)
+        return os.path.join(base, *parts)
 
     @property
     def commands(self) -> Dict[str, Command]:
@@ -64,13 +446,55 @@ class CLI:
         """
         return dict(self.__commands)
 
+    @property
+    def sealed(self) -> bool:
+        """Check whether command registration is sealed.
+
+        Returns:
+            True if no more commands can be registered
+        """
+        return self.__sealed
+
+    def seal(self) -> "CLI":
+        """Build all command parsers and forbid further registration.
+
+        After sealing, ``run`` never mutates shared state and can be called
+        concurrently from multiple threads.
+
+        Returns:
+            Self for method chaining
+        """
+        with self.__lock:
+            for command in self.__commands.values():
+                command.freeze()
+                self.__setup_command_parser(command)
+            object.__setattr__(self, "_CLI__sealed", True)
+        return self
+
+    def __check_not_sealed(self, name: str) -> None:
+        """Raise if registration is sealed.
+
+        Args:
+            name: Name of the command being changed
+
+        Raises:
+            RuntimeError: If the CLI is sealed
+        """
+        if self.__sealed:
+            raise RuntimeError(f"Cannot modify command '{name}': CLI registration is sealed")
+
     def register_command(self, command: Command) -> None:
         """Register a command.
 
         Args:
             command: Command to register
+
+        Raises:
+            RuntimeError: If the CLI is sealed
         """
-        self.__commands[command.name] = command
+        self.__check_not_sealed(command.name)
+        with self.__lock:
+            self.__commands[command.name] = command
 
         # Update help string if auto_generate_help is enabled
         if self.auto_generate_help:
@@ -98,7 +522,14 @@ class CLI:
                 is_flag=True,
                 help="Show detailed help with arguments and options",
             )
-            def help_cmd(detailed=False) -> int:
+            @self.option(
+                "search",
+                short="s",
+                help="Find commands whose names or help texts match the given terms",
+            )
+            def help_cmd(detailed=False, search=None) -> int:
+                if search is not None:
+                    return self.__print_search_results(search)
                 if detailed:
                     print(self.__detailed_help_string)
                 else:
@@ -107,6 +538,56 @@ class CLI:
 
         return self
 
+    def search_commands(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, float]]:
+        """Find commands by their names, descriptions and argument and option help.
+
+        The index is built on the first search and saved in the state
+        directory, so later processes load it instead of rebuilding it
+        until a command or help text changes.
+
+        Args:
+            query: Search terms
+            limit: Maximum number of results
+
+        Returns:
+            Command names and BM25 scores, best match first
+        """
+        with self.__lock:
+            commands = list(self.__commands.values())
+            key = commands_key(commands)
+            cached = self.__search_index
+            # Options and arguments may be added after the first search
+            if cached is None or cached[0] != key:
+                path = self.__state_path("help-index.json")
+                index = load_index(path, key)
+                if index is None:
+                    index = SearchIndex.build(commands)
+                    try:
+                        save_index(path, key, index)
+                    except OSError:
+                        pass
+                cached = (key, index)
+                object.__setattr__(self, "_CLI__search_index", cached)
+        return cached[1].search(query, limit)
+
+    def __print_search_results(self, query: str) -> int:
+        """Print the commands matching a help search.
+
+        Args:
+            query: Search terms
+
+        Returns:
+            Exit code (1 if nothing matched)
+        """
+        results = self.search_commands(query)
+        if not results:
+            print(f"No commands match '{query}'", file=sys.stderr)
+            return 1
+        for name, _ in results:
+            description = self.__commands[name].description or self.DEFAULT_COMMAND_DESCRIPTION
+            print(f"  {name:<15} - {description}")
+        return 0
+
     def __update_help_string(self) -> None:
         """Update help strings with current commands."""
         if not self.auto_generate_help:
@@ -236,6 +717,62 @@ class CLI:
 
             return 0
 
+    def _generate_bench_command(self) -> None:
+        """Generate command benchmarking other commands if not already registered."""
+        if self.BENCH_COMMAND_NAME in self.__commands:
+            return
+
+        @self.command(
+            name=self.BENCH_COMMAND_NAME,
+            description="Run a command repeatedly and report its latency",
+        )
+        @self.option("iterations", short="n", type=int, help="Number of measured runs")
+        @self.option("duration", short="d", type=float, help="Time budget in seconds")
+        @self.option("warmup", short="w", type=int, default=DEFAULT_WARMUP, help="Untimed runs")
+        @self.option("json", is_flag=True, help="Print results as JSON")
+        @self.argument("invocation", nargs=argparse.REMAINDER, help="Command and its arguments")
+        def bench_cmd(
+            invocation: List[str],
+            iterations: Optional[int] = None,
+            duration: Optional[float] = None,
+            warmup: int = DEFAULT_WARMUP,
+            json: bool = False,
+        ) -> int:
+            if not invocation:
+                print("bench requires a command to run", file=sys.stderr)
+                return 1
+
+            def execute(parsed) -> int:
+                # Output of the benchmarked command is discarded
+                with redirect_output(stdout=TeeStream()):
+                    return self.__invoke(*parsed)
+
+            try:
+                result = run_benchmark(
+                    invocation,
+                    lambda: self.__parse(invocation),
+                    execute,
+                    iterations=iterations,
+                    duration=duration,
+                    warmup=warmup,
+                )
+            except RuntimeError as e:
+                print(str(e), file=sys.stderr)
+                return 1
+
+            print(dumps(result.to_dict()) if json else result.format())
+            return 0
+
+    def _generate_shell_command(self) -> None:
+        """Generate interactive shell command if not already registered."""
+        if self.SHELL_COMMAND_NAME in self.__commands:
+            return
+
+        @self.command(name=self.SHELL_COMMAND_NAME, description="Start an interactive shell")
+        def shell_cmd() -> int:
+            self.enable_background_choices()
+            return Shell(self).run()
+
     def __generate_bash_completion(self) -> str:
         """Generate bash completion script."""
         cmd_list = " ".join(sorted(self.__commands.keys()))
@@ -335,7 +872,13 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
         return completion_script
 
     def enable_standard_commands(
-        self, help: bool = True, version: bool = False, list: bool = False, completion: bool = False
+        self,
+        help: bool = True,
+        version: bool = False,
+        list: bool = False,
+        completion: bool = False,
+        shell: bool = False,
+        bench: bool = False,
     ) -> None:
         """Enable standard CLI commands.
 
@@ -344,6 +887,8 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
             version: Enable version command
             list: Enable list command
             completion: Enable shell completion command
+            shell: Enable interactive shell command
+            bench: Enable command benchmarking command
         """
         if help:
             self.generate_help()
@@ -357,20 +902,39 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
         if completion:
             self._generate_completion_command()
 
+        if shell:
+            self._generate_shell_command()
+
+        if bench:
+            self._generate_bench_command()
+
     def command(
         self,
         name: Optional[str] = None,
         description: str = "",
         arguments: Optional[List[Dict[str, Any]]] = None,
         options: Optional[List[Dict[str, Any]]] = None,
+        depends_on: Optional[List[str]] = None,
+        consumes: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_memory: Optional[int] = None,
+        max_cpu_seconds: Optional[float] = None,
     ) -> Callable:
         """Register a command using decorator.
 
+        Async (``async def``) command functions are run in a new event loop.
+
         Args:
             name: Command name (if None, function name will be used)
             description: Command description (if empty, function docstring will be used)
             arguments: List of argument definitions
             options: List of option definitions
+            depends_on: Names of commands that must succeed before this one
+            consumes: Parameter receiving the output of the previous pipeline stage
+            timeout: Wall-clock time limit in seconds (overridden by ``--timeout``)
+            max_memory: Memory the command may allocate, in bytes
+                (overridden by ``--max-memory``)
+            max_cpu_seconds: CPU time limit in seconds (overridden by ``--max-cpu-seconds``)
 
         Returns:
             Decorator function
@@ -387,7 +951,16 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
             # Create command first
             command = Command(
-                name=cmd_name, description=cmd_desc, arguments=[], options=[], func=func
+                name=cmd_name,
+                description=cmd_desc,
+                arguments=[],
+                options=[],
+                func=func,
+                depends_on=depends_on or (),
+                consumes=consumes,
+                timeout=timeout,
+                max_memory=max_memory,
+                max_cpu_seconds=max_cpu_seconds,
             )
 
             # Add stored arguments and options
@@ -403,6 +976,10 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
                     command.add_option(opt_data)
                 del self.__temp_opts[func.__name__]
 
+            # Apply settings stored by other decorators
+            for key, value in self.__temp_settings.pop(func.__name__, {}).items():
+                setattr(command, key, value)
+
             # Add additional arguments and options if provided
             if arguments:
                 for arg in arguments:
@@ -466,6 +1043,22 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
         return ""
 
+    def __is_injected(self, func: Callable, param_name: str) -> bool:
+        """Check whether a parameter is filled by the framework.
+
+        Args:
+            func: Command function
+            param_name: Parameter name
+
+        Returns:
+            True for resources and pipeline input parameters
+        """
+        if param_name in self.__resources:
+            return True
+        cmd_name = self.__temp_cmd_names.get(func.__name__, func.__name__)
+        command = self.__commands.get(cmd_name)
+        return command is not None and command.consumes == param_name
+
     def auto_arguments(self, func: Callable) -> Callable:
         """Automatically create arguments from function parameters without default values.
 
@@ -483,6 +1076,8 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
         # Process parameters without default values
         for name, param in sig.parameters.items():
+            if self.__is_injected(func, name):  # Not a CLI argument
+                continue
             if param.default is param.empty:  # No default value
                 # Get type from annotation
                 param_type = type_hints.get(name, str)
@@ -514,6 +1109,8 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
         # Process parameters with default values
         for name, param in sig.parameters.items():
+            if self.__is_injected(func, name):  # Not a CLI option
+                continue
             if param.default is not param.empty:  # Has default value
                 # Get type and value
                 param_type = type_hints.get(name, type(param.default))
@@ -561,13 +1158,124 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
         return decorator
 
+    def __configure(self, func: Callable, **settings: Any) -> None:
+        """Set command attributes from a decorator.
+
+        Settings are applied directly if the command is already registered,
+        otherwise they are stored until ``command`` registers it.
+
+        Args:
+            func: Command function
+            **settings: Command attribute values
+        """
+        cmd_name = self.__temp_cmd_names.get(func.__name__, func.__name__)
+
+        if cmd_name in self.__commands:
+            self.__check_not_sealed(cmd_name)
+            for key, value in settings.items():
+                setattr(self.__commands[cmd_name], key, value)
+        else:
+            self.__temp_settings.setdefault(func.__name__, {}).update(settings)
+
+    def resource(
+        self,
+        name: Optional[str] = None,
+        pool_size: int = 1,
+        teardown: Optional[Callable[[Any], None]] = None,
+    ) -> Callable:
+        """Register a shared resource factory.
+
+        Commands receive the resource through a parameter with the resource
+        name; such parameters are not exposed as CLI arguments or options.
+        The factory runs only when a command requesting the resource is
+        executed, and instances are pooled and reused by later invocations
+        in the same process (batch runs, the shell, embedded use). A
+        generator factory yields the instance and cleans up after ``yield``.
+        All instances are torn down at process exit.
+
+        Args:
+            name: Resource name (if None, function name will be used)
+            pool_size: Maximum number of instances used concurrently
+            teardown: Function releasing an instance
+
+        Returns:
+            Decorator function
+        """
+
+        def decorator(func: Callable) -> Callable:
+            res_name = name if name is not None else func.__name__
+            self.__resources.register(
+                ResourcePool(res_name, func, size=pool_size, teardown=teardown)
+            )
+            return func
+
+        return decorator
+
+    def close_resources(self) -> None:
+        """Tear down all created resource instances."""
+        self.__resources.close()
+
+    def cached(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> Callable:
+        """Memoize command results on disk.
+
+        The cache key is the command name plus the normalized parsed
+        arguments. A hit replays the captured standard output and returns
+        the stored result without calling the command. Only successful
+        invocations are cached; ``--no-cache`` bypasses the cache. Every
+        command has its own cache directory, so the limits only evict
+        entries of the decorated command.
+
+        Args:
+            ttl: Maximum entry age in seconds (None for no limit)
+            max_entries: Maximum number of entries kept for the command
+            max_bytes: Maximum total size of the command's entries in bytes
+
+        Returns:
+            Decorator function
+        """
+
+        def decorator(func: Callable) -> Callable:
+            policy = CachePolicy(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+            self.__configure(func, cache=policy)
+            return func
+
+        return decorator
+
+    def incremental(self, inputs: List[str], outputs: Optional[List[str]] = None) -> Callable:
+        """Skip the command when its input files are unchanged.
+
+        The named arguments/options hold paths of input files or
+        directories (and of outputs). A run is skipped if all outputs exist
+        and the inputs match the last successful run with the same
+        arguments; ``--force`` always runs the command.
+
+        Args:
+            inputs: Names of parameters holding input paths
+            outputs: Names of parameters holding output paths
+
+        Returns:
+            Decorator function
+        """
+
+        def decorator(func: Callable) -> Callable:
+            spec = IncrementalSpec(inputs=inputs, outputs=outputs or ())
+            self.__configure(func, incremental=spec)
+            return func
+
+        return decorator
+
     def argument(
         self,
         name: str,
         type: Any = str,
         help: str = "",
         nargs: Union[int, str, None] = None,
-        choices: Optional[List[Any]] = None,
+        choices: Optional[Iterable[Any]] = None,
         default: Any = None,
     ) -> Callable:
         """Add an argument to a command.
@@ -577,7 +1285,8 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
             type: Argument type
             help: Argument help text
             nargs: Argument nargs
-            choices: List of allowed choices
+            choices: Allowed values, a function providing them, or ``Choices``
+                or ``DynamicChoices`` for matching and caching settings
             default: Default value
 
         Returns:
@@ -600,12 +1309,13 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
                 "type": type,
                 "help": help,
                 "nargs": nargs,
-                "choices": choices,
+                "choices": self.__normalize_choices(choices, cmd_name, name),
                 "default": default,
             }
 
             # If command already exists, add argument directly
             if cmd_name in self.__commands:
+                self.__check_not_sealed(cmd_name)
                 self.__commands[cmd_name].add_argument(arg_data)
             else:
                 self.__temp_args[cmd_name].append(arg_data)
@@ -620,7 +1330,7 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
         short: Optional[str] = None,
         type: Any = str,
         help: str = "",
-        choices: Optional[List[Any]] = None,
+        choices: Optional[Iterable[Any]] = None,
         default: Any = None,
         required: bool = False,
         is_flag: bool = False,
@@ -632,7 +1342,8 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
             short: Short option name
             type: Option type
             help: Option help text
-            choices: List of allowed choices
+            choices: Allowed values, a function providing them, or ``Choices``
+                or ``DynamicChoices`` for matching and caching settings
             default: Default value
             required: Whether the option is required
             is_flag: Whether the option is a flag
@@ -659,11 +1370,12 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
                 opt_data["default"] = False
             else:
                 opt_data["type"] = type
-                opt_data["choices"] = choices
+                opt_data["choices"] = self.__normalize_choices(choices, cmd_name, name)
                 opt_data["default"] = default
 
             # If command already exists, add option directly
             if cmd_name in self.__commands:
+                self.__check_not_sealed(cmd_name)
                 self.__commands[cmd_name].add_option(opt_data)
             else:
                 self.__temp_opts[cmd_name].append(opt_data)
@@ -672,9 +1384,47 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
         return decorator
 
+    def __normalize_choices(
+        self, choices: Any, command_name: str, name: str
+    ) -> Union[Choices, DynamicChoices, None]:
+        """Convert the choices of an argument or option.
+
+        Args:
+            choices: Values, provider function or choices object (or None)
+            command_name: Name of the command
+            name: Name of the argument or option
+
+        Returns:
+            Choices object, or None without choices
+        """
+        if choices is None:
+            return None
+        choices = Choices.of(choices)
+        if isinstance(choices, DynamicChoices) and choices.persist and not choices.cache_path:
+            choices.cache_path = self.__state_path("choices", f"{command_name}.{name}.json")
+        return choices
+
+    def enable_background_choices(self) -> None:
+        """Keep dynamic choices fresh without blocking validation.
+
+        Meant for long-running processes such as the interactive shell,
+        which enables it: cached values are loaded now, refreshed in
+        background threads when they expire, and served meanwhile.
+        """
+        for command in self.__commands.values():
+            for item in list(command.arguments) + list(command.options):
+                choices = item.get("choices")
+                if isinstance(choices, DynamicChoices):
+                    choices.background = True
+                    choices.prefetch()
+
     def __setup_command_parser(self, command: Command) -> None:
         """Set up parser for a command.
 
+        Must be called with the lock held. The parser is only recorded once
+        complete, so a concurrent ``run`` never skips the lock to parse
+        with a half-built parser.
+
         Args:
             command: Command to setup parser for
         """
@@ -683,12 +1433,11 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
 
         if name not in self.__parsers:
             parser = self.__subparsers.add_parser(name, help=description)
-            self.__parsers[name] = parser
 
             # Add arguments
             for arg in command.arguments:
                 kwargs = {k: v for k, v in arg.items() if k not in ["name"] and v is not None}
-                parser.add_argument(arg["name"], **kwargs)
+                parser.add_argument(arg["name"], **self.__adapt_choices(kwargs, arg["name"]))
 
             # Add options
             for opt in command.options:
@@ -700,13 +1449,60 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
                 kwargs = {
                     k: v for k, v in opt.items() if k not in ["name", "short"] and v is not None
                 }
-                parser.add_argument(*names, **kwargs)
+                metavar = opt["name"].upper().replace("-", "_")
+                parser.add_argument(*names, **self.__adapt_choices(kwargs, metavar))
+
+            self.__parsers[name] = parser
+
+    @staticmethod
+    def __adapt_choices(kwargs: Dict[str, Any], metavar: str) -> Dict[str, Any]:
+        """Apply ``Choices`` matching and display settings to argparse arguments.
+
+        Args:
+            kwargs: ``add_argument`` keyword arguments
+            metavar: Name shown instead of a long list of choices
+
+        Returns:
+            Updated keyword arguments
+        """
+        choices = kwargs.get("choices")
+        if not isinstance(choices, (Choices, DynamicChoices)):
+            return kwargs
+        if choices.normalizes:
+            kwargs["type"] = choices.converter(kwargs.get("type"))
+        # Dynamic choices are only evaluated when help is printed
+        summarize = isinstance(choices, DynamicChoices) or choices.is_long
+        if summarize and "metavar" not in kwargs:
+            kwargs["metavar"] = metavar
+            kwargs["help"] = f"{kwargs.get('help') or ''} (choices: %(choices)s)".lstrip()
+        return kwargs
+
+    def __ensure_parsers(self) -> None:
+        """Set up parsers for commands registered since the last run."""
+        if self.__sealed or len(self.__parsers) == len(self.__commands):
+            return
+
+        with self.__lock:
+            for command in self.__commands.values():
+                self.__setup_command_parser(command)
 
-    def run(self, args: Optional[List[str]] = None) -> int:
+    def run(
+        self,
+        args: Optional[List[str]] = None,
+        *,
+        stdout: Optional[IO[str]] = None,
+        stderr: Optional[IO[str]] = None,
+    ) -> int:
         """Run CLI with arguments.
 
+        Output written by commands through ``print``/``sys.stdout`` is routed
+        per invocation, so concurrent calls from different threads never
+        interleave their output.
+
         Args:
             args: Command line arguments
+            stdout: Stream for standard output of this invocation
+            stderr: Stream for standard error of this invocation
 
         Returns:
             Exit code (0 on success)
@@ -714,38 +1510,811 @@ Register-ArgumentCompleter -Native -CommandName {self.name} -ScriptBlock {{
         if args is None:
             args = sys.argv[1:]
 
+        with redirect_output(stdout, stderr), self.span("run", args=" ".join(args)):
+            try:
+                return self.__run(args)
+            finally:
+                self.__log_handler.flush()
+
+    def __parse(
+        self, args: List[str], piped: bool = False
+    ) -> Optional[Tuple[Command, Dict[str, Any], Dict[str, Any]]]:
+        """Parse arguments of one invocation.
+
+        Errors and usage are printed to standard error.
+
+        Args:
+            args: Command line arguments
+            piped: Whether the command receives the output of a previous
+                pipeline stage
+
+        Returns:
+            Command, parsed command arguments and parsed global options,
+            or None if parsing failed
+        """
+        # Set up command parsers
+        self.__ensure_parsers()
+
+        # Parse arguments
         try:
-            # Set up command parsers
-            for command in self.__commands.values():
-                self.__setup_command_parser(command)
+            parsed_args = self.__parser.parse_args(args)
+        except SystemExit:
+            return None
+
+        # Get command
+        command_name = getattr(parsed_args, self.COMMAND_DEST)
+        if not command_name:
+            self.__parser.print_help()
+            return None
+
+        # Get command
+        if command_name not in self.__commands:
+            print(f"Unknown command: {command_name}", file=sys.stderr)
+            return None
+
+        command = self.__commands[command_name]
+        if command.consumes is not None and not piped:
+            print(
+                f"Command '{command_name}' needs piped input: "
+                f"run it after '{self.PIPELINE_SEPARATOR}' in a pipeline",
+                file=sys.stderr,
+            )
+            return None
+
+        # Convert namespace to dict and split off command and global options
+        kwargs = vars(parsed_args)
+        del kwargs[self.COMMAND_DEST]
+        options = {
+            key[len(self.GLOBAL_DEST_PREFIX) :]: kwargs.pop(key)
+            for key in list(kwargs)
+            if key.startswith(self.GLOBAL_DEST_PREFIX)
+        }
+        return command, kwargs, options
+
+    def __run(self, args: List[str]) -> int:
+        """Parse arguments and execute the selected command.
+
+        Args:
+            args: Command line arguments
 
-            # Parse arguments
+        Returns:
+            Exit code (0 on success)
+        """
+        groups, command_index = self.__scan_global_options(args)
+        args = [token for _, group in groups for token in group] + args[command_index:]
+        if any(dest == "map" for dest, _ in groups):
             try:
-                parsed_args = self.__parser.parse_args(args)
-            except SystemExit:
+                return self.__run_map_from_args(groups, args[command_index:])
+            except Exception as e:
+                print(str(e), file=sys.stderr)
                 return 1
 
-            # Get command
-            command_name = getattr(parsed_args, self.COMMAND_DEST)
-            if not command_name:
-                self.__parser.print_help()
-                return 1
+        if self.PIPELINE_SEPARATOR in args:
+            return self.run_pipeline(self.__split_pipeline(args))
 
-            # Get command
-            if command_name not in self.__commands:
-                print(f"Unknown command: {command_name}", file=sys.stderr)
+        try:
+            with self.span("parse"):
+                parsed = self.__parse(args)
+            if parsed is None:
                 return 1
+            command, kwargs, options = parsed
+
+            with log_level(self.__log_level(options)):
+                return self.__dispatch(command, kwargs, options)
+
+        except Exception as e:
+            print(str(e), file=sys.stderr)
+            return 1
+
+    @staticmethod
+    def __log_level(options: Dict[str, Any]) -> Optional[int]:
+        """Get the logging level requested with ``-v``/``-q``.
+
+        Args:
+            options: Parsed global options
+
+        Returns:
+            Logging level, or None if neither flag was given
+        """
+        if options["verbose"] or options["quiet"]:
+            return verbosity_level(options["verbose"], options["quiet"])
+        return None
+
+    def __dispatch(self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]) -> int:
+        """Execute a parsed invocation with its dependencies or in watch mode.
+
+        Args:
+            command: Command to execute
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Exit code (0 on success)
+        """
+        if options["with_deps"]:
+            code = self.run_graph(
+                command.name, jobs=options["jobs"], pool=options["pool"], include_target=False
+            )
+            if code != 0:
+                return code
+
+        if options["watch"]:
+            return self.__watch(command, kwargs, options)
+
+        # Execute command
+        _logger.debug("running %s with %s", command.name, kwargs)
+        with self.span("execute", command=command.name) as span:
+            start = time.perf_counter()
+            code = self.__invoke(command, kwargs, options)
+            span.set_attribute("exit_code", code)
+        elapsed = time.perf_counter() - start
+        _logger.debug("%s exited with code %d in %.3f s", command.name, code, elapsed)
+        if self.__metrics is not None:
+            self.__metrics.observe(command.name, elapsed, code != 0)
+        return code
+
+    def __scan_global_options(self, args: List[str]) -> Tuple[List[Tuple[str, List[str]]], int]:
+        """Group the global option tokens preceding the command name.
+
+        Args:
+            args: Command line arguments
+
+        Returns:
+            Pairs of option name (without prefix) and its tokens, and the
+            index of the command name
+        """
+        actions = self.__parser._option_string_actions
+        groups: List[Tuple[str, List[str]]] = []
+        index = 0
+        while index < len(args):
+            arg = args[index]
+            if not arg.startswith("-") or arg in ("-", "--"):
+                break
+            name = arg.split("=", 1)[0]
+            action = actions.get(name)
+            if action is None and not arg.startswith("--"):
+                # Short option with an attached value, e.g. -j4
+                action = actions.get(arg[:2])
+            count = 1
+            if action is not None and action.nargs is None and arg in actions:
+                count = 2
+            elif action is not None and action.nargs == "?" and arg in actions:
+                # Keep a bare option with an optional value (e.g. --profile)
+                # from taking the command name as its value
+                arg = f"{arg}="
+            dest = action.dest if action is not None else ""
+            if dest.startswith(self.GLOBAL_DEST_PREFIX):
+                dest = dest[len(self.GLOBAL_DEST_PREFIX) :]
+            groups.append((dest, [arg] + args[index + 1 : index + count]))
+            index += count
+        return groups, index
+
+    def __run_map_from_args(self, groups: List[Tuple[str, List[str]]], args: List[str]) -> int:
+        """Run ``--map`` over standard input.
+
+        Args:
+            groups: Global option tokens from ``__scan_global_options``
+            args: Command name and command arguments
 
-            command = self.__commands[command_name]
+        Returns:
+            Exit code (0 if every invocation succeeded)
+        """
+        tokens = [token for _, group in groups for token in group]
+        try:
+            parsed = self.__parser.parse_args(tokens)
+        except SystemExit:
+            return 1
+        options = {
+            key[len(self.GLOBAL_DEST_PREFIX) :]: value
+            for key, value in vars(parsed).items()
+            if key.startswith(self.GLOBAL_DEST_PREFIX)
+        }
+        if not args:
+            print("--map requires a command", file=sys.stderr)
+            return 1
+
+        # Options applying to the whole map are not repeated per invocation
+        batch_options = {"map", "keep_order", "resume", "jobs", "pool", "output_file"}
+        per_item = [token for dest, group in groups if dest not in batch_options for token in group]
+
+        execute = functools.partial(
+            self.run_map,
+            per_item + args,
+            sys.stdin,
+            jobs=options["jobs"],
+            pool=options["pool"],
+            keep_order=options["keep_order"],
+            resume=options["resume"],
+        )
+        if options["output_file"]:
+            return self.__to_output_file(options["output_file"], execute)
+        return execute()
+
+    def run_map(
+        self,
+        args: List[str],
+        items: Iterable[str],
+        jobs: Optional[int] = None,
+        pool: str = "thread",
+        keep_order: bool = False,
+        resume: bool = False,
+    ) -> int:
+        """Run an invocation once per input item in a worker pool.
+
+        Every ``{}`` in the arguments is replaced by the item; without a
+        placeholder the item is appended as the last argument. Items are
+        read lazily (blank lines are skipped) and only a bounded number of
+        invocations is in flight, so arbitrarily long inputs run in
+        constant memory. Output of every invocation is written as a whole
+        once it finishes.
+
+        Indices of successfully completed items are kept in a journal in the
+        state directory; with ``resume`` the items completed by the previous
+        run with the same arguments are skipped. Resuming assumes the same
+        input in the same order.
+
+        Args:
+            args: Command line arguments with placeholders
+            items: Input items, e.g. lines of standard input
+            jobs: Maximum number of parallel invocations
+            pool: Worker pool kind (thread or process)
+            keep_order: Write output in input order instead of completion order
+            resume: Skip items completed by the previous run
+
+        Returns:
+            Exit code (0 if every invocation succeeded, otherwise the first
+            non-zero exit code)
+        """
+        placeholder = self.MAP_PLACEHOLDER
+        templated = any(placeholder in arg for arg in args)
+
+        journal = Journal(self.__state_path("journal", journal_key(args) + ".log"))
+        # Input index of every scheduled invocation by submission position
+        scheduled: Dict[int, int] = {}
+
+        def argvs():
+            index = -1
+            position = 0
+            for line in items:
+                item = line.rstrip("\r\n")
+                if not item:
+                    continue
+                index += 1
+                if index in journal:
+                    continue
+                scheduled[position] = index
+                position += 1
+                if templated:
+                    yield [arg.replace(placeholder, item) for arg in args]
+                else:
+                    yield args + [item]
+
+        self.__ensure_parsers()
+        stdout, stderr = current_stdout(), current_stderr()
+        failure = 0
+        try:
+            with journal.open(resume=resume), WorkerPool(
+                self, kind=pool, max_workers=jobs
+            ) as workers:
+                results = workers.imap(argvs(), keep_order=keep_order)
+                try:
+                    for position, (code, out, err) in results:
+                        stdout.write(out)
+                        stderr.write(err)
+                        index = scheduled.pop(position)
+                        if code == 0:
+                            journal.record(index)
+                        elif not failure:
+                            failure = code
+                finally:
+                    results.close()
+            stdout.flush()
+        except BrokenPipeError:
+            silence_broken_pipe(stdout)
+            return BROKEN_PIPE_EXIT_CODE
+        return failure
+
+    def __split_pipeline(self, args: List[str]) -> List[List[str]]:
+        """Split command line arguments into pipeline stages.
+
+        Args:
+            args: Command line arguments
+
+        Returns:
+            Arguments of every stage
+        """
+        stages: List[List[str]] = [[]]
+        for arg in args:
+            if arg == self.PIPELINE_SEPARATOR:
+                stages.append([])
+            else:
+                stages[-1].append(arg)
+        return stages
+
+    def run_pipeline(self, stages: List[List[str]]) -> int:
+        """Run commands as an in-process pipeline.
+
+        The value returned by each stage is passed as a Python object to the
+        parameter named by ``consumes`` of the next stage's command. When
+        stages return generators, items flow through the whole pipeline one
+        at a time without being materialized or serialized. Items produced
+        by the last stage are printed one per line. On the command line the
+        stages are separated by ``:::``.
 
-            # Convert namespace to dict and remove command
-            kwargs = vars(parsed_args)
-            del kwargs[self.COMMAND_DEST]
+        Global options applying to the whole pipeline (``--output``,
+        ``--output-file``, ``--profile``, ``--trace-memory``, ``-v`` and
+        ``-q``) must be given before the first command. ``--watch`` and
+        ``--with-deps`` cannot be used in a pipeline.
 
-            # Execute command
-            result = command(**kwargs)
-            return result if isinstance(result, int) else 0
+        Args:
+            stages: Command line arguments of every stage
 
+        Returns:
+            Exit code (0 on success)
+        """
+        try:
+            parsed = []
+            for index, stage in enumerate(stages):
+                result = self.__parse(stage, piped=index > 0)
+                if result is None:
+                    return 1
+                command, _, options = result
+                if index and command.consumes is None:
+                    print(
+                        f"Command '{command.name}' does not accept pipeline input",
+                        file=sys.stderr,
+                    )
+                    return 1
+                error = self.__check_pipeline_options(options, index)
+                if error:
+                    print(error, file=sys.stderr)
+                    return 1
+                parsed.append(result)
+
+            options = parsed[0][2]
+            name = f" {self.PIPELINE_SEPARATOR} ".join(command.name for command, _, _ in parsed)
+            with log_level(self.__log_level(options)):
+                return self.__apply_global_options(
+                    name, options, functools.partial(self.__run_stages, parsed)
+                )
         except Exception as e:
             print(str(e), file=sys.stderr)
             return 1
+
+    def __check_pipeline_options(self, options: Dict[str, Any], index: int) -> Optional[str]:
+        """Check the global options of a pipeline stage.
+
+        Args:
+            options: Parsed global options of the stage
+            index: Stage number
+
+        Returns:
+            Error message, or None if the options are valid
+        """
+        for name in NON_PIPELINE_OPTIONS:
+            if options[name]:
+                return f"{self.__flag(name)} cannot be used with '{self.PIPELINE_SEPARATOR}'"
+        if index:
+            for name in PIPELINE_WIDE_OPTIONS:
+                if options[name] != self.__parser.get_default(self.GLOBAL_DEST_PREFIX + name):
+                    return f"{self.__flag(name)} must be given before the first pipeline command"
+        return None
+
+    @staticmethod
+    def __flag(name: str) -> str:
+        return "--" + name.replace("_", "-")
+
+    def __run_stages(self, parsed: List[Tuple[Command, Dict[str, Any], Dict[str, Any]]]) -> int:
+        """Execute parsed pipeline stages and write the output of the last one.
+
+        Args:
+            parsed: Command, parsed command arguments and parsed global
+                options of every stage
+
+        Returns:
+            Exit code (0 on success)
+        """
+        results = []
+        try:
+            upstream: Any = None
+            for index, (command, kwargs, options) in enumerate(parsed):
+                if index:
+                    kwargs[command.consumes] = upstream
+                    # Streamed input is not a stable cache or incremental key
+                    options = dict(options, no_cache=True, force=True)
+                upstream = self.__execute(command, kwargs, options)
+                results.append(upstream)
+                if isinstance(upstream, int) and not isinstance(upstream, bool):
+                    if upstream != 0 or index == len(parsed) - 1:
+                        return upstream
+                    print(f"Command '{command.name}' produced no pipeline output", file=sys.stderr)
+                    return 1
+
+            output_format = parsed[0][2]["output"]
+            if has_output(upstream, output_format):
+                return self.__write_result(upstream, output_format)
+            if upstream is not None:
+                print(upstream)
+            return 0
+
+        except CommandTimeout:
+            print(f"{command.name}: timed out", file=sys.stderr)
+            return TIMEOUT_EXIT_CODE
+        except LimitExceeded as e:
+            print(f"{command.name}: {e}", file=sys.stderr)
+            return LIMIT_EXIT_CODE
+        except BrokenPipeError:
+            silence_broken_pipe(current_stdout())
+            return BROKEN_PIPE_EXIT_CODE
+        except Exception as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        finally:
+            # Release what stages that were never consumed still hold
+            for result in reversed(results):
+                if inspect.isgenerator(result):
+                    result.close()
+
+    def __invoke(self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]) -> int:
+        """Execute a command and convert its result to an exit code.
+
+        Iterable results (generators, lists, ...) are written to standard
+        output one item per line through a coalescing buffer; with a
+        structured ``--output`` format other values are serialized as well.
+        With ``--output-file`` standard output goes to a (compressed) file
+        written by a background thread. With ``--profile`` execution and
+        output of the command, but not argument parsing, are profiled;
+        ``--trace-memory`` reports memory allocated in the same span.
+
+        Args:
+            command: Command to execute
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Exit code (0 on success)
+        """
+        try:
+            return self.__apply_global_options(
+                command.name,
+                options,
+                functools.partial(self.__invoke_once, command, kwargs, options),
+            )
+        finally:
+            # Long watch sessions and maps do not wait for the end of run
+            self.__log_handler.flush()
+
+    def __apply_global_options(
+        self, name: str, options: Dict[str, Any], execute: Callable[[], int]
+    ) -> int:
+        """Run an execution with ``--output-file``, ``--trace-memory`` and ``--profile``.
+
+        Args:
+            name: Name of what is executed, used in memory reports
+            options: Parsed global options
+            execute: Function executing and writing output, returning an exit code
+
+        Returns:
+            Exit code (0 on success)
+        """
+        if options["output_file"]:
+            return self.__to_output_file(
+                options["output_file"],
+                functools.partial(
+                    self.__apply_global_options, name, dict(options, output_file=None), execute
+                ),
+            )
+        if options["trace_memory"]:
+            return trace_memory(
+                functools.partial(
+                    self.__apply_global_options, name, dict(options, trace_memory=False), execute
+                ),
+                name,
+                self.__memory,
+                current_stderr(),
+            )
+        if options["profile"] is not None:
+            return run_profiled(
+                execute, options["profile"] or None, options["profiler"], current_stderr()
+            )
+        return execute()
+
+    def __invoke_once(
+        self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]
+    ) -> int:
+        """Execute a command and write its result, ignoring wrapping global options.
+
+        Args:
+            command: Command to execute
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Exit code (0 on success)
+        """
+        try:
+            result = self.__execute(command, dict(kwargs), options)
+            if has_output(result, options["output"]):
+                return self.__write_result(result, options["output"])
+        except CommandTimeout:
+            print(f"{command.name}: timed out", file=sys.stderr)
+            return TIMEOUT_EXIT_CODE
+        except LimitExceeded as e:
+            print(f"{command.name}: {e}", file=sys.stderr)
+            return LIMIT_EXIT_CODE
+        except BrokenPipeError:
+            silence_broken_pipe(current_stdout())
+            return BROKEN_PIPE_EXIT_CODE
+        except Exception as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        return result if isinstance(result, int) else 0
+
+    def __to_output_file(self, path: str, execute: Callable[[], int]) -> int:
+        """Run a function with standard output going to a file.
+
+        Args:
+            path: Output file path (compressed by extension)
+            execute: Function returning an exit code
+
+        Returns:
+            Exit code of the function, 1 if the file could not be written
+        """
+        try:
+            sink = open_output_file(path)
+        except (OSError, ValueError) as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        try:
+            with redirect_output(stdout=sink):
+                code = execute()
+        finally:
+            try:
+                sink.close()
+            except OSError as e:
+                print(str(e), file=sys.stderr)
+                code = 1
+        return code
+
+    def __write_result(self, result: Any, output_format: str) -> int:
+        """Write a command result to standard output.
+
+        Args:
+            result: Command result
+            output_format: Output format name
+
+        Returns:
+            Exit code of writing (non-zero if the reader closed the pipe)
+        """
+        return write_lines(render(result, output_format), current_stdout(), source=result)
+
+    def __watch(self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]) -> int:
+        """Run a command and re-run it whenever watched paths change.
+
+        Runs happen in this process with the parsers already built; a run
+        still in progress when new changes arrive is cancelled. The loop
+        ends on Ctrl+C.
+
+        Args:
+            command: Command to execute
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Exit code of the last run
+        """
+        stderr = current_stderr()
+
+        def on_change(changed) -> None:
+            print(f"[watch] {format_changes(changed)} changed, re-running", file=stderr)
+
+        loop = WatchLoop(
+            options["watch"],
+            functools.partial(self.__invoke, command, kwargs, options),
+            on_change=on_change,
+        )
+        return loop.run()
+
+    def run_graph(
+        self,
+        target: str,
+        jobs: Optional[int] = None,
+        pool: str = "thread",
+        include_target: bool = True,
+    ) -> int:
+        """Run a command after everything it depends on.
+
+        Commands are ordered by their ``depends_on`` declarations and run
+        without arguments; independent branches run concurrently. A failed
+        command stops everything downstream of it, and incremental commands
+        with unchanged inputs are skipped as usual. Output of every command
+        is written once the command finishes.
+
+        Args:
+            target: Target command name
+            jobs: Maximum number of commands run in parallel
+            pool: Worker pool kind (thread or process)
+            include_target: Whether to run the target itself
+
+        Returns:
+            Exit code (0 if every command succeeded)
+        """
+        graph = CommandGraph({name: cmd.depends_on for name, cmd in self.__commands.items()})
+        stdout, stderr = current_stdout(), current_stderr()
+
+        def on_done(name, future) -> int:
+            code, out, err = future.result()
+            stdout.write(out)
+            stderr.write(err)
+            return code
+
+        try:
+            with WorkerPool(self, kind=pool, max_workers=jobs) as workers:
+                results = graph.execute(
+                    target,
+                    lambda name: workers.submit([name]),
+                    on_done=on_done,
+                    include_target=include_target,
+                )
+        except ValueError as e:
+            print(str(e), file=stderr)
+            return 1
+
+        code = 0
+        for result in results.values():
+            if result.status == OK:
+                continue
+            if result.status == SKIPPED:
+                print(f"{result.name}: skipped (dependency failed)", file=stderr)
+            else:
+                print(f"{result.name}: failed with exit code {result.exit_code}", file=stderr)
+                code = code or result.exit_code
+        return code
+
+    def __execute(self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]) -> Any:
+        """Execute a command with parsed arguments.
+
+        Args:
+            command: Command to execute
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Command result
+        """
+        if command.incremental is not None and not options["force"]:
+            return self.__execute_incremental(command, kwargs, options)
+        if command.cache is not None and not options["no_cache"]:
+            return self.__execute_cached(command, kwargs, options)
+        return self.__call(command, kwargs, options)
+
+    def __call(self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]) -> Any:
+        """Call a command function injecting the resources it requests.
+
+        The call is subject to the time, memory and CPU limits of the
+        command, each overridden by the corresponding global option.
+        Resources are released as soon as the call ends, including when it
+        is interrupted by a limit. For a generator result the limits apply,
+        and resources are held, until the generator is exhausted or closed.
+
+        Args:
+            command: Command to call
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Command result
+
+        Raises:
+            CommandTimeout: If the time limit expired
+            LimitExceeded: If the memory or CPU limit was exceeded
+        """
+
+        def setting(name: str) -> Any:
+            value = options.get(name)
+            return value if value is not None else getattr(command, name)
+
+        timeout = setting("timeout")
+        limits = ResourceLimits(setting("max_memory"), setting("max_cpu_seconds"))
+        names = self.__resources.requested_by(command.func)
+
+        def call() -> Any:
+            if not names:
+                return command(**kwargs)
+            with contextlib.ExitStack() as stack:
+                resources = stack.enter_context(self.__resources.acquire(names))
+                result = command(**kwargs, **resources)
+                if inspect.isgenerator(result):
+                    return hold_open(result, stack.pop_all())
+                return result
+
+        async def call_async() -> Any:
+            if not names:
+                return await command(**kwargs)
+            with contextlib.ExitStack() as stack:
+                resources = stack.enter_context(self.__resources.acquire(names))
+                result = await command(**kwargs, **resources)
+                if inspect.isgenerator(result):
+                    return hold_open(result, stack.pop_all())
+                return result
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(apply_limits(limits))
+            if inspect.iscoroutinefunction(command.func):
+                result = run_coroutine(call_async(), timeout)
+            else:
+                result = call_with_timeout(call, timeout)
+            if inspect.isgenerator(result):
+                return hold_open(result, stack.pop_all())
+            return result
+
+    def __execute_incremental(
+        self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]
+    ) -> Any:
+        """Execute a command unless its inputs are unchanged since the last run.
+
+        Args:
+            command: Command with declared inputs
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Command result (0 if the command was skipped)
+        """
+        spec = command.incremental
+        state = IncrementalState(self.__state_path("incremental.json"))
+        key = invocation_key(command.name, kwargs)
+        inputs = spec.paths(spec.inputs, kwargs)
+        outputs = spec.paths(spec.outputs, kwargs)
+
+        if state.is_up_to_date(key, inputs, outputs):
+            print(f"{command.name}: up to date", file=sys.stderr)
+            return 0
+
+        result = self.__execute(command, kwargs, dict(options, force=True))
+        if inspect.isgenerator(result):
+            # Streamed results count as done once every item was consumed
+            return on_exhausted(result, functools.partial(state.record, key, inputs))
+        if not isinstance(result, int) or result == 0:
+            state.record(key, inputs)
+        return result
+
+    def __execute_cached(
+        self, command: Command, kwargs: Dict[str, Any], options: Dict[str, Any]
+    ) -> Any:
+        """Execute a command through the result cache.
+
+        Args:
+            command: Command with a cache policy
+            kwargs: Parsed command arguments
+            options: Parsed global options
+
+        Returns:
+            Cached or freshly computed command result
+        """
+        cache = self.__caches.get(command.name)
+        if cache is None:
+            with self.__lock:
+                cache = self.__caches.setdefault(
+                    command.name, ResultCache(self.__state_path("cache", command.name))
+                )
+
+        key = cache.make_key(command.name, kwargs)
+        entry = cache.get(key, ttl=command.cache.ttl)
+        if entry is not None:
+            current_stdout().write(entry.stdout)
+            return entry.result
+
+        captured = io.StringIO()
+        with redirect_output(stdout=TeeStream(current_stdout(), captured)):
+            result = self.__call(command, kwargs, options)
+            if is_streamable(result):
+                # Streams are replayed from the cache, so they are materialized
+                result = list(result)
+
+        if not isinstance(result, int) or result == 0:
+            try:
+                cache.put(key, CacheEntry(result=result, stdout=captured.getvalue()), command.cache)
+            except OSError as e:
+                print(f"{command.name}: could not cache result: {e}", file=sys.stderr)
+        return result
@@ -1,9 +1,12 @@
 """Command implementation."""
 
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import attrs
 
+from .cache import CachePolicy
+from .incremental import IncrementalSpec
+
 
 @attrs.define(frozen=False, slots=True, kw_only=True)
 class Command:
@@ -14,6 +17,13 @@ class Command:
     arguments: List[Dict[str, Any]] = attrs.field(factory=list)
     options: List[Dict[str, Any]] = attrs.field(factory=list)
     func: Callable = attrs.field()
+    cache: Optional[CachePolicy] = attrs.field(default=None)
+    incremental: Optional[IncrementalSpec] = attrs.field(default=None)
+    depends_on: Tuple[str, ...] = attrs.field(default=(), converter=tuple)
+    consumes: Optional[str] = attrs.field(default=None)
+    timeout: Optional[float] = attrs.field(default=None)
+    max_memory: Optional[int] = attrs.field(default=None)
+    max_cpu_seconds: Optional[float] = attrs.field(default=None)
 
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
         """Execute command function.
@@ -86,3 +86,8 @@ class CLIConstants(metaclass=ConstantMeta):
     DEFAULT_COMMAND_DESCRIPTION = Constant("No description provided for this command")
     COMMAND_DEST = Constant("command")
     HELP_COMMAND_NAME = Constant("help")
+    SHELL_COMMAND_NAME = Constant("shell")
+    BENCH_COMMAND_NAME = Constant("bench")
+    GLOBAL_DEST_PREFIX = Constant("_cli_")
+    PIPELINE_SEPARATOR = Constant(":::")
+    MAP_PLACEHOLDER = Constant("{}")
@@ -0,0 +1,248 @@
+"""Serialization of command results into output formats."""
+
+import csv
+import dataclasses
+import datetime
+import enum
+import itertools
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import attrs
+
+from .output import is_streamable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+OUTPUT_FORMATS = ("text", "json", "jsonl", "csv", "tsv")
+
+# Rows used to estimate table column widths
+TABLE_SAMPLE_SIZE = 100
+MAX_COLUMN_WIDTH = 40
+
+
+def is_record(obj: Any) -> bool:
+    """Check whether an object is rendered as a row with named fields.
+
+    Args:
+        obj: Object to check
+
+    Returns:
+        True for dicts, dataclass and attrs instances and named tuples
+    """
+    if isinstance(obj, dict):
+        return True
+    if isinstance(obj, tuple) and hasattr(obj, "_asdict"):
+        return True
+    if isinstance(obj, type):
+        return False
+    return dataclasses.is_dataclass(obj) or attrs.has(type(obj))
+
+
+def to_record(obj: Any) -> Any:
+    """Convert record-like objects into dicts.
+
+    Args:
+        obj: Object to convert
+
+    Returns:
+        Dict for record-like objects, the object itself otherwise
+    """
+    if isinstance(obj, dict):
+        return obj
+    if isinstance(obj, tuple) and hasattr(obj, "_asdict"):
+        return obj._asdict()
+    if isinstance(obj, type):
+        return obj
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if attrs.has(type(obj)):
+        return attrs.asdict(obj)
+    return obj
+
+
+def _default(obj: Any) -> Any:
+    """Convert values the JSON encoder does not support.
+
+    Args:
+        obj: Unsupported value
+
+    Returns:
+        JSON-compatible value
+    """
+    record = to_record(obj)
+    if record is not obj:
+        return record
+    if isinstance(obj, (set, frozenset, tuple)) or hasattr(obj, "__iter__"):
+        return list(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, os.PathLike):
+        return os.fspath(obj)
+    return str(obj)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize an object to compact JSON.
+
+    Uses ``orjson`` when it is installed.
+
+    Args:
+        obj: Object to serialize
+
+    Returns:
+        JSON text
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default).decode("utf-8")
+        except TypeError:
+            # e.g. non-string dict keys or integers beyond 64 bits
+            pass
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def has_output(result: Any, output_format: str) -> bool:
+    """Check whether a command result is written in the given format.
+
+    Integers are exit codes and never written. In text format only
+    iterables are written, other results are ignored as before.
+
+    Args:
+        result: Command result
+        output_format: Output format name
+
+    Returns:
+        True if the result should be written
+    """
+    if output_format == "text":
+        return is_streamable(result)
+    return result is not None and not isinstance(result, int)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple, set)) or is_record(value):
+        return dumps(value)
+    return str(value)
+
+
+def _render_table(records: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    sample = list(itertools.islice(records, TABLE_SAMPLE_SIZE))
+    columns: List[str] = []
+    for record in sample:
+        columns.extend(key for key in record if key not in columns)
+
+    widths = [len(str(column)) for column in columns]
+    for record in sample:
+        for index, column in enumerate(columns):
+            widths[index] = max(widths[index], len(_cell(record.get(column))))
+    widths = [min(width, MAX_COLUMN_WIDTH) for width in widths]
+
+    def line(cells: List[str]) -> str:
+        parts = []
+        for cell, width in zip(cells, widths):
+            if len(cell) > width:
+                cell = cell[: width - 3] + "..." if width > 3 else cell[:width]
+            parts.append(cell.ljust(width))
+        return "  ".join(parts).rstrip()
+
+    yield line([str(column) for column in columns])
+    yield line(["-" * width for width in widths])
+    for record in itertools.chain(sample, records):
+        yield line([_cell(record.get(column)) for column in columns])
+
+
+def _render_text(items: Iterator[Any]) -> Iterator[str]:
+    first = list(itertools.islice(items, 1))
+    if first and is_record(first[0]):
+        yield from _render_table(to_record(item) for item in itertools.chain(first, items))
+        return
+    for item in itertools.chain(first, items):
+        yield str(item)
+
+
+def _render_json_array(items: Iterator[Any]) -> Iterator[str]:
+    yield "["
+    previous: Optional[str] = None
+    for item in items:
+        if previous is not None:
+            yield previous + ","
+        previous = "  " + dumps(item)
+    if previous is not None:
+        yield previous
+    yield "]"
+
+
+class _RowBuffer:
+    """File-like object keeping the last row written by a csv writer."""
+
+    value = ""
+
+    def write(self, data: str) -> None:
+        self.value = data
+
+
+def _render_delimited(items: Iterator[Any], delimiter: str) -> Iterator[str]:
+    buffer = _RowBuffer()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="")
+
+    first = list(itertools.islice(items, 1))
+    if not first:
+        return
+
+    if not is_record(first[0]):
+        for item in itertools.chain(first, items):
+            writer.writerow([_cell(item)])
+            yield buffer.value
+        return
+
+    columns = list(to_record(first[0]))
+    writer.writerow(columns)
+    yield buffer.value
+    for item in itertools.chain(first, items):
+        record = to_record(item)
+        writer.writerow([_cell(record.get(column)) for column in columns])
+        yield buffer.value
+
+
+def render(result: Any, output_format: str = "text") -> Iterator[str]:
+    """Render a command result as lines of text, lazily.
+
+    Iterables are consumed one item at a time, so rows are never all held
+    in memory; tables estimate column widths from the first rows only.
+
+    Args:
+        result: Command result (an iterable or a single value)
+        output_format: One of ``OUTPUT_FORMATS``
+
+    Returns:
+        Iterator over output lines without trailing newlines
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    streamed = is_streamable(result)
+    items: Iterator[Any] = iter(result) if streamed else iter([result])
+
+    if output_format == "text":
+        return _render_text(items)
+    if output_format == "json":
+        if not streamed:
+            return iter([dumps(result)])
+        return _render_json_array(items)
+    if output_format == "jsonl":
+        return (dumps(item) for item in items)
+    return _render_delimited(items, "," if output_format == "csv" else "\t")
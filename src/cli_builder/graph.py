@@ -0,0 +1,148 @@
+"""Dependency graph of commands with parallel scheduling."""
+
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+import attrs
+
+# Node statuses
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@attrs.define(frozen=True, slots=True, kw_only=True)
+class NodeResult:
+    """Outcome of a graph node."""
+
+    name: str = attrs.field()
+    status: str = attrs.field()
+    exit_code: int = attrs.field(default=0)
+
+
+class CommandGraph:
+    """Graph of commands connected by ``depends_on`` declarations."""
+
+    def __init__(self, dependencies: Dict[str, Sequence[str]]):
+        """Initialize graph.
+
+        Args:
+            dependencies: Mapping of command name to the names it depends on
+        """
+        self.dependencies = dependencies
+
+    def closure(self, target: str) -> Dict[str, List[str]]:
+        """Collect a target and everything it transitively depends on.
+
+        Args:
+            target: Target command name
+
+        Returns:
+            Mapping of node name to its dependencies
+
+        Raises:
+            ValueError: If a dependency is unknown or the graph has a cycle
+        """
+        nodes: Dict[str, List[str]] = {}
+        visiting: Set[str] = set()
+
+        def visit(name: str, parent: Optional[str]) -> None:
+            if name in nodes:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at command '{name}'")
+            if name not in self.dependencies:
+                if parent is None:
+                    raise ValueError(f"Unknown command: {name}")
+                raise ValueError(f"Unknown dependency '{name}' of command '{parent}'")
+
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency, name)
+            visiting.discard(name)
+            nodes[name] = list(self.dependencies[name])
+
+        visit(target, None)
+        return nodes
+
+    def order(self, target: str) -> List[str]:
+        """Get a topological order of a target and its dependencies.
+
+        Args:
+            target: Target command name
+
+        Returns:
+            Node names, dependencies first
+        """
+        return list(self.closure(target))
+
+    def execute(
+        self,
+        target: str,
+        submit: Callable[[str], Future],
+        on_done: Optional[Callable[[str, Future], int]] = None,
+        include_target: bool = True,
+    ) -> Dict[str, NodeResult]:
+        """Run the nodes of a target, starting each one once its dependencies succeed.
+
+        Independent nodes run concurrently in whatever executor ``submit``
+        uses. When a node fails, everything depending on it is skipped while
+        unrelated branches keep running.
+
+        Args:
+            target: Target command name
+            submit: Function scheduling a node and returning its future
+            on_done: Function called in the scheduling thread with each
+                finished node, returning its exit code (the future result is
+                used as the exit code by default)
+            include_target: Whether to run the target itself
+
+        Returns:
+            Mapping of node name to its result
+        """
+        nodes = self.closure(target)
+        if not include_target:
+            del nodes[target]
+
+        waiting = {name: set(deps) for name, deps in nodes.items()}
+        dependents: Dict[str, List[str]] = {name: [] for name in nodes}
+        for name, deps in nodes.items():
+            for dependency in deps:
+                dependents[dependency].append(name)
+
+        results: Dict[str, NodeResult] = {}
+        running: Dict[Future, str] = {}
+        ready = [name for name, deps in waiting.items() if not deps]
+
+        while ready or running:
+            for name in ready:
+                running[submit(name)] = name
+            ready = []
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    code = on_done(name, future) if on_done else future.result()
+                except Exception:
+                    code = 1
+
+                if code == 0:
+                    results[name] = NodeResult(name=name, status=OK)
+                    for dependent in dependents[name]:
+                        waiting[dependent].discard(name)
+                        if not waiting[dependent] and dependent not in results:
+                            ready.append(dependent)
+                    continue
+
+                results[name] = NodeResult(name=name, status=FAILED, exit_code=code)
+                blocked = list(dependents[name])
+                while blocked:
+                    dependent = blocked.pop()
+                    if dependent not in results:
+                        results[dependent] = NodeResult(
+                            name=dependent, status=SKIPPED, exit_code=code
+                        )
+                        blocked.extend(dependents[dependent])
+
+        return results
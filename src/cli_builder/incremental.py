@@ -0,0 +1,207 @@
+"""Make-style skipping of commands whose inputs are unchanged."""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import attrs
+
+from .storage import atomic_write, file_lock
+
+CHUNK_SIZE = 1024 * 1024
+
+# Recorded state of a file: (size, mtime in nanoseconds, content digest)
+FileState = Tuple[int, int, str]
+
+
+@attrs.define(frozen=True, slots=True, kw_only=True)
+class IncrementalSpec:
+    """Names of command parameters holding input and output paths."""
+
+    inputs: Tuple[str, ...] = attrs.field(converter=tuple)
+    outputs: Tuple[str, ...] = attrs.field(converter=tuple, default=())
+
+    def paths(self, names: Tuple[str, ...], kwargs: Dict[str, Any]) -> List[str]:
+        """Collect paths from parsed command arguments.
+
+        Args:
+            names: Parameter names to collect
+            kwargs: Parsed command arguments
+
+        Returns:
+            Paths in parameter order
+        """
+        paths = []
+        for name in names:
+            value = kwargs.get(name)
+            if value is None:
+                continue
+            if isinstance(value, (str, os.PathLike)):
+                paths.append(os.fspath(value))
+            else:
+                paths.extend(os.fspath(item) for item in value)
+        return paths
+
+
+def expand_files(paths: Iterable[str]) -> List[str]:
+    """Expand directories into the files they contain.
+
+    Args:
+        paths: File or directory paths
+
+    Returns:
+        Sorted list of unique file paths
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.update(os.path.join(root, name) for name in names)
+        else:
+            files.add(path)
+    return sorted(files)
+
+
+def hash_file(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Compute a content digest reading the file in chunks.
+
+    Args:
+        path: File path
+        chunk_size: Size of a read chunk in bytes
+
+    Returns:
+        Hex digest of the content
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as handle:
+        while True:
+            size = handle.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def hash_files(paths: List[str], max_workers: Optional[int] = None) -> Dict[str, str]:
+    """Hash several files in parallel threads.
+
+    Args:
+        paths: File paths
+        max_workers: Maximum number of hashing threads
+
+    Returns:
+        Mapping of path to digest
+    """
+    if len(paths) <= 1:
+        return {path: hash_file(path) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(hash_file, paths)))
+
+
+class IncrementalState:
+    """State file recording the inputs of the last successful runs."""
+
+    def __init__(self, path: str):
+        """Initialize state.
+
+        Args:
+            path: State file path
+        """
+        self.path = path
+
+    def __load(self) -> Dict[str, Dict[str, FileState]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def is_up_to_date(self, key: str, inputs: List[str], outputs: List[str]) -> bool:
+        """Check whether an invocation can be skipped.
+
+        Files whose size and modification time match the record are trusted
+        without reading them; only files with a changed modification time
+        but the same size are hashed.
+
+        Args:
+            key: Invocation key
+            inputs: Input files and directories
+            outputs: Output files and directories
+
+        Returns:
+            True if all outputs exist and no input changed since the last run
+        """
+        if not all(os.path.exists(path) for path in outputs):
+            return False
+
+        recorded = self.__load().get(key)
+        if recorded is None:
+            return False
+
+        files = expand_files(inputs)
+        if sorted(recorded) != files:
+            return False
+
+        to_hash = []
+        for path in files:
+            size, mtime_ns, _ = recorded[path]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if stat.st_size != size:
+                return False
+            if stat.st_mtime_ns != mtime_ns:
+                to_hash.append(path)
+
+        digests = hash_files(to_hash)
+        return all(recorded[path][2] == digest for path, digest in digests.items())
+
+    def record(self, key: str, inputs: List[str]) -> None:
+        """Record the current state of inputs after a successful run.
+
+        Inputs missing after the run are left out, so the invocation is
+        not considered up to date until they exist.
+
+        Args:
+            key: Invocation key
+            inputs: Input files and directories
+        """
+        files = expand_files(inputs)
+        with file_lock(self.path + ".lock"):
+            state = self.__load()
+            previous = state.get(key, {})
+
+            stats = {}
+            for path in files:
+                try:
+                    stats[path] = os.stat(path)
+                except OSError:
+                    # Not recorded, so the next run is not skipped
+                    continue
+            to_hash = [
+                path
+                for path, stat in stats.items()
+                if path not in previous
+                or tuple(previous[path][:2]) != (stat.st_size, stat.st_mtime_ns)
+            ]
+            try:
+                digests = hash_files(to_hash)
+            except OSError:
+                # An input disappeared while it was hashed
+                return
+
+            state[key] = {
+                path: (
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    digests[path] if path in digests else previous[path][2],
+                )
+                for path, stat in stats.items()
+            }
+            atomic_write(self.path, json.dumps(state).encode("utf-8"))
@@ -0,0 +1,186 @@
+"""Journal of completed batch items for resuming interrupted runs."""
+
+import hashlib
+import json
+import os
+import time
+from typing import IO, Iterable, List, Optional, Set, Tuple
+
+from .storage import atomic_write
+
+DEFAULT_SYNC_EVERY = 1000
+DEFAULT_SYNC_INTERVAL = 1.0
+DEFAULT_COMPACT_EVERY = 100_000
+
+
+def journal_key(args: Iterable[str]) -> str:
+    """Build the journal file name of a batch invocation.
+
+    Args:
+        args: Command line arguments of the batch (with placeholders)
+
+    Returns:
+        Hex digest identifying the batch
+    """
+    data = json.dumps(list(args), separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def to_ranges(indices: Iterable[int]) -> List[Tuple[int, int]]:
+    """Collapse indices into sorted inclusive ranges.
+
+    Args:
+        indices: Item indices
+
+    Returns:
+        List of ``(first, last)`` pairs
+    """
+    ranges: List[Tuple[int, int]] = []
+    for index in sorted(indices):
+        if ranges and index == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], index)
+        elif not ranges or index > ranges[-1][1]:
+            ranges.append((index, index))
+    return ranges
+
+
+def parse_line(line: str) -> range:
+    """Parse one journal line (``N`` or ``FIRST-LAST``).
+
+    Args:
+        line: Journal line
+
+    Returns:
+        Indices recorded by the line
+
+    Raises:
+        ValueError: If the line is malformed
+    """
+    first, _, last = line.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+class Journal:
+    """Append-only record of completed item indices.
+
+    Every completed index is appended as a line; the file is flushed and
+    fsynced in batches of ``sync_every`` entries (or after
+    ``sync_interval`` seconds), so an interrupted run loses at most one
+    batch. Every ``compact_every`` entries the file is rewritten as ranges
+    of consecutive indices to keep it small. A truncated last line left by
+    a crash is ignored when loading.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        compact_every: int = DEFAULT_COMPACT_EVERY,
+    ):
+        """Initialize journal.
+
+        Args:
+            path: Journal file path
+            sync_every: Entries written between fsync calls
+            sync_interval: Maximum seconds between fsync calls
+            compact_every: Entries appended between compactions
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.completed: Set[int] = set()
+        self.__handle: Optional[IO[str]] = None
+        self.__unsynced = 0
+        self.__appended = 0
+        self.__last_sync = time.monotonic()
+
+    def __contains__(self, index: int) -> bool:
+        return index in self.completed
+
+    def __len__(self) -> int:
+        return len(self.completed)
+
+    def open(self, resume: bool = False) -> "Journal":
+        """Open the journal for appending.
+
+        Args:
+            resume: Load previously completed indices instead of starting over
+
+        Returns:
+            The journal itself
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.completed = set()
+        if resume and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        self.completed.update(parse_line(line.strip()))
+                    except ValueError:
+                        continue
+            self.compact()
+        else:
+            atomic_write(self.path, b"")
+        self.__handle = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def record(self, index: int) -> None:
+        """Record a completed item.
+
+        Args:
+            index: Item index
+        """
+        self.completed.add(index)
+        self.__handle.write(f"{index}\n")
+        self.__unsynced += 1
+        self.__appended += 1
+        if self.__appended >= self.compact_every:
+            self.compact()
+        elif (
+            self.__unsynced >= self.sync_every
+            or time.monotonic() - self.__last_sync >= self.sync_interval
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush appended entries to disk."""
+        if self.__handle is not None and self.__unsynced:
+            self.__handle.flush()
+            os.fsync(self.__handle.fileno())
+        self.__unsynced = 0
+        self.__last_sync = time.monotonic()
+
+    def compact(self) -> None:
+        """Rewrite the journal as ranges of consecutive completed indices."""
+        lines = [
+            f"{first}\n" if first == last else f"{first}-{last}\n"
+            for first, last in to_ranges(self.completed)
+        ]
+        reopen = self.__handle is not None
+        if reopen:
+            self.__handle.close()
+        atomic_write(self.path, "".join(lines).encode("utf-8"))
+        if reopen:
+            self.__handle = open(self.path, "a", encoding="utf-8")
+        self.__unsynced = 0
+        self.__appended = 0
+        self.__last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Compact the journal and close it."""
+        if self.__handle is None:
+            return
+        self.sync()
+        self.compact()
+        self.__handle.close()
+        self.__handle = None
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
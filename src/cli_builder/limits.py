@@ -0,0 +1,160 @@
+"""Memory and CPU time limits of command executions."""
+
+import contextlib
+import math
+import re
+import signal
+import threading
+from typing import Iterator, Optional
+
+import attrs
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+# Exit code of commands stopped by a resource limit
+LIMIT_EXIT_CODE = 125
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*$", re.IGNORECASE)
+
+
+def parse_size(text: str) -> int:
+    """Parse a memory size such as ``512M`` or ``2GiB``.
+
+    Args:
+        text: Size with an optional binary unit suffix
+
+    Returns:
+        Size in bytes
+
+    Raises:
+        ValueError: If the size is malformed
+    """
+    match = _SIZE_PATTERN.match(text)
+    if match is None:
+        raise ValueError(f"invalid size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+class LimitExceeded(Exception):
+    """Raised when a command exceeds its memory or CPU time limit."""
+
+    def __init__(self, resource_name: str, limit: float):
+        """Initialize error.
+
+        Args:
+            resource_name: Exceeded resource (memory or cpu)
+            limit: Limit in bytes or CPU seconds
+        """
+        super().__init__(resource_name, limit)
+        self.resource_name = resource_name
+        self.limit = limit
+
+    def __str__(self) -> str:
+        if self.resource_name == "memory":
+            return f"memory limit exceeded ({self.limit / 1024**2:.0f} MiB)"
+        return f"CPU time limit exceeded ({self.limit:g} s)"
+
+
+@attrs.define(frozen=True, slots=True)
+class ResourceLimits:
+    """Limits of one command execution."""
+
+    max_memory: Optional[int] = attrs.field(default=None)
+    max_cpu_seconds: Optional[float] = attrs.field(default=None)
+
+    def __bool__(self) -> bool:
+        return self.max_memory is not None or self.max_cpu_seconds is not None
+
+
+def is_supported() -> bool:
+    """Check whether limits can be applied to the current execution.
+
+    Limits apply to the whole process, so they are only enforced for
+    executions running on the main thread: single invocations and
+    invocations in process pool workers.
+
+    Returns:
+        True if limits are enforced
+    """
+    return resource is not None and threading.current_thread() is threading.main_thread()
+
+
+def _address_space_size() -> int:
+    """Get the current virtual memory size of the process in bytes."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _lower_soft_limit(kind: int, value: int) -> None:
+    soft, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    if soft == resource.RLIM_INFINITY or value < soft:
+        resource.setrlimit(kind, (value, hard))
+
+
+@contextlib.contextmanager
+def apply_limits(limits: ResourceLimits) -> Iterator[None]:
+    """Enforce limits for the duration of the block.
+
+    The memory limit bounds the address space the block may add to the
+    process (``RLIMIT_AS``); the CPU limit bounds the CPU time it may use
+    (``RLIMIT_CPU``, whole seconds, signalled with ``SIGXCPU``). Only soft
+    limits are changed, so the previous limits are restored afterwards.
+    Limits are ignored where ``is_supported`` is False.
+
+    Args:
+        limits: Limits to enforce
+
+    Yields:
+        None
+
+    Raises:
+        LimitExceeded: If the block exceeded a limit
+    """
+    if not limits or not is_supported():
+        yield
+        return
+
+    saved = {}
+    previous_handler = None
+    try:
+        if limits.max_memory is not None:
+            saved[resource.RLIMIT_AS] = resource.getrlimit(resource.RLIMIT_AS)
+            _lower_soft_limit(resource.RLIMIT_AS, _address_space_size() + limits.max_memory)
+
+        if limits.max_cpu_seconds is not None:
+
+            def on_cpu_limit(signum, frame) -> None:
+                raise LimitExceeded("cpu", limits.max_cpu_seconds)
+
+            previous_handler = signal.signal(signal.SIGXCPU, on_cpu_limit)
+            saved[resource.RLIMIT_CPU] = resource.getrlimit(resource.RLIMIT_CPU)
+            _lower_soft_limit(
+                resource.RLIMIT_CPU, math.ceil(_cpu_seconds() + limits.max_cpu_seconds)
+            )
+
+        try:
+            yield
+        except MemoryError as e:
+            if limits.max_memory is None:
+                raise
+            raise LimitExceeded("memory", limits.max_memory) from e
+    finally:
+        for kind, value in saved.items():
+            resource.setrlimit(kind, value)
+        if previous_handler is not None:
+            signal.signal(signal.SIGXCPU, previous_handler)
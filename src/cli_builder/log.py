@@ -0,0 +1,218 @@
+"""Verbosity-levelled logging of the framework and commands."""
+
+import contextlib
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from .streams import current_stderr
+
+LOGGER_NAME = "cli_builder"
+
+DEFAULT_LEVEL = logging.WARNING
+LOG_FORMAT = "%(levelname)s %(name)s: %(message)s"
+
+# Records buffered before the handler writes them out
+DEFAULT_CAPACITY = 1000
+
+# Seconds a record may wait in the buffer before the next record flushes it
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_level_var: "ContextVar[Optional[int]]" = ContextVar("cli_builder_log_level", default=None)
+
+_install_lock = threading.Lock()
+
+
+def verbosity_level(verbose: int, quiet: int) -> int:
+    """Map ``-v``/``-q`` counts to a logging level.
+
+    Each ``-v`` lowers the level by one step from ``WARNING`` (``-v`` is
+    ``INFO``, ``-vv`` is ``DEBUG``); each ``-q`` raises it by one step.
+
+    Args:
+        verbose: Number of ``-v`` flags
+        quiet: Number of ``-q`` flags
+
+    Returns:
+        Logging level between ``DEBUG`` and ``CRITICAL``
+    """
+    level = DEFAULT_LEVEL + 10 * (quiet - verbose)
+    return min(max(level, logging.DEBUG), logging.CRITICAL)
+
+
+class InvocationLevelFilter(logging.Filter):
+    """Filter dropping records below the level of the current invocation.
+
+    The level set with ``log_level`` only applies to the calling thread
+    (or task), so concurrent invocations asking for different verbosity
+    do not see each other's setting. Outside ``log_level`` blocks
+    ``default_level`` applies.
+    """
+
+    def __init__(self, default_level: int = DEFAULT_LEVEL):
+        """Initialize filter.
+
+        Args:
+            default_level: Level applied when no invocation set one
+        """
+        super().__init__()
+        self.default_level = default_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Check whether a record reaches the current invocation's level.
+
+        Args:
+            record: Log record
+
+        Returns:
+            True to keep the record
+        """
+        level = _level_var.get()
+        return record.levelno >= (self.default_level if level is None else level)
+
+
+_level_filter = InvocationLevelFilter()
+
+
+class BufferedStreamHandler(logging.Handler):
+    """Handler batching records and writing them to standard error.
+
+    Records are kept with the standard error stream of the invocation
+    that emitted them and formatted only when the buffer is flushed:
+    when it holds ``capacity`` records, when a record of ``flush_level``
+    or above arrives, when a record arrives ``flush_interval`` seconds
+    after the last flush, and at the end of every command invocation.
+    Each flush issues one write per stream.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        flush_level: int = logging.ERROR,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """Initialize handler.
+
+        Args:
+            capacity: Number of buffered records triggering a flush
+            flush_level: Level of records flushed immediately
+            flush_interval: Seconds after which a new record flushes the buffer
+        """
+        super().__init__()
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self.flush_interval = flush_interval
+        self.buffer: List[Tuple[IO[str], logging.LogRecord]] = []
+        self.__flushed_at = time.monotonic()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Buffer a record.
+
+        Args:
+            record: Log record
+        """
+        self.buffer.append((current_stderr(), record))
+        if (
+            len(self.buffer) >= self.capacity
+            or record.levelno >= self.flush_level
+            or time.monotonic() - self.__flushed_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Format and write the buffered records."""
+        self.acquire()
+        try:
+            buffer, self.buffer = self.buffer, []
+            self.__flushed_at = time.monotonic()
+        finally:
+            self.release()
+
+        batches: Dict[int, Tuple[IO[str], logging.LogRecord, List[str]]] = {}
+        for stream, record in buffer:
+            try:
+                line = self.format(record)
+            except Exception:
+                self.handleError(record)
+                continue
+            batches.setdefault(id(stream), (stream, record, []))[2].append(line)
+        for stream, record, lines in batches.values():
+            if getattr(stream, "closed", False):
+                # The invocation that logged the records is gone
+                continue
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except Exception:
+                self.handleError(record)
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """Get the framework logger or one of its children.
+
+    Use ``%``-style arguments (``logger.debug("read %d rows", count)``)
+    rather than f-strings: a record below the level of the invocation is
+    dropped by the logger's filter, and its message is never formatted.
+
+    Args:
+        name: Child logger name, e.g. the CLI name
+
+    Returns:
+        Logger below ``cli_builder``
+    """
+    logger = logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+    if _level_filter not in logger.filters:
+        # Also keeps dropped records from propagating to other handlers
+        logger.addFilter(_level_filter)
+    return logger
+
+
+def install_handler() -> BufferedStreamHandler:
+    """Attach the buffered handler to the framework logger once.
+
+    Levels are then applied per invocation by ``InvocationLevelFilter``,
+    so the framework logger is set to pass every record. A level
+    configured on it before becomes the default level of invocations,
+    ``DEFAULT_LEVEL`` otherwise.
+
+    Returns:
+        Installed handler
+    """
+    logger = get_logger()
+    with _install_lock:
+        for handler in logger.handlers:
+            if isinstance(handler, BufferedStreamHandler):
+                return handler
+        handler = BufferedStreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(_level_filter)
+        logger.addHandler(handler)
+        if logger.level != logging.NOTSET:
+            _level_filter.default_level = logger.level
+        logger.setLevel(logging.DEBUG)
+        return handler
+
+
+@contextlib.contextmanager
+def log_level(level: Optional[int]) -> Iterator[None]:
+    """Set the logging level of the current context for the duration of the block.
+
+    Like ``redirect_output`` the level only applies to the calling thread
+    (or task); the level of the framework logger is left alone.
+
+    Args:
+        level: Logging level, or None to keep the current one
+
+    Yields:
+        None
+    """
+    if level is None:
+        yield
+        return
+    token = _level_var.set(level)
+    try:
+        yield
+    finally:
+        _level_var.reset(token)
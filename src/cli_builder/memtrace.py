@@ -0,0 +1,161 @@
+"""Tracing of memory allocated by command invocations."""
+
+import threading
+import tracemalloc
+from typing import IO, Any, Callable, Dict, List, Tuple
+
+# Number of allocation sites in a report
+TOP_SITES = 10
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_lock = threading.Lock()
+_users = 0
+
+
+def format_size(size: float) -> str:
+    """Format a byte count with a binary unit.
+
+    Args:
+        size: Number of bytes (may be negative)
+
+    Returns:
+        Text such as ``1.5 MiB``
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def _start() -> None:
+    global _users
+    with _lock:
+        if _users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _users = 1
+        elif _users:
+            _users += 1
+
+
+def _stop() -> None:
+    global _users
+    with _lock:
+        if _users:
+            _users -= 1
+            if _users == 0:
+                tracemalloc.stop()
+
+
+class MemoryTracker:
+    """Memory retained by invocations, accumulated per command name.
+
+    Retained memory is what an invocation allocated and did not free. A
+    command whose cumulative growth keeps increasing over repeated runs
+    (in the shell, in watch mode) is likely leaking.
+    """
+
+    def __init__(self) -> None:
+        """Initialize tracker."""
+        self.__lock = threading.Lock()
+        self.__growth: Dict[str, Tuple[int, int]] = {}
+
+    def record(self, name: str, retained: int) -> Tuple[int, int]:
+        """Add the retained memory of one invocation.
+
+        Args:
+            name: Command name
+            retained: Bytes retained by the invocation
+
+        Returns:
+            Cumulative retained bytes and number of invocations of the command
+        """
+        with self.__lock:
+            total, runs = self.__growth.get(name, (0, 0))
+            self.__growth[name] = (total + retained, runs + 1)
+            return self.__growth[name]
+
+    def growth(self) -> Dict[str, Tuple[int, int]]:
+        """Get cumulative retained bytes and invocation counts per command.
+
+        Returns:
+            Mapping of command name to ``(bytes, invocations)``
+        """
+        with self.__lock:
+            return dict(self.__growth)
+
+
+def trace_memory(
+    func: Callable[[], Any], name: str, tracker: MemoryTracker, stream: IO[str]
+) -> Any:
+    """Call a function and report the memory it allocated.
+
+    ``tracemalloc`` snapshots are taken before and after the call; the
+    report lists the peak traced memory during the call, the memory it
+    retained, the allocation sites that grew most and the cumulative
+    growth of the command in this process. Before Python 3.9 the peak
+    cannot be reset, so a call staying below an earlier peak reports the
+    memory allocated at its end instead. Tracing is process wide, so
+    invocations running concurrently in threads see each other's
+    allocations.
+
+    Args:
+        func: Function without arguments
+        name: Command name
+        tracker: Accumulator of growth per command
+        stream: Stream receiving the report
+
+    Returns:
+        Function result
+    """
+    try:
+        _start()
+        before = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        baseline, earlier_peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+            earlier_peak = 0
+        try:
+            return func()
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            if peak <= earlier_peak:
+                # Peak predates the call; what is still allocated is a lower bound
+                peak = current
+            after = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            _report(name, before, after, max(peak - baseline, 0), tracker, stream)
+    finally:
+        _stop()
+
+
+def _report(
+    name: str,
+    before: tracemalloc.Snapshot,
+    after: tracemalloc.Snapshot,
+    peak: int,
+    tracker: MemoryTracker,
+    stream: IO[str],
+) -> None:
+    stats = after.compare_to(before, "lineno")
+    retained = sum(stat.size_diff for stat in stats)
+    total, runs = tracker.record(name, retained)
+
+    lines: List[str] = [
+        f"{name}: peak {format_size(peak)}, retained {format_size(retained)}",
+    ]
+    growing = [stat for stat in stats if stat.size_diff > 0][:TOP_SITES]
+    for stat in growing:
+        frame = stat.traceback[0]
+        lines.append(
+            f"  {format_size(stat.size_diff):>10} {stat.count_diff:+8d} blocks"
+            f"  {frame.filename}:{frame.lineno}"
+        )
+    if runs > 1:
+        lines.append(f"{name}: cumulative growth {format_size(total)} over {runs} runs")
+    stream.write("\n".join(lines) + "\n")
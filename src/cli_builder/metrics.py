@@ -0,0 +1,256 @@
+"""Invocation metrics in Prometheus text format."""
+
+import bisect
+import http.server
+import json
+import re
+import threading
+from typing import Callable, Dict, List, Tuple
+
+import attrs
+
+from .storage import atomic_write, file_lock
+
+# Upper bounds of latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@attrs.define(slots=True)
+class CommandMetrics:
+    """Counters and latency histogram of one command."""
+
+    invocations: int = attrs.field(default=0)
+    failures: int = attrs.field(default=0)
+    duration_sum: float = attrs.field(default=0.0)
+    # Non-cumulative counts per bucket, the last one for +Inf
+    buckets: List[int] = attrs.field(factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def merge(self, other: "CommandMetrics") -> None:
+        """Add the values of another instance.
+
+        Args:
+            other: Metrics to add
+        """
+        self.invocations += other.invocations
+        self.failures += other.failures
+        self.duration_sum += other.duration_sum
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+
+class MetricsRegistry:
+    """Thread-safe in-memory metrics of command invocations.
+
+    Recording an invocation takes a lock and a bisection over the bucket
+    bounds, so it costs about a microsecond.
+    """
+
+    def __init__(self) -> None:
+        """Initialize registry."""
+        self.__lock = threading.Lock()
+        self.__commands: Dict[str, CommandMetrics] = {}
+        self.__reported: Dict[str, CommandMetrics] = {}
+
+    def observe(self, command: str, seconds: float, failed: bool) -> None:
+        """Record one invocation.
+
+        Args:
+            command: Command name
+            seconds: Duration of the invocation
+            failed: Whether the invocation failed
+        """
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self.__lock:
+            metrics = self.__commands.get(command)
+            if metrics is None:
+                metrics = self.__commands[command] = CommandMetrics()
+            metrics.invocations += 1
+            metrics.failures += failed
+            metrics.duration_sum += seconds
+            metrics.buckets[index] += 1
+
+    def snapshot(self) -> Dict[str, CommandMetrics]:
+        """Copy the metrics recorded so far.
+
+        Returns:
+            Metrics per command name
+        """
+        with self.__lock:
+            return {name: _copy(metrics) for name, metrics in self.__commands.items()}
+
+    def deltas(self) -> Dict[str, CommandMetrics]:
+        """Get the metrics recorded since the previous call.
+
+        Returns:
+            Metrics per command name with new invocations
+        """
+        with self.__lock:
+            result = {}
+            for name, metrics in self.__commands.items():
+                previous = self.__reported.get(name, CommandMetrics())
+                if metrics.invocations == previous.invocations:
+                    continue
+                result[name] = CommandMetrics(
+                    invocations=metrics.invocations - previous.invocations,
+                    failures=metrics.failures - previous.failures,
+                    duration_sum=metrics.duration_sum - previous.duration_sum,
+                    buckets=[a - b for a, b in zip(metrics.buckets, previous.buckets)],
+                )
+                self.__reported[name] = _copy(metrics)
+            return result
+
+
+def _copy(metrics: CommandMetrics) -> CommandMetrics:
+    return attrs.evolve(metrics, buckets=list(metrics.buckets))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(prefix: str, commands: Dict[str, CommandMetrics]) -> str:
+    """Render metrics in the Prometheus text exposition format.
+
+    Args:
+        prefix: Metric name prefix (sanitized)
+        commands: Metrics per command name
+
+    Returns:
+        Exposition text
+    """
+    prefix = re.sub(r"[^a-zA-Z0-9_]", "_", prefix)
+    names = sorted(commands)
+    lines = [
+        f"# HELP {prefix}_invocations_total Command invocations.",
+        f"# TYPE {prefix}_invocations_total counter",
+    ]
+    for name in names:
+        label = f'command="{_escape(name)}"'
+        lines.append(f"{prefix}_invocations_total{{{label}}} {commands[name].invocations}")
+    lines += [
+        f"# HELP {prefix}_failures_total Command invocations with a non-zero exit code.",
+        f"# TYPE {prefix}_failures_total counter",
+    ]
+    for name in names:
+        label = f'command="{_escape(name)}"'
+        lines.append(f"{prefix}_failures_total{{{label}}} {commands[name].failures}")
+    lines += [
+        f"# HELP {prefix}_duration_seconds Command execution time.",
+        f"# TYPE {prefix}_duration_seconds histogram",
+    ]
+    for name in names:
+        metrics = commands[name]
+        label = f'command="{_escape(name)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (None,), metrics.buckets):
+            cumulative += count
+            le = "+Inf" if bound is None else _number(bound)
+            lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f"{prefix}_duration_seconds_sum{{{label}}} {_number(metrics.duration_sum)}")
+        lines.append(f"{prefix}_duration_seconds_count{{{label}}} {metrics.invocations}")
+    return "\n".join(lines) + "\n"
+
+
+def _load(path: str) -> Dict[str, CommandMetrics]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        commands = {}
+        for name, values in data.get("commands", {}).items():
+            metrics = CommandMetrics(**values)
+            numbers = [metrics.invocations, metrics.failures, metrics.duration_sum]
+            if not all(isinstance(number, (int, float)) for number in numbers + metrics.buckets):
+                raise TypeError(f"invalid metrics of {name!r}")
+            if len(metrics.buckets) == len(LATENCY_BUCKETS) + 1:
+                commands[name] = metrics
+    except (OSError, ValueError, AttributeError, TypeError):
+        # Unreadable or not written by this version: start over
+        return {}
+    return commands
+
+
+def merge_into_file(path: str, deltas: Dict[str, CommandMetrics]) -> Dict[str, CommandMetrics]:
+    """Add metrics to the totals kept in a state file.
+
+    The file is updated under an exclusive lock and replaced atomically,
+    so concurrent processes never lose increments.
+
+    Args:
+        path: State file path
+        deltas: Metrics recorded since the last merge
+
+    Returns:
+        Updated totals per command name
+    """
+    with file_lock(path + ".lock"):
+        totals = _load(path)
+        for name, metrics in deltas.items():
+            totals.setdefault(name, CommandMetrics()).merge(metrics)
+        data = {"commands": {name: attrs.asdict(metrics) for name, metrics in totals.items()}}
+        atomic_write(path, json.dumps(data, sort_keys=True).encode("utf-8"))
+    return totals
+
+
+def write_textfile(path: str, text: str) -> None:
+    """Write a textfile collector file atomically.
+
+    Args:
+        path: Destination (``*.prom``)
+        text: Exposition text
+    """
+    atomic_write(path, text.encode("utf-8"))
+
+
+class MetricsServer:
+    """HTTP endpoint serving metrics from a background thread."""
+
+    def __init__(self, render_text: Callable[[], str], host: str = "127.0.0.1", port: int = 0):
+        """Start serving.
+
+        Args:
+            render_text: Function returning the exposition text
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = render_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.__server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, name="metrics-server", daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Get the address the server listens on.
+
+        Returns:
+            Host and port
+        """
+        return self.__server.server_address[:2]
+
+    def close(self) -> None:
+        """Stop serving."""
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
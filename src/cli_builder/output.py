@@ -0,0 +1,196 @@
+"""Streaming of command results to output streams."""
+
+import contextlib
+import os
+import time
+from typing import IO, Any, Callable, Iterable, Iterator, List
+
+# Exit code of a process killed by SIGPIPE in POSIX shells (128 + 13)
+BROKEN_PIPE_EXIT_CODE = 141
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.1
+
+
+def is_streamable(result: Any) -> bool:
+    """Check whether a command result is a collection of items to write.
+
+    Strings, bytes and mappings are single values, not item streams.
+
+    Args:
+        result: Command result
+
+    Returns:
+        True for iterables such as generators, lists and tuples
+    """
+    if result is None or isinstance(result, (str, bytes, bytearray, dict, int)):
+        return False
+    return hasattr(result, "__iter__")
+
+
+def on_exhausted(items: Iterator[Any], callback: Callable[[], None]) -> Iterator[Any]:
+    """Pass items through, then call a function once all were consumed.
+
+    The function is not called if the consumer stops early (closes the
+    iterator) or iteration fails.
+
+    Args:
+        items: Lazily produced items
+        callback: Function called after the last item
+
+    Yields:
+        Items of ``items``
+    """
+    yield from items
+    callback()
+
+
+def hold_open(items: Iterator[Any], stack: contextlib.ExitStack) -> Iterator[Any]:
+    """Keep contexts entered while producing items open until they are consumed.
+
+    The contexts are exited when the returned iterator is exhausted,
+    fails, or is closed, including when it is closed (or garbage
+    collected) before the first item was requested.
+
+    Args:
+        items: Lazily produced items
+        stack: Entered contexts, e.g. taken with ``ExitStack.pop_all``
+
+    Returns:
+        Iterator over ``items``
+    """
+
+    def generate() -> Iterator[Any]:
+        with stack:
+            yield None
+            yield from items
+
+    generator = generate()
+    next(generator)
+    return generator
+
+
+class LineWriter:
+    """Writer coalescing many small lines into large writes.
+
+    Lines are collected in memory and written as one chunk once the buffer
+    reaches ``buffer_size`` characters or ``flush_interval`` seconds passed
+    since the last write. Interactive streams are flushed every line.
+    """
+
+    def __init__(
+        self,
+        stream: IO[str],
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """Initialize writer.
+
+        Args:
+            stream: Destination stream
+            buffer_size: Buffered characters triggering a write
+            flush_interval: Maximum seconds lines stay buffered while items arrive
+        """
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        try:
+            interactive = stream.isatty()
+        except (AttributeError, ValueError):
+            interactive = False
+        if interactive:
+            self.buffer_size = 0
+
+        self.__parts: List[str] = []
+        self.__size = 0
+        self.__last_flush = time.monotonic()
+
+    def write_line(self, text: str) -> None:
+        """Buffer one line.
+
+        Args:
+            text: Line text without the trailing newline
+        """
+        self.__parts.append(text)
+        self.__parts.append("\n")
+        self.__size += len(text) + 1
+        if self.__size >= self.buffer_size:
+            self.flush()
+        elif time.monotonic() - self.__last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered lines to the stream."""
+        if self.__parts:
+            data = "".join(self.__parts)
+            self.__parts = []
+            self.__size = 0
+            self.stream.write(data)
+        self.stream.flush()
+        self.__last_flush = time.monotonic()
+
+
+def silence_broken_pipe(stream: IO[str]) -> None:
+    """Point the descriptor of a stream whose reader went away to /dev/null.
+
+    Prevents another ``BrokenPipeError`` when the interpreter flushes the
+    stream at exit.
+
+    Args:
+        stream: Stream that raised ``BrokenPipeError``
+    """
+    with contextlib.suppress(AttributeError, OSError, ValueError):
+        fd = stream.fileno()
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, fd)
+        os.close(devnull)
+
+
+def write_lines(
+    lines: Iterable[str], stream: IO[str], source: Any = None, **writer_options: Any
+) -> int:
+    """Write lines through a coalescing buffer.
+
+    If the reader closes the pipe (e.g. ``| head``), iteration stops at
+    once and the producing generator is closed.
+
+    Args:
+        lines: Lines without trailing newlines
+        stream: Destination stream
+        source: Iterable the lines are produced from (closed when done)
+        **writer_options: Options of ``LineWriter``
+
+    Returns:
+        Exit code (``BROKEN_PIPE_EXIT_CODE`` if the reader went away)
+    """
+    writer = LineWriter(stream, **writer_options)
+    try:
+        try:
+            for line in lines:
+                writer.write_line(line)
+        finally:
+            # Lines produced before a failure are still written
+            writer.flush()
+    except BrokenPipeError:
+        silence_broken_pipe(stream)
+        return BROKEN_PIPE_EXIT_CODE
+    finally:
+        for iterable in (lines, source):
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+    return 0
+
+
+def write_items(items: Iterable[Any], stream: IO[str], **writer_options: Any) -> int:
+    """Write items one per line through a coalescing buffer.
+
+    Args:
+        items: Items to write
+        stream: Destination stream
+        **writer_options: Options of ``LineWriter``
+
+    Returns:
+        Exit code (``BROKEN_PIPE_EXIT_CODE`` if the reader went away)
+    """
+    return write_lines((str(item) for item in items), stream, source=items, **writer_options)
@@ -0,0 +1,187 @@
+"""Profiling of command execution."""
+
+import cProfile
+import collections
+import os
+import pstats
+import signal
+import sys
+import threading
+from types import FrameType
+from typing import IO, Any, Callable, Counter, Iterator, List, Optional, Tuple
+
+PROFILERS = ("cprofile", "sampling")
+
+# Number of functions in the printed summary
+TOP_FUNCTIONS = 20
+
+# Seconds of CPU time between samples of the sampling profiler
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+def frame_label(frame: FrameType) -> str:
+    """Describe a frame for collapsed stack output.
+
+    Args:
+        frame: Stack frame
+
+    Returns:
+        ``function (file:line)`` without semicolons
+    """
+    code = frame.f_code
+    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label.replace(";", ",")
+
+
+class SamplingProfiler:
+    """Statistical profiler recording the stack of one thread periodically.
+
+    On the main thread samples are driven by the ``SIGPROF`` interval
+    timer, so they are taken every ``interval`` seconds of CPU time and an
+    idle command costs nothing. Other threads are sampled from a helper
+    thread every ``interval`` seconds of wall-clock time. Only frames
+    called below the frame that started the profiler are recorded.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """Initialize profiler.
+
+        Args:
+            interval: Time between samples in seconds
+        """
+        self.interval = interval
+        self.stacks: Counter[Tuple[str, ...]] = collections.Counter()
+        self.__thread_id = 0
+        self.__root: Optional[FrameType] = None
+        self.__previous_handler = None
+        self.__sampler: Optional[threading.Thread] = None
+        self.__stop = threading.Event()
+
+    def __sample(self, frame: Optional[FrameType]) -> None:
+        labels = []
+        while frame is not None and frame is not self.__root:
+            labels.append(frame_label(frame))
+            frame = frame.f_back
+        if frame is not None and labels:
+            labels.reverse()
+            self.stacks[tuple(labels)] += 1
+
+    def __on_signal(self, signum, frame) -> None:
+        self.__sample(frame)
+
+    def __run_sampler(self) -> None:
+        while not self.__stop.wait(self.interval):
+            self.__sample(sys._current_frames().get(self.__thread_id))
+
+    def start(self) -> None:
+        """Start sampling the functions called by the caller of this method."""
+        self.__thread_id = threading.get_ident()
+        self.__root = sys._getframe(1)
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self.__previous_handler = signal.signal(signal.SIGPROF, self.__on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.__stop.clear()
+            self.__sampler = threading.Thread(
+                target=self.__run_sampler, name="sampling-profiler", daemon=True
+            )
+            self.__sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self.__sampler is not None:
+            self.__stop.set()
+            self.__sampler.join()
+            self.__sampler = None
+        elif self.__previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self.__previous_handler)
+            self.__previous_handler = None
+        self.__root = None
+
+    def collapsed(self) -> Iterator[str]:
+        """Format samples as collapsed stacks for flame graph tools.
+
+        Returns:
+            Iterator over ``frame;frame;frame count`` lines
+        """
+        for stack, count in sorted(self.stacks.items()):
+            yield f"{';'.join(stack)} {count}"
+
+    def top(self, limit: int = TOP_FUNCTIONS) -> List[Tuple[str, int, int]]:
+        """Get the functions present in most samples.
+
+        Args:
+            limit: Maximum number of functions
+
+        Returns:
+            ``(function, cumulative samples, own samples)`` sorted by
+            cumulative samples
+        """
+        cumulative: Counter[str] = collections.Counter()
+        own: Counter[str] = collections.Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack):
+                cumulative[label] += count
+            own[stack[-1]] += count
+        return [(label, total, own[label]) for label, total in cumulative.most_common(limit)]
+
+
+def _report_samples(profiler: SamplingProfiler, path: Optional[str], stream: IO[str]) -> None:
+    if path:
+        with open(path, "w", encoding="utf-8") as handle:
+            for line in profiler.collapsed():
+                handle.write(line + "\n")
+
+    total = sum(profiler.stacks.values())
+    if not total:
+        print("No samples collected", file=stream)
+        return
+    print(f"{total} samples every {profiler.interval * 1000:g} ms of CPU time", file=stream)
+    print(f"{'cumulative':>12} {'own':>8}  function", file=stream)
+    for label, cumulative, own in profiler.top():
+        print(f"{cumulative / total:>11.1%} {own / total:>8.1%}  {label}", file=stream)
+
+
+def _report_stats(profiler: cProfile.Profile, path: Optional[str], stream: IO[str]) -> None:
+    if path:
+        profiler.dump_stats(path)
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+
+
+def run_profiled(
+    func: Callable[[], Any], path: Optional[str], profiler: str, stream: IO[str]
+) -> Any:
+    """Call a function under a profiler and report the top functions.
+
+    Args:
+        func: Function without arguments
+        path: File receiving the profile (pstats for ``cprofile``,
+            collapsed stacks for ``sampling``), or None for the summary only
+        profiler: One of ``PROFILERS``
+        stream: Stream receiving the summary
+
+    Returns:
+        Function result
+
+    Raises:
+        ValueError: If the profiler is unknown
+    """
+    if profiler == "cprofile":
+        deterministic = cProfile.Profile()
+        deterministic.enable()
+        try:
+            return func()
+        finally:
+            deterministic.disable()
+            _report_stats(deterministic, path, stream)
+    if profiler == "sampling":
+        sampler = SamplingProfiler()
+        sampler.start()
+        try:
+            return func()
+        finally:
+            sampler.stop()
+            _report_samples(sampler, path, stream)
+    raise ValueError(f"Unknown profiler: {profiler}")
@@ -0,0 +1,138 @@
+"""Interactive shell running commands of a CLI in one process."""
+
+import cmd
+import shlex
+from typing import IO, TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .cli import CLI
+
+EXIT_COMMANDS = ("exit", "quit")
+
+
+class Shell(cmd.Cmd):
+    """Read-eval-print loop over the commands of a CLI.
+
+    Every line is run with ``CLI.run`` in the same process, so parsers built
+    for the first line are reused by the following ones and imported modules
+    and initialized state stay alive for the whole session.
+    """
+
+    def __init__(
+        self,
+        cli: "CLI",
+        stdin: Optional[IO[str]] = None,
+        stdout: Optional[IO[str]] = None,
+    ):
+        """Initialize shell.
+
+        Args:
+            cli: CLI whose commands are run
+            stdin: Input stream (None reads from the terminal with line editing)
+            stdout: Output stream for prompts and messages
+        """
+        super().__init__(stdin=stdin, stdout=stdout)
+        self.cli = cli
+        self.use_rawinput = stdin is None
+        self.prompt = f"{cli.name}> "
+        self.intro = f"{cli.name} {cli.version} interactive shell. Type 'exit' to quit."
+        self.last_exit_code = 0
+
+    def emptyline(self) -> bool:
+        """Do nothing on an empty line."""
+        return False
+
+    def onecmd(self, line: str) -> bool:
+        """Run one line as a CLI invocation.
+
+        Args:
+            line: Input line
+
+        Returns:
+            True if the shell should stop
+        """
+        line = line.strip()
+        if not line:
+            return self.emptyline()
+        if line == "EOF" or line in EXIT_COMMANDS:
+            return True
+
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            self.stdout.write(f"Parse error: {e}\n")
+            self.last_exit_code = 1
+            return False
+
+        if argv[0] == self.cli.SHELL_COMMAND_NAME:
+            self.stdout.write("Already in the interactive shell\n")
+            return False
+
+        self.last_exit_code = self.cli.run(argv)
+        return False
+
+    def completenames(self, text: str, *ignored) -> List[str]:
+        """Complete command names.
+
+        Args:
+            text: Prefix being completed
+
+        Returns:
+            Matching command names
+        """
+        names = [name for name in self.cli.commands if name != self.cli.SHELL_COMMAND_NAME]
+        names.extend(EXIT_COMMANDS)
+        return sorted(name for name in names if name.startswith(text))
+
+    def completedefault(self, text: str, line: str, begidx: int, endidx: int) -> List[str]:
+        """Complete option names and choices of the command on the line.
+
+        After an option with choices its values are completed; elsewhere
+        a word not starting with ``-`` completes the choices of the
+        command's arguments. Dynamic choices are evaluated here, on first
+        completion.
+
+        Args:
+            text: Prefix being completed
+            line: Whole input line
+            begidx: Start index of the prefix
+            endidx: End index of the prefix
+
+        Returns:
+            Matching option strings or choices
+        """
+        words = line[:begidx].split()
+        command = self.cli.commands.get(words[0]) if words else None
+        if command is None:
+            return []
+
+        if text.startswith("-"):
+            candidates = []
+            for opt in command.options:
+                candidates.append(f"--{opt['name']}")
+                if opt.get("short"):
+                    candidates.append(f"-{opt['short']}")
+            return sorted(c for c in candidates if c.startswith(text))
+
+        previous = words[-1] if len(words) > 1 else ""
+        sources = []
+        for opt in command.options:
+            names = {f"--{opt['name']}", f"-{opt['short']}" if opt.get("short") else None}
+            if previous in names:
+                sources.append(opt.get("choices"))
+        if not previous.startswith("-"):
+            sources = [arg.get("choices") for arg in command.arguments]
+        values = {str(value) for choices in sources if choices is not None for value in choices}
+        return sorted(value for value in values if value.startswith(text))
+
+    def run(self) -> int:
+        """Run the loop until exit or end of input.
+
+        Returns:
+            Exit code of the last command
+        """
+        try:
+            self.cmdloop()
+        except KeyboardInterrupt:
+            self.stdout.write("\n")
+        return self.last_exit_code
@@ -0,0 +1,231 @@
+"""Lazily initialized shared resources injected into commands."""
+
+import atexit
+import contextlib
+import inspect
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Placeholder of an instance being created
+_RESERVED = object()
+
+# Registries whose instances must not be shared with forked children
+_registries: "weakref.WeakSet[ResourceRegistry]" = weakref.WeakSet()
+
+
+class ResourcePool:
+    """Pool of instances created by one resource factory.
+
+    Instances are created on first acquisition, up to ``size`` of them,
+    and reused afterwards. A factory may be a generator function: the
+    yielded value is the instance and the code after ``yield`` runs on
+    teardown.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        size: int = 1,
+        teardown: Optional[Callable[[Any], None]] = None,
+    ):
+        """Initialize pool.
+
+        Args:
+            name: Resource name
+            factory: Function creating an instance
+            size: Maximum number of instances
+            teardown: Function releasing an instance
+
+        Raises:
+            ValueError: If the size is not positive
+        """
+        if size < 1:
+            raise ValueError(f"Pool size of resource '{name}' must be positive")
+
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.teardown = teardown
+        self.__condition = threading.Condition()
+        self.__idle: List[Any] = []
+        self.__generators: Dict[int, Iterator[Any]] = {}
+        self.__instances: List[Any] = []
+
+    @property
+    def created(self) -> int:
+        """Get the number of live instances.
+
+        Returns:
+            Number of instances created and not torn down
+        """
+        return len(self.__instances)
+
+    def __create(self) -> Any:
+        if inspect.isgeneratorfunction(self.factory):
+            generator = self.factory()
+            instance = next(generator)
+            self.__generators[id(instance)] = generator
+            return instance
+        return self.factory()
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Take an instance, creating one if the pool is not full.
+
+        Args:
+            timeout: Maximum time to wait for a free instance
+
+        Returns:
+            Resource instance
+
+        Raises:
+            TimeoutError: If no instance became free in time
+        """
+        with self.__condition:
+            while not self.__idle and len(self.__instances) >= self.size:
+                if not self.__condition.wait(timeout):
+                    raise TimeoutError(f"Timed out waiting for resource '{self.name}'")
+            if self.__idle:
+                return self.__idle.pop()
+            # Reserve a slot, create outside the lock
+            self.__instances.append(_RESERVED)
+
+        try:
+            instance = self.__create()
+        except BaseException:
+            with self.__condition:
+                self.__instances.remove(_RESERVED)
+                self.__condition.notify()
+            raise
+
+        with self.__condition:
+            self.__instances[self.__instances.index(_RESERVED)] = instance
+        return instance
+
+    def release(self, instance: Any) -> None:
+        """Return an instance to the pool.
+
+        Args:
+            instance: Instance taken with ``acquire``
+        """
+        with self.__condition:
+            self.__idle.append(instance)
+            self.__condition.notify()
+
+    def close(self) -> None:
+        """Tear down all idle instances."""
+        with self.__condition:
+            idle, self.__idle = self.__idle, []
+            closed = {id(instance) for instance in idle}
+            self.__instances = [i for i in self.__instances if id(i) not in closed]
+
+        for instance in idle:
+            generator = self.__generators.pop(id(instance), None)
+            if generator is not None:
+                with contextlib.suppress(StopIteration):
+                    next(generator)
+            elif self.teardown is not None:
+                self.teardown(instance)
+
+    def forget(self) -> None:
+        """Drop all instances without tearing them down.
+
+        Called in forked children, where the lock may have been held by a
+        thread that does not exist in the child, so it is recreated.
+        """
+        self.__condition = threading.Condition()
+        self.__idle = []
+        self.__instances = []
+        self.__generators = {}
+
+
+class ResourceRegistry:
+    """Named resource pools and their injection into command functions."""
+
+    def __init__(self) -> None:
+        """Initialize registry."""
+        self.__pools: Dict[str, ResourcePool] = {}
+        self.__params: Dict[Callable, Tuple[str, ...]] = {}
+        self.__atexit_registered = False
+        _registries.add(self)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__pools
+
+    def __getitem__(self, name: str) -> ResourcePool:
+        return self.__pools[name]
+
+    def register(self, pool: ResourcePool) -> None:
+        """Register a resource pool.
+
+        Args:
+            pool: Pool to register
+        """
+        self.__pools[pool.name] = pool
+        self.__params.clear()
+        if not self.__atexit_registered:
+            atexit.register(self.close)
+            self.__atexit_registered = True
+
+    def requested_by(self, func: Callable) -> Tuple[str, ...]:
+        """Get the resources a function receives by parameter name.
+
+        Args:
+            func: Command function
+
+        Returns:
+            Names of requested resources
+        """
+        names = self.__params.get(func)
+        if names is None:
+            if self.__pools:
+                params = inspect.signature(func).parameters
+                names = tuple(name for name in params if name in self.__pools)
+            else:
+                names = ()
+            self.__params[func] = names
+        return names
+
+    @contextlib.contextmanager
+    def acquire(self, names: Tuple[str, ...]) -> Iterator[Dict[str, Any]]:
+        """Take instances of several resources for the duration of the block.
+
+        Resources are taken in name order, so commands requesting the same
+        resources in different parameter orders cannot deadlock.
+
+        Args:
+            names: Resource names
+
+        Yields:
+            Mapping of resource name to instance
+        """
+        taken: Dict[str, Any] = {}
+        try:
+            for name in sorted(names):
+                taken[name] = self.__pools[name].acquire()
+            yield taken
+        finally:
+            for name, instance in taken.items():
+                self.__pools[name].release(instance)
+
+    def close(self) -> None:
+        """Tear down all created instances."""
+        for pool in self.__pools.values():
+            pool.close()
+
+    def forget(self) -> None:
+        """Drop all instances without tearing them down."""
+        for pool in self.__pools.values():
+            pool.forget()
+
+
+def _forget_after_fork() -> None:
+    """Drop instances inherited by a forked child (they belong to the parent)."""
+    for registry in list(_registries):
+        registry.forget()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_after_fork)
@@ -0,0 +1,211 @@
+"""Full-text search over command names and help texts."""
+
+import bisect
+import hashlib
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .command import Command
+from .storage import atomic_write
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+# Times each token of a command name is counted, ranking name matches first
+NAME_WEIGHT = 3
+
+DEFAULT_LIMIT = 10
+
+# Format of persisted indexes
+INDEX_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms.
+
+    Args:
+        text: Text such as ``deploy-service`` or a help sentence
+
+    Returns:
+        Terms in order of appearance
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _fields(command: Command) -> List[str]:
+    fields = [command.description or ""]
+    for item in list(command.arguments) + list(command.options):
+        fields.append(item["name"])
+        fields.append(item.get("help") or "")
+    return fields
+
+
+def command_terms(command: Command) -> List[str]:
+    """Get the searchable terms of a command.
+
+    Args:
+        command: Command
+
+    Returns:
+        Terms of the name (weighted), description, arguments and options
+    """
+    terms = tokenize(command.name) * NAME_WEIGHT
+    for field in _fields(command):
+        terms.extend(tokenize(field))
+    return terms
+
+
+def commands_key(commands: Iterable[Command]) -> str:
+    """Fingerprint the searchable text of commands.
+
+    Args:
+        commands: Commands
+
+    Returns:
+        Hex digest changing whenever a name or help text changes
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(INDEX_VERSION).encode())
+    for command in sorted(commands, key=lambda command: command.name):
+        text = json.dumps([command.name] + _fields(command), ensure_ascii=False)
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SearchIndex:
+    """Inverted index of commands ranked with BM25.
+
+    A query term missing from the vocabulary matches the terms it is a
+    prefix of, so ``deplo`` finds ``deploy``.
+    """
+
+    def __init__(
+        self, names: List[str], lengths: List[int], postings: Dict[str, List[Tuple[int, int]]]
+    ):
+        """Initialize index.
+
+        Args:
+            names: Command names by document number
+            lengths: Number of terms by document number
+            postings: Document numbers and term frequencies by term
+        """
+        self.names = names
+        self.lengths = lengths
+        self.postings = postings
+        self.__vocabulary = sorted(postings)
+        self.__average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def build(cls, commands: Iterable[Command]) -> "SearchIndex":
+        """Index commands.
+
+        Args:
+            commands: Commands to index
+
+        Returns:
+            New index
+        """
+        names: List[str] = []
+        lengths: List[int] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for number, command in enumerate(sorted(commands, key=lambda command: command.name)):
+            terms = command_terms(command)
+            names.append(command.name)
+            lengths.append(len(terms))
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, frequency in frequencies.items():
+                postings.setdefault(term, []).append((number, frequency))
+        return cls(names, lengths, postings)
+
+    def __expand(self, term: str) -> List[str]:
+        if term in self.postings:
+            return [term]
+        start = bisect.bisect_left(self.__vocabulary, term)
+        end = bisect.bisect_left(self.__vocabulary, term + "\uffff")
+        return self.__vocabulary[start:end]
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, float]]:
+        """Rank commands matching a query.
+
+        Args:
+            query: Search terms
+            limit: Maximum number of results
+
+        Returns:
+            Command names and scores, best match first
+        """
+        count = len(self.names)
+        scores: Dict[int, float] = {}
+        for query_term in set(tokenize(query)):
+            for term in self.__expand(query_term):
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for number, frequency in postings:
+                    norm = K1 * (1 - B + B * self.lengths[number] / self.__average_length)
+                    score = idf * frequency * (K1 + 1) / (frequency + norm)
+                    scores[number] = scores.get(number, 0.0) + score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.names[item[0]]))
+        return [(self.names[number], score) for number, score in ranked[:limit]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the index into JSON-compatible data.
+
+        Returns:
+            Serialized index
+        """
+        return {"names": self.names, "lengths": self.lengths, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchIndex":
+        """Restore an index from ``to_dict`` data.
+
+        Args:
+            data: Serialized index
+
+        Returns:
+            Restored index
+        """
+        postings = {
+            term: [(number, frequency) for number, frequency in entries]
+            for term, entries in data["postings"].items()
+        }
+        return cls(list(data["names"]), list(data["lengths"]), postings)
+
+
+def load_index(path: str, key: str) -> Optional[SearchIndex]:
+    """Load a persisted index if it was built for the same commands.
+
+    Args:
+        path: Index file
+        key: Expected ``commands_key``
+
+    Returns:
+        Index, or None if missing, stale or unreadable
+    """
+    try:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        if data.get("key") != key:
+            return None
+        return SearchIndex.from_dict(data["index"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_index(path: str, key: str, index: SearchIndex) -> None:
+    """Persist an index atomically.
+
+    Args:
+        path: Index file
+        key: ``commands_key`` of the indexed commands
+        index: Index to save
+    """
+    data = {"key": key, "index": index.to_dict()}
+    atomic_write(path, json.dumps(data, separators=(",", ":")).encode("utf-8"))
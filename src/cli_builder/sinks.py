@@ -0,0 +1,199 @@
+"""Output files with compression done in a background thread."""
+
+import bz2
+import gzip
+import lzma
+import queue
+import threading
+from typing import IO, Any, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+    ".lzma": "lzma",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_QUEUE_SIZE = 16
+
+_CLOSE = object()
+
+
+def compression_for(path: str) -> Optional[str]:
+    """Infer the compression of a file from its extension.
+
+    Args:
+        path: File path
+
+    Returns:
+        Compression name or None for plain files
+    """
+    lowered = path.lower()
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if lowered.endswith(suffix):
+            return compression
+    return None
+
+
+def open_binary(path: str, compression: Optional[str] = None) -> IO[bytes]:
+    """Open a file for binary writing, compressing if requested.
+
+    Args:
+        path: File path
+        compression: gzip, bz2, lzma, zstd or None
+
+    Returns:
+        Writable binary file object
+
+    Raises:
+        ValueError: If the compression is unknown or not available
+    """
+    if compression is None:
+        return open(path, "wb")
+    if compression == "gzip":
+        return gzip.open(path, "wb")
+    if compression == "bz2":
+        return bz2.open(path, "wb")
+    if compression == "lzma":
+        return lzma.open(path, "wb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class BackgroundWriter:
+    """Text stream handing encoded chunks to a writer thread.
+
+    Small writes are collected into chunks of ``chunk_size`` bytes that are
+    put into a bounded queue; a background thread compresses and writes
+    them, so compression overlaps with the producer. When the queue is full
+    the producer waits, which bounds memory use.
+    """
+
+    def __init__(
+        self,
+        file: IO[bytes],
+        encoding: str = "utf-8",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        """Initialize writer and start its thread.
+
+        Args:
+            file: Binary file receiving the data
+            encoding: Text encoding
+            chunk_size: Bytes collected before a chunk is queued
+            queue_size: Maximum number of queued chunks
+        """
+        self.file = file
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.closed = False
+        self.__queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.__parts: List[bytes] = []
+        self.__size = 0
+        self.__error: Optional[BaseException] = None
+        self.__thread = threading.Thread(target=self.__drain, name="output-writer", daemon=True)
+        self.__thread.start()
+
+    def __drain(self) -> None:
+        while True:
+            chunk = self.__queue.get()
+            if chunk is _CLOSE:
+                return
+            if self.__error is not None:
+                continue
+            try:
+                self.file.write(chunk)
+            except BaseException as e:  # reported to the producer
+                self.__error = e
+
+    def __check(self) -> None:
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise error
+
+    def __enqueue(self) -> None:
+        if self.__parts:
+            chunk = b"".join(self.__parts)
+            self.__parts = []
+            self.__size = 0
+            self.__queue.put(chunk)
+
+    def write(self, data: str) -> int:
+        """Write text.
+
+        Args:
+            data: Text to write
+
+        Returns:
+            Number of characters written
+
+        Raises:
+            ValueError: If the writer is closed
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        self.__check()
+        encoded = data.encode(self.encoding)
+        self.__parts.append(encoded)
+        self.__size += len(encoded)
+        if self.__size >= self.chunk_size:
+            self.__enqueue()
+        return len(data)
+
+    def flush(self) -> None:
+        """Hand buffered text to the writer thread."""
+        self.__check()
+        self.__enqueue()
+
+    def isatty(self) -> bool:
+        """Report that the stream is not interactive."""
+        return False
+
+    def close(self) -> None:
+        """Write everything, stop the thread and close the file.
+
+        Raises:
+            BaseException: Error raised by the writer thread, if any
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.__enqueue()
+            self.__queue.put(_CLOSE)
+            self.__thread.join()
+        finally:
+            self.file.close()
+        self.__check()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def open_output_file(path: str, **writer_options: Any) -> BackgroundWriter:
+    """Open an output file with compression inferred from its extension.
+
+    Args:
+        path: File path (``.gz``, ``.bz2``, ``.xz``, ``.zst`` compress)
+        **writer_options: Options of ``BackgroundWriter``
+
+    Returns:
+        Text stream writing through a background thread
+    """
+    return BackgroundWriter(open_binary(path, compression_for(path)), **writer_options)
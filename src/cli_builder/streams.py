@@ -0,0 +1,160 @@
+"""Per-invocation routing of standard output streams."""
+
+import contextlib
+import sys
+import threading
+from contextvars import ContextVar
+from typing import IO, Any, Iterator, Optional
+
+_stdout_var: "ContextVar[Optional[IO[str]]]" = ContextVar("cli_builder_stdout", default=None)
+_stderr_var: "ContextVar[Optional[IO[str]]]" = ContextVar("cli_builder_stderr", default=None)
+
+_install_lock = threading.Lock()
+
+
+class StreamProxy:
+    """File-like object writing to the stream bound to the current context.
+
+    When no stream is bound, writes go to the stream that was installed
+    as ``sys.stdout``/``sys.stderr`` before the proxy replaced it.
+    """
+
+    __slots__ = ("_var", "_fallback")
+
+    def __init__(self, var: ContextVar, fallback: IO[str]):
+        """Initialize proxy.
+
+        Args:
+            var: Context variable holding the routed stream
+            fallback: Stream used when nothing is routed
+        """
+        self._var = var
+        self._fallback = fallback
+
+    @property
+    def target(self) -> IO[str]:
+        """Get the stream writes are currently routed to.
+
+        Returns:
+            Routed stream or the fallback stream
+        """
+        stream = self._var.get()
+        return self._fallback if stream is None else stream
+
+    def write(self, data: str) -> int:
+        """Write data to the routed stream.
+
+        Args:
+            data: Text to write
+
+        Returns:
+            Number of characters written
+        """
+        return self.target.write(data)
+
+    def flush(self) -> None:
+        """Flush the routed stream."""
+        self.target.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate other attributes to the routed stream."""
+        return getattr(self.target, name)
+
+
+class TeeStream:
+    """File-like object duplicating writes to several streams."""
+
+    def __init__(self, *streams: IO[str]):
+        """Initialize tee.
+
+        Args:
+            *streams: Streams receiving every write
+        """
+        self.streams = streams
+
+    def write(self, data: str) -> int:
+        """Write data to all streams.
+
+        Args:
+            data: Text to write
+
+        Returns:
+            Number of characters written
+        """
+        for stream in self.streams:
+            stream.write(data)
+        return len(data)
+
+    def flush(self) -> None:
+        """Flush all streams."""
+        for stream in self.streams:
+            stream.flush()
+
+
+def _install(name: str, var: ContextVar) -> None:
+    """Replace ``sys.<name>`` with a proxy bound to ``var`` if not done yet.
+
+    Args:
+        name: Attribute of ``sys`` to replace (``stdout`` or ``stderr``)
+        var: Context variable the proxy reads from
+    """
+    current = getattr(sys, name)
+    if isinstance(current, StreamProxy) and current._var is var:
+        return
+
+    with _install_lock:
+        current = getattr(sys, name)
+        if not (isinstance(current, StreamProxy) and current._var is var):
+            setattr(sys, name, StreamProxy(var, current))
+
+
+def current_stdout() -> IO[str]:
+    """Get the stream standard output is routed to in the current context.
+
+    Returns:
+        Effective standard output stream
+    """
+    stream = sys.stdout
+    return stream.target if isinstance(stream, StreamProxy) else stream
+
+
+def current_stderr() -> IO[str]:
+    """Get the stream standard error is routed to in the current context.
+
+    Returns:
+        Effective standard error stream
+    """
+    stream = sys.stderr
+    return stream.target if isinstance(stream, StreamProxy) else stream
+
+
+@contextlib.contextmanager
+def redirect_output(
+    stdout: Optional[IO[str]] = None, stderr: Optional[IO[str]] = None
+) -> Iterator[None]:
+    """Route ``sys.stdout``/``sys.stderr`` writes of the current context.
+
+    Unlike ``contextlib.redirect_stdout`` the redirection only applies to
+    the calling thread (or task), so concurrent invocations do not see
+    each other's output.
+
+    Args:
+        stdout: Stream for standard output (None keeps the current one)
+        stderr: Stream for standard error (None keeps the current one)
+
+    Yields:
+        None
+    """
+    tokens = []
+    if stdout is not None:
+        _install("stdout", _stdout_var)
+        tokens.append((_stdout_var, _stdout_var.set(stdout)))
+    if stderr is not None:
+        _install("stderr", _stderr_var)
+        tokens.append((_stderr_var, _stderr_var.set(stderr)))
+
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
@@ -0,0 +1,237 @@
+"""Suggestions of close matches for mistyped commands, options and choices."""
+
+import argparse
+import collections
+import sys
+from typing import Any, Counter, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .choices import ChoicesHelpFormatter
+
+# Number of suggestions in an error message
+MAX_SUGGESTIONS = 3
+
+# Choices listed in full in an error message when nothing is close
+MAX_LISTED_CHOICES = 10
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Compute the optimal string alignment distance between two strings.
+
+    This is the Levenshtein distance where swapping two adjacent
+    characters also counts as one edit, so ``gne`` is one edit from
+    ``gen``.
+
+    Args:
+        a: First string
+        b: Second string
+        limit: Stop early once the distance is known to exceed this value
+
+    Returns:
+        Minimum number of insertions, deletions, substitutions and adjacent
+        transpositions, or ``limit + 1`` if it exceeds ``limit``
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, before[j - 2] + 1)
+            current.append(distance)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def max_typo_distance(word: str) -> int:
+    """Get the largest edit distance still treated as a typo of a word.
+
+    Args:
+        word: Mistyped word
+
+    Returns:
+        1 for words up to 4 characters, 2 up to 8 characters, 3 beyond
+    """
+    return 1 if len(word) <= 4 else 2 if len(word) <= 8 else 3
+
+
+def _bigrams(word: str) -> Set[str]:
+    padded = f"^{word}$"
+    return {padded[i : i + 2] for i in range(len(padded) - 1)}
+
+
+class NGramIndex:
+    """Index of words by their character bigrams.
+
+    One edit changes at most three bigrams (two, unless it swaps adjacent
+    characters), so a word within distance ``k`` of a query shares all
+    but ``3k`` of its bigrams. A search only
+    computes edit distances for the words passing that filter, which
+    keeps it fast for large sets of similar names (``deploy-eu-1``,
+    ``deploy-eu-2``...) where metric trees degenerate. Building the
+    index is linear in the total length of the words.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        """Initialize index.
+
+        Args:
+            words: Words to index
+        """
+        self.words = sorted(set(words))
+        self.__postings: Dict[str, List[int]] = {}
+        for position, word in enumerate(self.words):
+            for gram in _bigrams(word):
+                self.__postings.setdefault(gram, []).append(position)
+
+    @property
+    def size(self) -> int:
+        """Get the number of indexed words.
+
+        Returns:
+            Number of distinct words
+        """
+        return len(self.words)
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """Find the words within a distance of a word.
+
+        Args:
+            word: Query word
+            max_distance: Largest edit distance to include
+
+        Returns:
+            ``(distance, word)`` pairs sorted by distance, then word
+        """
+        grams = _bigrams(word)
+        threshold = len(grams) - 3 * max_distance
+        if threshold <= 0:
+            candidates: Iterable[int] = range(len(self.words))
+        else:
+            shared: Counter[int] = collections.Counter()
+            for gram in grams:
+                shared.update(self.__postings.get(gram, ()))
+            candidates = [position for position, count in shared.items() if count >= threshold]
+
+        found = []
+        for position in candidates:
+            candidate = self.words[position]
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        return sorted(found)
+
+
+def closest(index: NGramIndex, word: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+    """Get the indexed words most likely meant instead of a word.
+
+    Args:
+        index: Indexed candidate words
+        word: Mistyped word
+        limit: Maximum number of suggestions
+
+    Returns:
+        Closest words first
+    """
+    return [match for _, match in index.search(word, max_typo_distance(word))[:limit]]
+
+
+def did_you_mean(suggestions: Sequence[str]) -> str:
+    """Format suggestions for an error message.
+
+    Args:
+        suggestions: Suggested words
+
+    Returns:
+        Text such as ``did you mean 'build' or 'bundle'?``
+    """
+    quoted = [repr(suggestion) for suggestion in suggestions]
+    if len(quoted) > 1:
+        quoted[-2:] = [f"{quoted[-2]} or {quoted[-1]}"]
+    return f"did you mean {', '.join(quoted)}?"
+
+
+class SuggestingArgumentParser(argparse.ArgumentParser):
+    """Argument parser suggesting close matches for invalid input.
+
+    An invalid choice (including an unknown command) reports the closest
+    choices instead of all of them, and unrecognized options report the
+    closest options valid in their position: those of the parser before
+    the subcommand name, those of the subcommand after it. The
+    indexes are built on the first error and reused afterwards. Help is
+    formatted with ``ChoicesHelpFormatter`` unless another formatter is
+    given.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        """Initialize parser; arguments are those of ``argparse.ArgumentParser``."""
+        kwargs.setdefault("formatter_class", ChoicesHelpFormatter)
+        super().__init__(*args, **kwargs)
+        self.__indexes: Dict[int, NGramIndex] = {}
+
+    def __index(self, key: int, words: Sequence[str]) -> NGramIndex:
+        index = self.__indexes.get(key)
+        if index is None or index.size != len(words):
+            index = self.__indexes[key] = NGramIndex(words)
+        return index
+
+    def _check_value(self, action: argparse.Action, value: Any) -> None:
+        if action.choices is None or value in action.choices:
+            return
+        choices = [str(choice) for choice in action.choices]
+        suggestions = closest(self.__index(id(action), choices), str(value))
+        if suggestions:
+            hint = did_you_mean(suggestions)
+        elif len(choices) <= MAX_LISTED_CHOICES:
+            hint = f"choose from {', '.join(map(repr, choices))}"
+        else:
+            hint = f"{len(choices)} choices, see --help"
+        raise argparse.ArgumentError(action, f"invalid choice: {value!r} ({hint})")
+
+    def parse_args(self, args=None, namespace=None):  # type: ignore[override]
+        """Parse arguments, suggesting options for unrecognized ones.
+
+        Args:
+            args: Arguments (default: ``sys.argv[1:]``)
+            namespace: Namespace to fill
+
+        Returns:
+            Parsed namespace
+        """
+        namespace, extras = self.parse_known_args(args, namespace)
+        if extras:
+            args = sys.argv[1:] if args is None else list(args)
+            # Arguments from the subcommand name on belong to the subcommand
+            parser, start = self, len(args)
+            selected = self.__selected_subparser(namespace)
+            if selected is not None and selected[0] in args:
+                parser, start = selected[1], args.index(selected[0])
+            annotated = []
+            for extra in extras:
+                suggestions = []
+                if extra.startswith("-") and extra not in ("-", "--"):
+                    owner = parser if extra in args[start + 1 :] else self
+                    index = self.__index(id(owner), sorted(owner._option_string_actions))
+                    suggestions = closest(index, extra.split("=", 1)[0])
+                annotated.append(f"{extra} ({did_you_mean(suggestions)})" if suggestions else extra)
+            self.error(f"unrecognized arguments: {' '.join(annotated)}")
+        return namespace
+
+    def __selected_subparser(
+        self, namespace: argparse.Namespace
+    ) -> Optional[Tuple[str, argparse.ArgumentParser]]:
+        for action in self._actions:
+            if isinstance(action, argparse._SubParsersAction):
+                name = getattr(namespace, action.dest, None)
+                parser = action.choices.get(name)
+                if parser is not None:
+                    return name, parser
+        return None
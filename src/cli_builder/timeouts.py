@@ -0,0 +1,274 @@
+"""Wall-clock time limits for command execution."""
+
+import asyncio
+import contextlib
+import inspect
+import signal
+import threading
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from .cancellation import (
+    CancelToken,
+    CommandCancelled,
+    bind_token,
+    current_token,
+    raise_in_thread,
+    unbind_token,
+    withdraw_exception,
+)
+
+# Exit code of timed out commands, as used by coreutils ``timeout``
+TIMEOUT_EXIT_CODE = 124
+
+# Time a timed out command gets to stop cooperatively, in seconds
+DEFAULT_GRACE = 1.0
+
+
+class CommandTimeout(CommandCancelled):
+    """Raised inside a command that exceeded its time limit."""
+
+
+@contextlib.contextmanager
+def _child_token() -> Iterator[CancelToken]:
+    """Create a token that is also cancelled with the current one.
+
+    The token is detached from the current one when the block ends.
+
+    Yields:
+        New token
+    """
+    token = CancelToken()
+    parent = current_token()
+    if parent is not None:
+        parent.add_callback(token.cancel)
+    try:
+        yield token
+    finally:
+        if parent is not None:
+            parent.remove_callback(token.cancel)
+
+
+def _can_use_alarm() -> bool:
+    """Check whether ``SIGALRM`` can interrupt the current thread."""
+    return (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+        and signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+    )
+
+
+@contextlib.contextmanager
+def _alarm(timeout: float, grace: float, expire: Callable[[], None]) -> Iterator[None]:
+    """Enforce a time limit on the block with an interval timer signal."""
+    expired = False
+
+    def on_alarm(signum, frame) -> None:
+        nonlocal expired
+        if not expired:
+            expired = True
+            expire()
+            if grace > 0:
+                signal.setitimer(signal.ITIMER_REAL, grace)
+                return
+        raise CommandTimeout()
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+@contextlib.contextmanager
+def _watchdog(timeout: float, grace: float, expire: Callable[[], None]) -> Iterator[None]:
+    """Enforce a time limit on the block with a watchdog thread.
+
+    The block is marked finished under a lock that the watchdog also holds
+    while it cancels or interrupts, so nothing happens after the block
+    ended; an interruption scheduled but not yet delivered is withdrawn.
+    """
+    thread = threading.current_thread()
+    wake = threading.Event()
+    lock = threading.Lock()
+    finished = False
+    interrupted = False
+
+    def watchdog() -> None:
+        nonlocal interrupted
+        if wake.wait(timeout):
+            return
+        with lock:
+            if finished:
+                return
+            expire()
+        if wake.wait(grace):
+            return
+        with lock:
+            if not finished:
+                interrupted = raise_in_thread(thread, CommandTimeout)
+
+    threading.Thread(target=watchdog, name="command-timeout", daemon=True).start()
+    try:
+        yield
+    finally:
+        with lock:
+            finished = True
+            if interrupted:
+                withdraw_exception(thread)
+        wake.set()
+
+
+class _TimeLimit:
+    """Time limit of one command call and of the stream it may return."""
+
+    def __init__(self, token: CancelToken):
+        """Initialize limit.
+
+        Args:
+            token: Cancellation token of the call
+        """
+        self.token = token
+        self.expired = threading.Event()
+
+    def expire(self) -> None:
+        """Mark the limit expired and cancel the call."""
+        self.expired.set()
+        self.token.cancel()
+
+    def check(self) -> None:
+        """Fail if the limit expired while the call stopped cooperatively.
+
+        Raises:
+            CommandTimeout: If the limit expired
+        """
+        if self.expired.is_set():
+            raise CommandTimeout()
+
+    @contextlib.contextmanager
+    def bound(self) -> Iterator[None]:
+        """Run command code with the token bound, reporting cancellation as timeout.
+
+        Yields:
+            None
+        """
+        reset = bind_token(self.token)
+        try:
+            yield
+        except CommandCancelled:
+            if self.expired.is_set():
+                raise CommandTimeout() from None
+            raise
+        finally:
+            unbind_token(reset)
+
+    def stream(self, items: Iterator[Any], stack: contextlib.ExitStack) -> Iterator[Any]:
+        """Produce the items of a streamed result under the limit.
+
+        The token is bound only while the producer runs. ``stack``, holding
+        the timer, is exited when the stream ends or is closed, also if it
+        is closed before the first item was requested.
+
+        Args:
+            items: Generator returned by the command
+            stack: Entered timer contexts
+
+        Returns:
+            Iterator raising ``CommandTimeout`` if the limit expired
+        """
+
+        def generate() -> Iterator[Any]:
+            with stack:
+                yield None
+                try:
+                    while True:
+                        # No further items are produced once the limit expired
+                        self.check()
+                        with self.bound():
+                            try:
+                                item = next(items)
+                            except StopIteration:
+                                break
+                        yield item
+                finally:
+                    with self.bound():
+                        items.close()
+            self.check()
+
+        generator = generate()
+        next(generator)
+        return generator
+
+
+def call_with_timeout(
+    func: Callable[[], Any], timeout: Optional[float], grace: float = DEFAULT_GRACE
+) -> Any:
+    """Call a function with a wall-clock time limit.
+
+    When the limit expires the invocation's cancellation token is set,
+    which runs the ``on_cancel`` hooks and makes ``check_cancelled`` stop
+    cooperative commands. A command still running ``grace`` seconds later
+    is interrupted with ``CommandTimeout``: by ``SIGALRM`` on the main
+    thread, by an asynchronous exception in other threads. If the function
+    returns a generator, the limit also covers consuming it.
+
+    Args:
+        func: Function without arguments
+        timeout: Time limit in seconds (None for no limit)
+        grace: Time the command gets to stop cooperatively, in seconds
+
+    Returns:
+        Function result
+
+    Raises:
+        CommandTimeout: If the time limit expired
+    """
+    if timeout is None:
+        return func()
+
+    with contextlib.ExitStack() as stack:
+        limit = _TimeLimit(stack.enter_context(_child_token()))
+        timer = _alarm if _can_use_alarm() else _watchdog
+        stack.enter_context(timer(timeout, grace, limit.expire))
+        with limit.bound():
+            result = func()
+        if inspect.isgenerator(result):
+            return limit.stream(result, stack.pop_all())
+    # Stopped cooperatively after the limit expired
+    limit.check()
+    return result
+
+
+def run_coroutine(coroutine: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Run the coroutine of an async command in a new event loop.
+
+    When the time limit expires the command task is cancelled, so its
+    ``finally`` blocks and async context managers release resources.
+
+    Args:
+        coroutine: Coroutine returned by the command function
+        timeout: Time limit in seconds (None for no limit)
+
+    Returns:
+        Coroutine result
+
+    Raises:
+        CommandTimeout: If the time limit expired
+    """
+
+    async def main(token: CancelToken) -> Any:
+        if timeout is None:
+            return await coroutine
+        try:
+            return await asyncio.wait_for(coroutine, timeout)
+        except asyncio.TimeoutError:
+            token.cancel()
+            raise CommandTimeout() from None
+
+    with _child_token() as token:
+        reset = bind_token(token)
+        try:
+            return asyncio.run(main(token))
+        finally:
+            unbind_token(reset)
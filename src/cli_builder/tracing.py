@@ -0,0 +1,239 @@
+"""Span-based tracing exported in the Chrome trace event format."""
+
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .storage import atomic_write
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "cli_builder_span", default=None
+)
+
+
+class Span:
+    """Timed section of an invocation, usable as context manager or decorator.
+
+    Spans opened inside another span on the same thread (or task) become
+    its children. Used as a decorator, every call of the decorated
+    function records a new span.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        """Initialize span.
+
+        Args:
+            tracer: Tracer buffering the span
+            name: Span name
+            attributes: Initial attributes
+        """
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes)
+        self.id = 0
+        self.parent: Optional[Span] = None
+        self.__start = 0.0
+        self.__token: Optional[contextvars.Token] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach a value to the span.
+
+        Args:
+            key: Attribute name
+            value: Attribute value (converted to text if not JSON-compatible)
+        """
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.id = self.tracer.next_id()
+        self.parent = _current.get()
+        self.__token = _current.set(self)
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        end = time.perf_counter()
+        _current.reset(self.__token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer.record(self, self.__start, end)
+
+    def __call__(self, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Span(self.tracer, self.name, self.attributes):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(self.tracer, self.name, self.attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+class NullSpan:
+    """Span doing nothing, used while tracing is off.
+
+    Used as a decorator, it looks the tracer up on every call, so
+    functions decorated before tracing is enabled are still traced.
+    """
+
+    __slots__ = ("resolve", "name", "attributes")
+
+    def __init__(
+        self, resolve: Callable[[], Optional["Tracer"]], name: str, attributes: Dict[str, Any]
+    ):
+        """Initialize span.
+
+        Args:
+            resolve: Function returning the current tracer, if any
+            name: Span name
+            attributes: Initial attributes
+        """
+        self.resolve = resolve
+        self.name = name
+        self.attributes = attributes
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Ignore an attribute.
+
+        Args:
+            key: Attribute name
+            value: Attribute value
+        """
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def __call__(self, func: Callable) -> Callable:
+        resolve, name, attributes = self.resolve, self.name, self.attributes
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                tracer = resolve()
+                if tracer is None:
+                    return await func(*args, **kwargs)
+                with tracer.span(name, **attributes):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = resolve()
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+class Tracer:
+    """In-memory buffer of finished spans.
+
+    Recording a span only appends an event to a list; nothing is written
+    until ``write`` is called, normally once when the process exits.
+    """
+
+    def __init__(self, path: str, process_name: str = ""):
+        """Initialize tracer.
+
+        Args:
+            path: JSON file receiving the trace
+            process_name: Name shown for the process in trace viewers
+        """
+        self.path = path
+        self.process_name = process_name
+        self.__lock = threading.Lock()
+        self.__ids = itertools.count(1)
+        self.__origin = time.perf_counter()
+        self.__events: List[Dict[str, Any]] = []
+
+    def span(self, name: str, **attributes: Any) -> Span:
+        """Create a span.
+
+        Args:
+            name: Span name
+            **attributes: Initial attributes
+
+        Returns:
+            Span to enter or to decorate a function with
+        """
+        return Span(self, name, attributes)
+
+    def next_id(self) -> int:
+        """Allocate a span identifier.
+
+        Returns:
+            Identifier unique within the tracer
+        """
+        return next(self.__ids)
+
+    def record(self, span: Span, start: float, end: float) -> None:
+        """Buffer a finished span.
+
+        Args:
+            span: Finished span
+            start: ``time.perf_counter`` value at entry
+            end: ``time.perf_counter`` value at exit
+        """
+        args = dict(span.attributes, span_id=span.id)
+        if span.parent is not None:
+            args["parent_id"] = span.parent.id
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": (start - self.__origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.__lock:
+            self.__events.append(event)
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        """Get the buffered trace events.
+
+        Returns:
+            Copy of the events in completion order
+        """
+        with self.__lock:
+            return list(self.__events)
+
+    def write(self) -> None:
+        """Write the buffered spans as a Chrome trace JSON file.
+
+        The file can be opened in Perfetto, ``chrome://tracing`` or
+        speedscope.
+        """
+        events = self.events
+        if self.process_name:
+            events.insert(
+                0,
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "args": {"name": self.process_name},
+                },
+            )
+        data = {"traceEvents": events, "displayTimeUnit": "ms"}
+        atomic_write(self.path, json.dumps(data, default=str).encode("utf-8"))
@@ -0,0 +1,368 @@
+"""Re-running commands when watched files change."""
+
+import contextvars
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .cancellation import CancelToken, CommandCancelled, bind_token, raise_in_thread, unbind_token
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Watcher comparing file modification times at a fixed interval."""
+
+    def __init__(self, paths: Sequence[str], interval: float = 0.5):
+        """Initialize watcher.
+
+        Args:
+            paths: Files or directories to watch
+            interval: Time between scans in seconds
+        """
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self.__snapshot = self.__scan()
+
+    def __scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.paths:
+            targets = [path]
+            if os.path.isdir(path):
+                targets = [
+                    os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                ]
+            for target in targets:
+                try:
+                    stat = os.stat(target)
+                except OSError:
+                    continue
+                snapshot[target] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Block until something changes.
+
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+
+        Returns:
+            Changed paths (empty if the timeout expired)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.__scan()
+            changed = {
+                path
+                for path in set(snapshot) | set(self.__snapshot)
+                if snapshot.get(path) != self.__snapshot.get(path)
+            }
+            self.__snapshot = snapshot
+            if changed:
+                return changed
+
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+            time.sleep(delay)
+
+    def close(self) -> None:
+        """Release watcher resources."""
+
+
+class InotifyWatcher:
+    """Watcher receiving change events from the Linux kernel.
+
+    Files are watched through their parent directory so that editors
+    replacing a file by renaming are noticed; directories are watched
+    recursively, including subdirectories created later.
+    """
+
+    def __init__(self, paths: Sequence[str]):
+        """Initialize watcher.
+
+        Args:
+            paths: Files or directories to watch
+
+        Raises:
+            OSError: If inotify is not available
+        """
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.__libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.__libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self.__fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.__dirs: Dict[int, str] = {}
+        # Directory -> names of watched files in it (None for whole directories)
+        self.__filters: Dict[str, Optional[Set[str]]] = {}
+
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                self.__watch_tree(path)
+            else:
+                directory, name = os.path.split(path)
+                names = self.__filters.get(directory, set())
+                if names is not None:
+                    names.add(name)
+                    self.__add(directory, names)
+
+    def __add(self, directory: str, names: Optional[Set[str]]) -> None:
+        wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return
+        self.__dirs[wd] = directory
+        self.__filters[directory] = names
+
+    def __watch_tree(self, root: str) -> None:
+        for directory, _, _ in os.walk(root):
+            self.__add(directory, None)
+
+    def __read(self) -> Set[str]:
+        changed = set()
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += length
+
+            directory = self.__dirs.get(wd)
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.__filters)
+                continue
+            if directory is None:
+                continue
+
+            names = self.__filters.get(directory)
+            path = os.path.join(directory, name) if name else directory
+            if names is None:
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.__watch_tree(path)
+            elif name in names:
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Block until something changes.
+
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+
+        Returns:
+            Changed paths (empty if the timeout expired)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.__fd], [], [], remaining)
+            if not readable:
+                return set()
+            changed = self.__read()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        """Release watcher resources."""
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
+
+
+def create_watcher(paths: Sequence[str]):
+    """Create the most efficient watcher available on this platform.
+
+    Args:
+        paths: Files or directories to watch
+
+    Returns:
+        Inotify watcher on Linux, polling watcher elsewhere
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            pass
+    return PollingWatcher(paths)
+
+
+class WatchLoop:
+    """Run a function, then run it again whenever watched files change.
+
+    Bursts of changes are merged: a re-run starts only after no change was
+    seen for ``debounce`` seconds. A run still in progress when new changes
+    arrive is cancelled first: its cancellation token is set and, if it does
+    not stop within ``grace`` seconds, ``CommandCancelled`` is raised in its
+    thread.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        execute: Callable[[], int],
+        debounce: float = 0.1,
+        grace: float = 1.0,
+        watcher=None,
+        on_change: Optional[Callable[[Set[str]], None]] = None,
+    ):
+        """Initialize loop.
+
+        Args:
+            paths: Files or directories to watch
+            execute: Function running the command and returning its exit code
+            debounce: Quiet period required before re-running, in seconds
+            grace: Time a cancelled run gets to stop cooperatively, in seconds
+            watcher: Watcher to use (created for ``paths`` if None)
+            on_change: Function called with the changed paths before a re-run
+        """
+        self.paths = list(paths)
+        self.execute = execute
+        self.debounce = debounce
+        self.grace = grace
+        self.watcher = watcher
+        self.on_change = on_change
+        self.runs = 0
+        self.last_exit_code = 0
+        self.__thread: Optional[threading.Thread] = None
+        self.__token: Optional[CancelToken] = None
+
+    def __target(self, token: CancelToken) -> None:
+        reset = bind_token(token)
+        try:
+            self.last_exit_code = self.execute()
+        except CommandCancelled:
+            self.last_exit_code = 130
+        finally:
+            unbind_token(reset)
+
+    def __start(self) -> None:
+        self.runs += 1
+        self.__token = CancelToken()
+        context = contextvars.copy_context()
+        self.__thread = threading.Thread(
+            target=context.run, args=(self.__target, self.__token), daemon=True
+        )
+        self.__thread.start()
+
+    def __cancel(self) -> None:
+        thread = self.__thread
+        if thread is None or not thread.is_alive():
+            return
+        self.__token.cancel()
+        thread.join(self.grace)
+        while thread.is_alive():
+            raise_in_thread(thread, CommandCancelled)
+            thread.join(0.05)
+
+    def __settle(self, watcher) -> Set[str]:
+        changed: Set[str] = set()
+        while True:
+            more = watcher.wait(self.debounce)
+            if not more:
+                return changed
+            changed |= more
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the current run finishes.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            True if no run is in progress
+        """
+        thread = self.__thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def run(self, stop: Optional[threading.Event] = None) -> int:
+        """Run until interrupted or until ``stop`` is set.
+
+        Args:
+            stop: Event ending the loop
+
+        Returns:
+            Exit code of the last run
+        """
+        watcher = self.watcher or create_watcher(self.paths)
+        # Without a stop event the loop blocks in the watcher and uses no CPU
+        poll = None if stop is None else 0.1
+        try:
+            self.__start()
+            while stop is None or not stop.is_set():
+                changed = watcher.wait(poll)
+                if not changed:
+                    continue
+                changed |= self.__settle(watcher)
+                self.__cancel()
+                if self.on_change is not None:
+                    self.on_change(changed)
+                self.__start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__cancel()
+            watcher.close()
+        return self.last_exit_code
+
+
+def format_changes(changed: Set[str], limit: int = 3) -> str:
+    """Describe changed paths for a status line.
+
+    Args:
+        changed: Changed paths
+        limit: Maximum number of paths listed
+
+    Returns:
+        Short description
+    """
+    paths: List[str] = sorted(changed)
+    text = ", ".join(os.path.relpath(path) for path in paths[:limit])
+    if len(paths) > limit:
+        text += f" and {len(paths) - limit} more"
+    return text
@@ -0,0 +1,208 @@
+"""Execution of CLI invocations in worker pools."""
+
+import collections
+import functools
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .limits import LIMIT_EXIT_CODE
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .cli import CLI
+
+POOL_KINDS = ("thread", "process")
+
+# Result of an invocation: (exit code, captured stdout, captured stderr)
+InvocationResult = Tuple[int, str, str]
+
+# CLI instances reachable from forked worker processes
+_instances: Dict[int, "CLI"] = {}
+
+
+def invoke(cli: "CLI", argv: List[str]) -> InvocationResult:
+    """Run a CLI invocation capturing its output.
+
+    Args:
+        cli: CLI to run
+        argv: Command line arguments
+
+    Returns:
+        Exit code and captured output
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    code = cli.run(argv, stdout=stdout, stderr=stderr)
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def invoke_registered(key: int, argv: List[str]) -> InvocationResult:
+    """Run an invocation of a CLI registered before the worker was forked.
+
+    Args:
+        key: Registration key of the CLI
+        argv: Command line arguments
+
+    Returns:
+        Exit code and captured output
+    """
+    return invoke(_instances[key], argv)
+
+
+class WorkerPool:
+    """Thread or process pool running invocations of one CLI.
+
+    Process pools rely on the ``fork`` start method: workers inherit the
+    CLI with all registered commands instead of pickling it. Once an
+    invocation in a process pool exceeds a resource limit, the workers are
+    recycled: new invocations go to fresh processes while the old ones
+    finish the work already handed to them and exit.
+    """
+
+    def __init__(self, cli: "CLI", kind: str = "thread", max_workers: Optional[int] = None):
+        """Initialize pool.
+
+        Args:
+            cli: CLI whose commands are run
+            kind: Pool kind (thread or process)
+            max_workers: Maximum number of workers
+
+        Raises:
+            ValueError: If the pool kind is not supported
+        """
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown pool kind: {kind}")
+        if kind == "process" and "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("Process pools require the 'fork' start method")
+
+        self.cli = cli
+        self.kind = kind
+        self.max_workers = max_workers
+        self.recycled = 0
+        self.__key = id(cli)
+        self.__executor: Optional[Executor] = None
+        self.__retired: List[Executor] = []
+        self.__tainted: Optional[Executor] = None
+        self.__lock = threading.Lock()
+
+    def __create_executor(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("fork")
+            )
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def __enter__(self) -> "WorkerPool":
+        if self.kind == "process":
+            _instances[self.__key] = self.cli
+        self.__executor = self.__create_executor()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for executor in self.__retired + [self.__executor]:
+            executor.shutdown(wait=True)
+        self.__retired = []
+        if self.kind == "process":
+            _instances.pop(self.__key, None)
+
+    def __watch_limits(self, executor: Executor, future: Future) -> None:
+        """Mark the executor for recycling if the invocation hit a resource limit."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        if future.result()[0] == LIMIT_EXIT_CODE:
+            with self.__lock:
+                if self.__executor is executor:
+                    self.__tainted = executor
+
+    def __recycle(self) -> None:
+        """Replace the executor marked by ``__watch_limits``."""
+        with self.__lock:
+            if self.__tainted is None or self.__tainted is not self.__executor:
+                return
+            self.__tainted.shutdown(wait=False)
+            self.__retired.append(self.__tainted)
+            self.__tainted = None
+            self.__executor = self.__create_executor()
+            self.recycled += 1
+
+    def submit(self, argv: List[str]):
+        """Schedule an invocation.
+
+        Args:
+            argv: Command line arguments
+
+        Returns:
+            Future resolving to the invocation result
+        """
+        if self.kind == "process":
+            self.__recycle()
+            executor = self.__executor
+            future = executor.submit(invoke_registered, self.__key, argv)
+            future.add_done_callback(functools.partial(self.__watch_limits, executor))
+            return future
+        return self.__executor.submit(invoke, self.cli, argv)
+
+    def imap(
+        self,
+        argvs: Iterable[List[str]],
+        keep_order: bool = False,
+        max_pending: Optional[int] = None,
+    ) -> Iterator[Tuple[int, InvocationResult]]:
+        """Run many invocations with a bounded number in flight.
+
+        Arguments are consumed lazily: a new invocation is only scheduled
+        once fewer than ``max_pending`` are running or waiting to be
+        collected, so memory use does not grow with the input.
+
+        Args:
+            argvs: Command line arguments of every invocation
+            keep_order: Yield results in input order instead of completion order
+            max_pending: Maximum number of scheduled invocations
+                (default: twice the number of workers)
+
+        Yields:
+            Input index and result of every invocation
+        """
+        if max_pending is None:
+            max_pending = 2 * (self.max_workers or os.cpu_count() or 1)
+
+        if keep_order:
+            queue: Deque[Tuple[int, Future]] = collections.deque()
+            try:
+                for index, argv in enumerate(argvs):
+                    if len(queue) >= max_pending:
+                        done_index, future = queue.popleft()
+                        yield done_index, future.result()
+                    queue.append((index, self.submit(argv)))
+                while queue:
+                    done_index, future = queue.popleft()
+                    yield done_index, future.result()
+            finally:
+                for _, future in queue:
+                    future.cancel()
+            return
+
+        pending: Dict[Future, int] = {}
+        try:
+            for index, argv in enumerate(argvs):
+                while len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+                pending[self.submit(argv)] = index
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
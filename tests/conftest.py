@@ -1,5 +1,7 @@
 """Common test fixtures."""
 
+import io
+
 import pytest
 
 from cli_builder import CLI
@@ -9,3 +11,39 @@ from cli_builder import CLI
 def cli():
     """Create a basic CLI instance."""
     return CLI("test", "Test CLI")
+
+
+@pytest.fixture
+def make_cli(tmp_path):
+    """Create CLI instances for a test.
+
+    The returned function takes ``CLI`` keyword arguments and creates a
+    CLI named ``test-cli`` whose state directory is inside the test's
+    temporary directory unless other values are given.
+    """
+
+    def create(**kwargs):
+        kwargs.setdefault("name", "test-cli")
+        kwargs.setdefault("state_dir", str(tmp_path / "state"))
+        return CLI(**kwargs)
+
+    return create
+
+
+@pytest.fixture
+def run(monkeypatch):
+    """Run a CLI capturing its output.
+
+    The returned function takes the CLI, its arguments and optionally the
+    text read from standard input, and returns the exit code, standard
+    output and standard error.
+    """
+
+    def run_cli(cli, *args, stdin=None):
+        if stdin is not None:
+            monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = cli.run(list(args), stdout=stdout, stderr=stderr)
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    return run_cli
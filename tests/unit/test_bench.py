@@ -0,0 +1,88 @@
+"""Tests for the bench standard command."""
+
+import json
+
+import pytest
+
+from cli_builder.bench import percentile, run_benchmark, summarize
+
+
+@pytest.fixture
+def bench_cli(make_cli):
+    """Create a CLI with the bench command enabled."""
+    cli = make_cli()
+    cli.enable_standard_commands(bench=True)
+    calls = []
+
+    @cli.command(name="greet")
+    @cli.option("name", default="world")
+    def greet(name):
+        calls.append(name)
+        print(f"hello {name}")
+
+    @cli.command(name="fail")
+    def fail():
+        return 2
+
+    return cli, calls
+
+
+def test_percentile_and_summary():
+    """Test interpolated percentiles and statistics."""
+    values = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(values, 0.5) == 2.5
+    assert percentile(values, 1.0) == 4.0
+    assert summarize([3.0, 1.0, 2.0]) == {
+        "min": 1.0,
+        "median": 2.0,
+        "p95": pytest.approx(2.9),
+        "p99": pytest.approx(2.98),
+        "max": 3.0,
+        "mean": 2.0,
+    }
+
+
+def test_bench_json_output(bench_cli, run):
+    """Test iterations, warmup and JSON statistics."""
+    cli, calls = bench_cli
+    code, out, _ = run(cli, "bench", "-n", "20", "-w", "2", "--json", "greet", "--name", "x")
+    assert code == 0
+    data = json.loads(out)
+    assert data["invocation"] == ["greet", "--name", "x"]
+    assert data["iterations"] == 20
+    assert data["warmup"] == 2
+    assert calls == ["x"] * 22
+    for phase in ("parse", "execute", "total"):
+        assert set(data[phase]) == {"min", "median", "p95", "p99", "max", "mean"}
+        assert data[phase]["min"] <= data[phase]["median"] <= data[phase]["max"]
+    assert data["ops_per_sec"] > 0
+
+
+def test_bench_table_output(bench_cli, run):
+    """Test the table report and that command output is discarded."""
+    cli, _ = bench_cli
+    code, out, _ = run(cli, "bench", "-n", "5", "greet")
+    assert code == 0
+    lines = out.splitlines()
+    assert lines[0].startswith("greet: 5 iterations (3 warmup)")
+    assert [line.split()[0] for line in lines[1:]] == ["phase", "parse", "execute", "total"]
+    assert "hello" not in out
+
+
+def test_bench_time_budget():
+    """Test running until the time budget is used."""
+    result = run_benchmark(["noop"], lambda: (), lambda parsed: 0, duration=0.05, warmup=0)
+    assert result.iterations > 1
+    assert result.elapsed >= 0.05
+
+
+def test_bench_failures(bench_cli, run):
+    """Test failing and invalid invocations."""
+    cli, _ = bench_cli
+    code, _, err = run(cli, "bench", "fail")
+    assert code == 1
+    assert "failed with exit code 2" in err
+
+    code, _, err = run(cli, "bench", "missing")
+    assert code == 1
+    assert "invalid invocation" in err
@@ -0,0 +1,183 @@
+"""Tests for command result caching."""
+
+import os
+import pickle
+import threading
+
+import pytest
+
+from cli_builder.cache import CacheEntry, CachePolicy, ResultCache
+
+
+@pytest.fixture
+def calls():
+    """Record the values the cached command was called with."""
+    return []
+
+
+@pytest.fixture
+def cli(make_cli, tmp_path, calls):
+    """Create a CLI with a cached command counting its calls."""
+    cli = make_cli(state_dir=str(tmp_path))
+
+    @cli.cached()
+    @cli.command(name="square")
+    @cli.argument("value", type=int)
+    def square(value):
+        calls.append(value)
+        print(f"square of {value}")
+        return 0 if value >= 0 else 2
+
+    return cli
+
+
+def test_cache_hit_replays_output(cli, calls, run):
+    """Test that a cache hit skips the command and replays stdout."""
+    assert run(cli, "square", "3") == (0, "square of 3\n", "")
+    assert run(cli, "square", "3") == (0, "square of 3\n", "")
+    assert calls == [3]
+
+
+def test_cached_decorator_order(make_cli, tmp_path, run):
+    """Test that cached can be applied before the command is registered."""
+    calls = []
+    cli = make_cli(state_dir=str(tmp_path))
+
+    @cli.command(name="ping")
+    @cli.cached(ttl=60)
+    def ping():
+        calls.append(1)
+
+    assert cli.commands["ping"].cache == CachePolicy(ttl=60)
+    run(cli, "ping")
+    run(cli, "ping")
+    assert calls == [1]
+
+
+def test_no_cache_option(cli, calls, run):
+    """Test that --no-cache bypasses the cache."""
+    run(cli, "square", "3")
+    run(cli, "--no-cache", "square", "3")
+    assert calls == [3, 3]
+
+
+def test_failures_are_not_cached(cli, calls, run):
+    """Test that non-zero exit codes are not stored."""
+    assert run(cli, "square", "-1")[0] == 2
+    assert run(cli, "square", "-1")[0] == 2
+    assert calls == [-1, -1]
+
+
+def test_ttl_expiry(tmp_path):
+    """Test that expired entries are recomputed."""
+    cache = ResultCache(str(tmp_path))
+    key = cache.make_key("cmd", {"a": 1})
+    cache.put(key, CacheEntry(result=1, created=0.0), CachePolicy())
+
+    assert cache.get(key) is not None
+    assert cache.get(key, ttl=60) is None
+    assert cache.get(key) is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        pickle.dumps(CacheEntry(result=1, created=0.0))[:-4],
+        pickle.dumps({"result": 1, "created": 0.0}),
+        b"\x80\x63",
+        b"not a pickle",
+    ],
+    ids=["truncated", "foreign", "protocol", "garbage"],
+)
+def test_unreadable_entry_is_a_miss(tmp_path, data):
+    """Test that a corrupt or foreign entry is deleted and treated as a miss."""
+    cache = ResultCache(str(tmp_path))
+    key = cache.make_key("cmd", {"a": 1})
+    path = tmp_path / (key + ResultCache.SUFFIX)
+    path.write_bytes(data)
+
+    assert cache.get(key, ttl=60) is None
+    assert not path.exists()
+
+
+def test_key_normalization():
+    """Test that keys do not depend on argument order."""
+    first = ResultCache.make_key("cmd", {"a": 1, "b": {3, 2, 1}})
+    second = ResultCache.make_key("cmd", {"b": {1, 2, 3}, "a": 1})
+    assert first == second
+    assert first != ResultCache.make_key("other", {"a": 1, "b": {1, 2, 3}})
+
+
+def test_lru_eviction(tmp_path):
+    """Test that least recently used entries are evicted first."""
+    cache = ResultCache(str(tmp_path))
+    policy = CachePolicy(max_entries=2)
+
+    cache.put("a", CacheEntry(result="a"), policy)
+    cache.put("b", CacheEntry(result="b"), policy)
+    os.utime(os.path.join(str(tmp_path), "a.pkl"), ns=(1, 1))
+    os.utime(os.path.join(str(tmp_path), "b.pkl"), ns=(2, 2))
+    cache.get("a")  # "a" becomes the most recently used
+    cache.put("c", CacheEntry(result="c"), policy)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_size_limit(tmp_path):
+    """Test that entries larger than max_bytes are not stored."""
+    cache = ResultCache(str(tmp_path))
+    assert not cache.put("big", CacheEntry(result="x" * 1000), CachePolicy(max_bytes=100))
+    assert cache.get("big") is None
+
+
+def test_concurrent_writes(tmp_path):
+    """Test that concurrent writers leave a consistent cache."""
+    cache = ResultCache(str(tmp_path))
+    policy = CachePolicy(max_entries=5)
+
+    def writer(index):
+        for i in range(20):
+            cache.put(f"k{index}-{i}", CacheEntry(result=i), policy)
+            cache.put("shared", CacheEntry(result=index), policy)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    names = [name for name in os.listdir(str(tmp_path)) if name.endswith(".pkl")]
+    assert len(names) <= 5
+    assert not [name for name in os.listdir(str(tmp_path)) if name.startswith(".tmp-")]
+
+
+def test_limits_apply_per_command(cli, calls, run):
+    """Test that a small limit only evicts entries of its own command."""
+
+    @cli.cached(max_entries=1)
+    @cli.command(name="double")
+    @cli.argument("value", type=int)
+    def double(value):
+        calls.append(value * 2)
+
+    for args in (["square", "1"], ["square", "2"], ["double", "3"], ["double", "4"]):
+        run(cli, *args)
+    run(cli, "square", "1")
+    run(cli, "square", "2")
+
+    assert calls == [1, 2, 6, 8]
+
+
+def test_failed_store_keeps_result(cli, monkeypatch, run):
+    """Test that an unwritable cache only produces a warning."""
+
+    def fail(self, key, entry, policy):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(ResultCache, "put", fail)
+    code, out, err = run(cli, "square", "3")
+
+    assert (code, out) == (0, "square of 3\n")
+    assert "could not cache result: No space left on device" in err
@@ -0,0 +1,247 @@
+"""Tests for set-indexed choices."""
+
+import argparse
+import enum
+import io
+import threading
+import time
+
+import pytest
+
+from cli_builder import Choices, DynamicChoices
+from cli_builder.repl import Shell
+
+REGIONS = [f"region-{number:05d}" for number in range(50_000)]
+
+
+@pytest.fixture
+def deploy_cli(make_cli):
+    """Create CLIs with an option and an argument restricted to choices."""
+
+    def create(choices):
+        cli = make_cli()
+
+        @cli.command(name="deploy")
+        @cli.argument("region", choices=choices, help="Target region")
+        @cli.option("mirror", short="m", choices=choices)
+        def deploy(region, mirror=None):
+            print(region, mirror)
+
+        return cli
+
+    return create
+
+
+def test_membership_and_order():
+    """Test deduplication, display order and validation."""
+    choices = Choices(["b", "a", "b", "c"])
+    assert list(choices) == ["b", "a", "c"]
+    assert len(choices) == 3
+    assert "a" in choices
+    assert "A" not in choices
+    assert [] not in choices
+    assert Choices.of(choices) is choices
+    assert isinstance(Choices.of(["x"]), Choices)
+
+
+class Color(enum.Enum):
+    """Colors used as choices."""
+
+    RED = "red"
+    GREEN = "green"
+
+
+def test_enum_choices(make_cli, run):
+    """Test that an Enum class is a set of values, not a provider."""
+    assert list(Choices.of(Color)) == [Color.RED, Color.GREEN]
+    cli = make_cli()
+
+    @cli.command(name="paint")
+    @cli.option("color", type=lambda name: Color[name], choices=Color)
+    def paint(color=None):
+        print(f"got {color}")
+
+    assert run(cli, "paint", "--color", "RED") == (0, "got Color.RED\n", "")
+
+
+def test_resolve_modes():
+    """Test case-insensitive and prefix resolution."""
+    exact = Choices(["Debug", "Release"])
+    assert exact.resolve("debug") == "debug"
+
+    folded = Choices(["Debug", "Release"], case_sensitive=False)
+    assert folded.resolve("dEBUG") == "Debug"
+    assert folded.resolve("deb") == "deb"
+
+    prefixed = Choices(["debug", "deploy", "release"], prefix=True)
+    assert prefixed.resolve("rel") == "release"
+    assert prefixed.resolve("debug") == "debug"
+    assert prefixed.resolve("x") == "x"
+    with pytest.raises(argparse.ArgumentTypeError, match="'debug', 'deploy'"):
+        prefixed.resolve("de")
+
+    both = Choices(["Debug", "Release"], case_sensitive=False, prefix=True)
+    assert both.resolve("REL") == "Release"
+
+
+def test_summary():
+    """Test summarized display of long lists."""
+    assert Choices(["a", "b"]).summary() == "a, b"
+    choices = Choices(REGIONS, max_displayed=3)
+    assert choices.is_long
+    assert choices.summary() == "region-00000, region-00001, region-00002, ... (49997 more)"
+
+
+def test_large_choices_cli(deploy_cli, run):
+    """Test validation and help output with 50k choices."""
+    cli = deploy_cli(REGIONS)
+    assert run(cli, "deploy", "region-49999", "-m", "region-00001") == (
+        0,
+        "region-49999 region-00001\n",
+        "",
+    )
+
+    code, _, stderr = run(cli, "deploy", "region-5")
+    assert code == 1
+    assert "region-00010" not in stderr
+
+    code, stdout, _ = run(cli, "deploy", "--help")
+    assert len(stdout) < 2000
+    assert "usage: test-cli deploy [-h] [-m MIRROR] region" in stdout
+    assert "Target region (choices: region-00000, region-00001" in stdout
+    assert "(49990 more)" in stdout
+
+
+def test_case_insensitive_prefix_cli(deploy_cli, run):
+    """Test that commands receive canonical values."""
+    cli = deploy_cli(Choices(["Alpha", "Beta", "Bravo"], case_sensitive=False, prefix=True))
+    assert run(cli, "deploy", "alpha", "--mirror", "be")[1] == "Alpha Beta\n"
+
+    code, _, stderr = run(cli, "deploy", "b")
+    assert code == 1
+    assert "argument region: ambiguous choice: 'b' could match 'Beta', 'Bravo'" in stderr
+
+    code, _, stderr = run(cli, "deploy", "gamma")
+    assert "argument region: invalid choice: 'gamma'" in stderr
+
+
+class Provider:
+    """Choices provider counting its calls."""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.values)
+
+
+@pytest.fixture
+def ssh_cli(make_cli, tmp_path):
+    """Create CLIs with an option using dynamic choices."""
+
+    def create(choices):
+        cli = make_cli(state_dir=str(tmp_path))
+
+        @cli.command(name="ssh")
+        @cli.option("host", choices=choices, help="Host to connect to")
+        def ssh(host=None):
+            print(host)
+
+        @cli.command(name="other")
+        def other():
+            pass
+
+        return cli
+
+    return create
+
+
+def test_provider_called_lazily_and_cached(ssh_cli, run):
+    """Test that the provider runs once, on first validation."""
+    provider = Provider(["web-1", "web-2"])
+    cli = ssh_cli(provider)
+    assert run(cli, "other") == (0, "", "")
+    assert run(cli, "ssh") == (0, "None\n", "")
+    assert provider.calls == 0
+
+    assert run(cli, "ssh", "--host", "web-2") == (0, "web-2\n", "")
+    code, _, stderr = run(cli, "ssh", "--host", "db-1")
+    assert code == 1
+    assert "invalid choice: 'db-1'" in stderr
+    assert provider.calls == 1
+
+    code, stdout, _ = run(cli, "ssh", "--help")
+    assert "[--host HOST]" in stdout
+    assert "Host to connect to (choices: web-1, web-2)" in stdout
+    assert provider.calls == 1
+
+
+def test_ttl_and_disk_cache(ssh_cli, tmp_path, run):
+    """Test expiry and reuse of persisted values by another process."""
+    provider = Provider(["a"])
+    choices = DynamicChoices(provider, ttl=0)
+    assert "a" in choices
+    assert "a" in choices
+    assert provider.calls == 2
+
+    cli = ssh_cli(DynamicChoices(provider, ttl=3600, persist=True))
+    assert run(cli, "ssh", "--host", "a")[0] == 0
+    assert provider.calls == 3
+    assert (tmp_path / "choices" / "ssh.host.json").exists()
+
+    other = ssh_cli(DynamicChoices(provider, ttl=3600, persist=True))
+    assert run(other, "ssh", "--host", "a")[0] == 0
+    assert provider.calls == 3
+
+
+def test_failing_provider_falls_back_to_cache(tmp_path):
+    """Test that cached values are used when the provider fails."""
+    path = str(tmp_path / "hosts.json")
+    DynamicChoices(Provider(["a"]), cache_path=path).refresh()
+
+    def failing():
+        raise RuntimeError("inventory unavailable")
+
+    assert "a" in DynamicChoices(failing, ttl=0, cache_path=path)
+    with pytest.raises(RuntimeError):
+        "a" in DynamicChoices(failing)
+
+
+def test_background_refresh_does_not_block():
+    """Test that expired values are served while refreshing."""
+    release = threading.Event()
+    refreshed = threading.Event()
+    provider = Provider(["old"])
+    choices = DynamicChoices(provider, ttl=0)
+    assert "old" in choices
+
+    def slow():
+        release.wait(10)
+        refreshed.set()
+        return ["new"]
+
+    choices.provider = slow
+    choices.background = True
+    start = time.perf_counter()
+    assert "old" in choices
+    assert "new" not in choices
+    assert time.perf_counter() - start < 1
+    release.set()
+    assert refreshed.wait(10)
+    for _ in range(100):
+        if "new" in choices:
+            break
+        time.sleep(0.01)
+    assert "new" in choices
+
+
+def test_shell_completes_dynamic_choices(ssh_cli):
+    """Test value completion in the interactive shell."""
+    cli = ssh_cli(Provider(["web-1", "web-2", "db-1"]))
+    cli.enable_background_choices()
+    shell = Shell(cli, stdin=io.StringIO(), stdout=io.StringIO())
+    assert shell.completedefault("we", "ssh --host we", 11, 13) == ["web-1", "web-2"]
+    assert shell.completedefault("", "ssh --host ", 11, 11) == ["db-1", "web-1", "web-2"]
+    assert shell.completedefault("we", "ssh we", 4, 6) == []
@@ -0,0 +1,141 @@
+"""Tests for concurrent in-process invocation."""
+
+import io
+import sys
+import threading
+import time
+
+import pytest
+
+from cli_builder import Choices
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI with an echo command."""
+    cli = make_cli()
+
+    @cli.command(name="echo")
+    @cli.argument("text", help="Text to print")
+    @cli.option("times", short="t", type=int, default=1)
+    def echo(text, times=1):
+        for _ in range(times):
+            print(text)
+            print(f"err-{text}", file=sys.stderr)
+        return 0
+
+    return cli
+
+
+def test_run_routes_output_to_given_streams(cli):
+    """Test that run writes to the streams passed to it."""
+    out, err = io.StringIO(), io.StringIO()
+
+    assert cli.run(["echo", "hello"], stdout=out, stderr=err) == 0
+    assert out.getvalue() == "hello\n"
+    assert err.getvalue() == "err-hello\n"
+
+
+def test_seal_forbids_registration(cli):
+    """Test that a sealed CLI rejects new commands."""
+    cli.seal()
+    assert cli.sealed
+
+    with pytest.raises(RuntimeError):
+
+        @cli.command(name="late")
+        def late():
+            pass
+
+    assert "late" not in cli.commands
+
+
+def test_nested_run_is_reentrant(cli):
+    """Test that a command can invoke the CLI recursively."""
+
+    @cli.command(name="outer")
+    def outer():
+        inner = io.StringIO()
+        cli.run(["echo", "inner"], stdout=inner)
+        print(f"outer saw {inner.getvalue().strip()}")
+        return 0
+
+    out = io.StringIO()
+    assert cli.run(["outer"], stdout=out) == 0
+    assert out.getvalue() == "outer saw inner\n"
+
+
+@pytest.mark.parametrize("seal", [True, False])
+def test_concurrent_runs_do_not_interleave(cli, seal):
+    """Stress test running many invocations from many threads."""
+    if seal:
+        cli.seal()
+
+    threads_count = 32
+    runs_per_thread = 25
+    errors = []
+    barrier = threading.Barrier(threads_count)
+
+    def worker(index):
+        barrier.wait()
+        for run in range(runs_per_thread):
+            text = f"t{index}r{run}"
+            out, err = io.StringIO(), io.StringIO()
+            code = cli.run(["echo", text, "--times", "3"], stdout=out, stderr=err)
+            if code != 0 or out.getvalue() != f"{text}\n" * 3:
+                errors.append((text, code, out.getvalue()))
+            if err.getvalue() != f"err-{text}\n" * 3:
+                errors.append((text, code, err.getvalue()))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+
+def test_run_waits_for_parser_being_built(make_cli):
+    """Test that a run does not parse with a parser still being set up."""
+
+    class SlowChoices(Choices):
+        """Choices pausing the first parser setup inspecting them once armed."""
+
+        armed = False
+        building = threading.Event()
+        release = threading.Event()
+
+        @property
+        def normalizes(self):
+            if SlowChoices.armed and not self.building.is_set():
+                self.building.set()
+                self.release.wait(5)
+            return False
+
+    cli = make_cli()
+
+    @cli.command(name="deploy")
+    @cli.argument("region", choices=SlowChoices(["eu", "us"]))
+    @cli.option("force", is_flag=True)
+    def deploy(region, force=False):
+        print(region, force)
+
+    SlowChoices.armed = True
+    results = {}
+
+    def invoke(name, args):
+        out, err = io.StringIO(), io.StringIO()
+        results[name] = (cli.run(args, stdout=out, stderr=err), out.getvalue())
+
+    first = threading.Thread(target=invoke, args=("first", ["deploy", "us"]))
+    first.start()
+    assert SlowChoices.building.wait(5)
+    second = threading.Thread(target=invoke, args=("second", ["deploy", "eu", "--force"]))
+    second.start()
+    time.sleep(0.1)
+    SlowChoices.release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == {"first": (0, "us False\n"), "second": (0, "eu True\n")}
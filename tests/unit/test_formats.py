@@ -0,0 +1,157 @@
+"""Tests for structured output formats."""
+
+import collections
+import dataclasses
+import json
+
+import attrs
+import pytest
+
+from cli_builder import formats
+from cli_builder.formats import dumps, has_output, render, to_record
+
+
+@dataclasses.dataclass
+class Host:
+    name: str
+    cpus: int
+
+
+@attrs.define
+class Disk:
+    device: str
+    size: int
+
+
+Point = collections.namedtuple("Point", "x y")
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI returning records."""
+    cli = make_cli()
+
+    @cli.command(name="hosts")
+    def hosts():
+        yield Host("alpha", 4)
+        yield Host("beta, gamma", 16)
+
+    @cli.command(name="info")
+    def info():
+        return {"name": "alpha", "tags": ["a", "b"]}
+
+    @cli.command(name="fail")
+    def fail():
+        return 3
+
+    return cli
+
+
+def test_to_record():
+    """Test conversion of record-like objects."""
+    assert to_record(Host("a", 1)) == {"name": "a", "cpus": 1}
+    assert to_record(Disk("sda", 10)) == {"device": "sda", "size": 10}
+    assert to_record(Point(1, 2)) == {"x": 1, "y": 2}
+    assert to_record(Host) is Host
+    assert to_record(5) == 5
+
+
+def test_json_formats(cli, run):
+    """Test json and jsonl output."""
+    code, out, _ = run(cli, "--output", "json", "hosts")
+    assert code == 0
+    assert json.loads(out) == [{"name": "alpha", "cpus": 4}, {"name": "beta, gamma", "cpus": 16}]
+
+    code, out, _ = run(cli, "--output", "jsonl", "hosts")
+    assert [json.loads(line) for line in out.splitlines()] == [
+        {"name": "alpha", "cpus": 4},
+        {"name": "beta, gamma", "cpus": 16},
+    ]
+
+    code, out, _ = run(cli, "--output", "json", "info")
+    assert json.loads(out) == {"name": "alpha", "tags": ["a", "b"]}
+
+    assert run(cli, "--output", "json", "fail")[:2] == (3, "")
+
+
+def test_delimited_formats(cli, run):
+    """Test csv and tsv output with quoting."""
+    csv_hosts = 'name,cpus\nalpha,4\n"beta, gamma",16\n'
+    assert run(cli, "--output", "csv", "hosts")[:2] == (0, csv_hosts)
+    tsv_hosts = "name\tcpus\nalpha\t4\nbeta, gamma\t16\n"
+    assert run(cli, "--output", "tsv", "hosts")[:2] == (0, tsv_hosts)
+    assert run(cli, "--output", "csv", "info")[:2] == (0, 'name,tags\nalpha,"[""a"",""b""]"\n')
+
+
+def test_text_table(cli, run):
+    """Test aligned table rendering of records."""
+    code, out, _ = run(cli, "hosts")
+    assert code == 0
+    assert out.splitlines() == [
+        "name         cpus",
+        "-----------  ----",
+        "alpha        4",
+        "beta, gamma  16",
+    ]
+
+    # Non-iterable results are not written in text format
+    assert run(cli, "info")[:2] == (0, "")
+
+
+def test_table_widths_from_sample(monkeypatch):
+    """Test that widths come from the first rows and longer cells are cut."""
+    monkeypatch.setattr(formats, "TABLE_SAMPLE_SIZE", 2)
+    consumed = []
+
+    def rows():
+        for value in ["a", "bbbbb", "abcdefgh", "c"]:
+            consumed.append(value)
+            yield {"v": value}
+
+    lines = render(rows())
+    assert next(lines) == "v"
+    assert consumed == ["a", "bbbbb"]
+    assert list(lines) == ["-----", "a", "bbbbb", "ab...", "c"]
+
+
+def test_render_is_lazy():
+    """Test that rendering consumes items on demand."""
+    consumed = []
+
+    def rows():
+        for index in range(10**9):
+            consumed.append(index)
+            yield {"i": index}
+
+    lines = render(rows(), "jsonl")
+    assert [next(lines) for _ in range(3)] == ['{"i":0}', '{"i":1}', '{"i":2}']
+    assert len(consumed) == 3
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_dumps_backends(monkeypatch, backend):
+    """Test both JSON backends produce the same output."""
+    if backend == "json":
+        monkeypatch.setattr(formats, "orjson", None)
+    elif formats.orjson is None:
+        pytest.skip("orjson is not installed")
+
+    value = {"host": Host("a", 1), "disk": Disk("sda", 2), "tags": {"x"}, 1: "int key"}
+    assert json.loads(dumps(value)) == {
+        "host": {"name": "a", "cpus": 1},
+        "disk": {"device": "sda", "size": 2},
+        "tags": ["x"],
+        "1": "int key",
+    }
+
+
+def test_has_output():
+    """Test which results are written."""
+    assert not has_output(0, "json")
+    assert not has_output(None, "json")
+    assert has_output("text", "json")
+    assert not has_output("text", "text")
+    assert has_output([1], "text")
+
+    with pytest.raises(ValueError):
+        render([1], "xml")
@@ -0,0 +1,168 @@
+"""Tests for command dependency graphs."""
+
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cli_builder.graph import FAILED, OK, SKIPPED, CommandGraph
+from cli_builder.streams import redirect_output
+
+
+@pytest.fixture
+def graph_cli(make_cli):
+    """Create CLIs with a fetch -> transform -> report pipeline."""
+
+    def create(log, fail=()):
+        cli = make_cli()
+
+        def make(name, depends_on=()):
+            @cli.command(name=name, depends_on=list(depends_on))
+            def func():
+                log.append(name)
+                print(f"ran {name}")
+                return 3 if name in fail else 0
+
+        make("fetch")
+        make("lookup")
+        make("transform", ["fetch", "lookup"])
+        make("audit", ["fetch"])
+        make("report", ["transform"])
+        return cli
+
+    return create
+
+
+def test_closure_order():
+    """Test that dependencies come before their dependents."""
+    graph = CommandGraph({"a": [], "b": ["a"], "c": ["a", "b"], "d": []})
+    order = graph.order("c")
+    assert order == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize(
+    "dependencies, message",
+    [
+        ({"a": ["b"], "b": ["a"]}, "cycle"),
+        ({"a": ["missing"]}, "Unknown dependency 'missing'"),
+    ],
+)
+def test_invalid_graphs(dependencies, message):
+    """Test cycle and unknown dependency detection."""
+    with pytest.raises(ValueError, match=message):
+        CommandGraph(dependencies).order("a")
+
+
+def test_run_graph_runs_dependencies_first(graph_cli):
+    """Test running a target with its dependencies."""
+    log = []
+    cli = graph_cli(log)
+    out = io.StringIO()
+
+    assert cli.run(["--with-deps", "report"], stdout=out) == 0
+    assert log.index("fetch") < log.index("transform") < log.index("report")
+    assert log.index("lookup") < log.index("transform")
+    assert "audit" not in log
+    assert out.getvalue().count("ran ") == 4
+
+
+def test_failure_stops_downstream_only():
+    """Test that a failure skips dependents but not unrelated branches."""
+    graph = CommandGraph({"a": [], "b": ["a"], "c": ["b"], "d": [], "e": ["c", "d"]})
+    ran = []
+
+    def task(name):
+        ran.append(name)
+        return 1 if name == "b" else 0
+
+    with ThreadPoolExecutor() as executor:
+        results = graph.execute("e", lambda name: executor.submit(task, name))
+
+    assert results["a"].status == OK
+    assert results["b"].status == FAILED
+    assert results["c"].status == SKIPPED
+    assert results["d"].status == OK
+    assert results["e"].status == SKIPPED
+    assert sorted(ran) == ["a", "b", "d"]
+
+
+def test_run_graph_failure_exit_code(graph_cli):
+    """Test the exit code and report of a failed graph."""
+    log = []
+    cli = graph_cli(log, fail=("fetch",))
+    err = io.StringIO()
+
+    assert cli.run(["--with-deps", "report"], stdout=io.StringIO(), stderr=err) == 3
+    assert "fetch: failed with exit code 3" in err.getvalue()
+    assert "transform: skipped (dependency failed)" in err.getvalue()
+    assert sorted(log) == ["fetch", "lookup"]
+
+    err = io.StringIO()
+    with redirect_output(stdout=io.StringIO(), stderr=err):
+        assert cli.run_graph("report") == 3
+    assert "report: skipped (dependency failed)" in err.getvalue()
+
+
+def test_independent_branches_run_concurrently(make_cli):
+    """Test that independent nodes overlap in time."""
+    cli = make_cli()
+    barrier = threading.Barrier(3, timeout=5)
+
+    for name in ("a", "b", "c"):
+
+        @cli.command(name=name)
+        def branch():
+            barrier.wait()
+            return 0
+
+    @cli.command(name="all", depends_on=["a", "b", "c"])
+    def all_cmd():
+        return 0
+
+    start = time.monotonic()
+    assert cli.run_graph("all", jobs=3) == 0
+    assert time.monotonic() - start < 5
+
+
+def test_process_pool(graph_cli):
+    """Test running graph nodes in worker processes."""
+    log = []
+    cli = graph_cli(log)
+    out = io.StringIO()
+
+    assert cli.run(["--with-deps", "--pool", "process", "report"], stdout=out) == 0
+    lines = out.getvalue().splitlines()
+    assert sorted(lines[:2]) == ["ran fetch", "ran lookup"]
+    assert lines[2:] == ["ran transform", "ran report"]
+    # Commands ran in child processes
+    assert log == ["report"]
+
+
+def test_up_to_date_node_is_skipped(make_cli, tmp_path):
+    """Test that an incremental node with unchanged inputs runs only once."""
+    source = tmp_path / "data.txt"
+    source.write_text("data")
+    output = tmp_path / "out.txt"
+    log = []
+    cli = make_cli()
+
+    @cli.incremental(inputs=["source"], outputs=["output"])
+    @cli.command(name="compile")
+    @cli.option("source", default=str(source))
+    @cli.option("output", default=str(output))
+    def compile_(source, output):
+        log.append("compile")
+        with open(source) as src, open(output, "w") as dst:
+            dst.write(src.read())
+
+    @cli.command(name="report", depends_on=["compile"])
+    def report():
+        log.append("report")
+
+    for _ in range(2):
+        out, err = io.StringIO(), io.StringIO()
+        assert cli.run(["--with-deps", "report"], stdout=out, stderr=err) == 0
+    assert log == ["compile", "report", "report"]
+    assert err.getvalue() == "compile: up to date\n"
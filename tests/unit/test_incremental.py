@@ -0,0 +1,153 @@
+"""Tests for incremental command execution."""
+
+import os
+
+import pytest
+
+from cli_builder.incremental import IncrementalState, expand_files, hash_file, hash_files
+
+
+@pytest.fixture
+def calls():
+    """Record the sources the build command was called with."""
+    return []
+
+
+@pytest.fixture
+def cli(make_cli, calls):
+    """Create a CLI with an incremental build command."""
+    cli = make_cli()
+
+    @cli.incremental(inputs=["sources"], outputs=["output"])
+    @cli.command(name="build")
+    @cli.argument("sources", nargs="+")
+    @cli.option("output", short="o", required=True)
+    def build(sources, output):
+        calls.append(sources)
+        with open(output, "w") as handle:
+            for source in sources:
+                with open(source) as src:
+                    handle.write(src.read())
+        return 0
+
+    return cli
+
+
+def test_skips_unchanged_inputs(cli, calls, tmp_path, run):
+    """Test that a second run with unchanged inputs is skipped."""
+    source = tmp_path / "a.txt"
+    source.write_text("a")
+    output = str(tmp_path / "out.txt")
+
+    assert run(cli, "build", str(source), "-o", output) == (0, "", "")
+    assert run(cli, "build", str(source), "-o", output) == (0, "", "build: up to date\n")
+    assert len(calls) == 1
+
+
+def test_reruns_on_content_change(cli, calls, tmp_path, run):
+    """Test that modified inputs trigger a new run."""
+    source = tmp_path / "a.txt"
+    source.write_text("a")
+    output = str(tmp_path / "out.txt")
+
+    run(cli, "build", str(source), "-o", output)
+    source.write_text("bb")
+    run(cli, "build", str(source), "-o", output)
+    assert len(calls) == 2
+
+
+def test_touch_without_change_is_skipped(cli, calls, tmp_path, run):
+    """Test that a changed mtime with identical content is skipped."""
+    source = tmp_path / "a.txt"
+    source.write_text("a")
+    output = str(tmp_path / "out.txt")
+
+    run(cli, "build", str(source), "-o", output)
+    os.utime(str(source), ns=(10**18, 10**18))
+    run(cli, "build", str(source), "-o", output)
+    assert len(calls) == 1
+
+
+def test_missing_output_and_force(cli, calls, tmp_path, run):
+    """Test that missing outputs and --force trigger a run."""
+    source = tmp_path / "a.txt"
+    source.write_text("a")
+    output = tmp_path / "out.txt"
+
+    run(cli, "build", str(source), "-o", str(output))
+    output.unlink()
+    run(cli, "build", str(source), "-o", str(output))
+    run(cli, "--force", "build", str(source), "-o", str(output))
+    assert len(calls) == 3
+
+
+def test_directory_inputs(tmp_path):
+    """Test that directories are expanded and new files detected."""
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "a").write_text("a")
+    (src / "sub" / "b").write_text("b")
+    state = IncrementalState(str(tmp_path / "state.json"))
+
+    assert expand_files([str(src)]) == [str(src / "a"), str(src / "sub" / "b")]
+    assert not state.is_up_to_date("key", [str(src)], [])
+    state.record("key", [str(src)])
+    assert state.is_up_to_date("key", [str(src)], [])
+
+    (src / "c").write_text("c")
+    assert not state.is_up_to_date("key", [str(src)], [])
+
+
+def test_parallel_hashing(tmp_path):
+    """Test that parallel hashing matches sequential hashing."""
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"f{index}"
+        path.write_bytes(os.urandom(3 * 1024) * (index + 1))
+        paths.append(str(path))
+
+    assert hash_files(paths, max_workers=4) == {path: hash_file(path, 1000) for path in paths}
+
+
+def test_missing_input_is_not_recorded(make_cli, tmp_path, run):
+    """Test that an input removed by the run neither fails nor skips the next run."""
+    calls = []
+    cli = make_cli()
+    spool = tmp_path / "spool.txt"
+
+    @cli.incremental(inputs=["spool"])
+    @cli.command(name="drain")
+    @cli.argument("spool")
+    def drain(spool):
+        calls.append(spool)
+        if os.path.exists(spool):
+            os.unlink(spool)
+
+    spool.write_text("job")
+    assert run(cli, "drain", str(spool)) == (0, "", "")
+    assert run(cli, "drain", str(spool)) == (0, "", "")
+    assert len(calls) == 2
+
+
+def test_streamed_result_recorded_when_consumed(make_cli, tmp_path, run):
+    """Test that an interrupted streamed run is not marked up to date."""
+    calls = []
+    cli = make_cli()
+    source = tmp_path / "rows.txt"
+    source.write_text("a\nb\n")
+
+    @cli.incremental(inputs=["source"])
+    @cli.command(name="rows")
+    @cli.argument("source")
+    def rows(source):
+        calls.append(source)
+        with open(source) as handle:
+            for line in handle:
+                if len(calls) == 1:
+                    raise RuntimeError("interrupted")
+                yield line.strip()
+
+    assert run(cli, "rows", str(source)) == (1, "", "interrupted\n")
+    assert run(cli, "rows", str(source)) == (0, "a\nb\n", "")
+    assert run(cli, "rows", str(source)) == (0, "", "rows: up to date\n")
+    assert len(calls) == 2
@@ -0,0 +1,82 @@
+"""Tests for the journal of completed batch items."""
+
+import io
+
+from cli_builder.journal import Journal, journal_key, to_ranges
+
+
+def test_to_ranges():
+    """Test collapsing of indices into ranges."""
+    assert to_ranges([5, 1, 2, 3, 7, 2]) == [(1, 3), (5, 5), (7, 7)]
+    assert to_ranges([]) == []
+
+
+def test_record_and_resume(tmp_path):
+    """Test that recorded indices survive reopening."""
+    path = str(tmp_path / "journal.log")
+    with Journal(path, sync_every=2).open() as journal:
+        for index in (0, 1, 2, 5):
+            journal.record(index)
+
+    with open(path) as handle:
+        assert handle.read() == "0-2\n5\n"
+
+    journal = Journal(path).open(resume=True)
+    assert 1 in journal and 5 in journal and 3 not in journal
+    journal.close()
+
+    # Without resume the journal starts over
+    with Journal(path).open() as journal:
+        assert len(journal) == 0
+
+
+def test_periodic_compaction(tmp_path):
+    """Test that the journal is compacted while appending."""
+    path = tmp_path / "journal.log"
+    journal = Journal(str(path), compact_every=100).open()
+    for index in range(250):
+        journal.record(index)
+    journal.sync()
+    assert path.read_text().splitlines() == ["0-199"] + [str(i) for i in range(200, 250)]
+    journal.close()
+    assert path.read_text() == "0-249\n"
+
+
+def test_truncated_line_is_ignored(tmp_path):
+    """Test loading a journal whose last write was interrupted."""
+    path = tmp_path / "journal.log"
+    path.write_text("0-3\n7\n1")
+    journal = Journal(str(path)).open(resume=True)
+    assert sorted(journal.completed) == [0, 1, 2, 3, 7]
+    journal.close()
+
+
+def test_map_resume(make_cli, monkeypatch, tmp_path):
+    """Test that --resume skips items completed by the previous run."""
+    cli = make_cli(state_dir=str(tmp_path))
+    failing = {3}
+
+    @cli.command(name="process")
+    @cli.argument("value", type=int)
+    def process(value):
+        print(value)
+        return 1 if value in failing else 0
+
+    def run(*args):
+        monkeypatch.setattr("sys.stdin", io.StringIO("1\n2\n3\n4\n"))
+        out = io.StringIO()
+        code = cli.run(list(args), stdout=out, stderr=io.StringIO())
+        return code, out.getvalue()
+
+    code, out = run("--map", "--keep-order", "-j", "1", "process")
+    assert code == 1
+    assert out == "1\n2\n3\n4\n"
+
+    failing.clear()
+    code, out = run("--map", "--resume", "process")
+    assert code == 0
+    assert out == "3\n"
+    assert (tmp_path / "journal" / (journal_key(["process"]) + ".log")).read_text() == "0-3\n"
+
+    # A resumed run of a completed batch does nothing
+    assert run("--map", "--resume", "process") == (0, "")
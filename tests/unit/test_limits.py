@@ -0,0 +1,105 @@
+"""Tests for memory and CPU limits of commands."""
+
+import sys
+import threading
+
+import pytest
+
+from cli_builder.limits import LIMIT_EXIT_CODE, ResourceLimits, apply_limits, parse_size
+from cli_builder.workers import WorkerPool
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="requires the resource module")
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI with commands exceeding limits."""
+    cli = make_cli()
+
+    @cli.command(name="hog", max_memory=parse_size("64M"))
+    def hog():
+        print(len(bytearray(parse_size("1G"))))
+
+    @cli.command(name="spin")
+    def spin():
+        while True:
+            pass
+
+    @cli.command(name="alloc")
+    @cli.argument("size", type=parse_size)
+    def alloc(size):
+        print(len(bytearray(size)))
+
+    return cli
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [("100", 100), ("2K", 2048), ("512M", 512 * 1024**2), ("1.5GiB", int(1.5 * 1024**3))],
+)
+def test_parse_size(text, expected):
+    """Test parsing of memory sizes."""
+    assert parse_size(text) == expected
+
+
+def test_parse_size_invalid():
+    """Test rejection of malformed sizes."""
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_memory_limit(cli, run):
+    """Test that exceeding the memory limit is reported and limits are restored."""
+    code, _, err = run(cli, "hog")
+    assert code == LIMIT_EXIT_CODE
+    assert err == "hog: memory limit exceeded (64 MiB)\n"
+
+    # The global option overrides the declared limit
+    assert run(cli, "--max-memory", "2G", "hog") == (0, f"{parse_size('1G')}\n", "")
+    code, _, _ = run(cli, "--max-memory", "64M", "alloc", "1G")
+    assert code == LIMIT_EXIT_CODE
+    assert run(cli, "alloc", "16M") == (0, f"{parse_size('16M')}\n", "")
+
+
+def test_memory_limit_while_streaming(cli, run):
+    """Test that the limit also applies while a generator result is consumed."""
+
+    @cli.command(name="chunks", max_memory=parse_size("64M"))
+    def chunks():
+        yield "start"
+        yield len(bytearray(parse_size("1G")))
+
+    code, out, err = run(cli, "chunks")
+    assert (code, out) == (LIMIT_EXIT_CODE, "start\n")
+    assert err == "chunks: memory limit exceeded (64 MiB)\n"
+
+
+def test_cpu_limit(cli, run):
+    """Test that exceeding the CPU time limit stops the command."""
+    code, _, err = run(cli, "--max-cpu-seconds", "0.5", "spin")
+    assert code == LIMIT_EXIT_CODE
+    assert err == "spin: CPU time limit exceeded (0.5 s)\n"
+
+
+def test_limits_are_not_applied_in_threads():
+    """Test that process-wide limits are skipped off the main thread."""
+    results = []
+
+    def target():
+        with apply_limits(ResourceLimits(max_memory=1)):
+            results.append(len(bytearray(1024)))
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    assert results == [1024]
+
+
+def test_process_workers_are_recycled(cli):
+    """Test that a limit violation replaces the process pool workers."""
+    with WorkerPool(cli, kind="process", max_workers=1) as pool:
+        code, _, err = pool.submit(["hog"]).result()
+        assert code == LIMIT_EXIT_CODE
+        assert "memory limit exceeded" in err
+        assert pool.submit(["alloc", "1M"]).result()[0] == 0
+        assert pool.recycled == 1
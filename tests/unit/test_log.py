@@ -0,0 +1,143 @@
+"""Tests for verbosity-levelled logging."""
+
+import io
+import logging
+import time
+
+import pytest
+
+from cli_builder.log import BufferedStreamHandler, get_logger, verbosity_level
+from cli_builder.streams import redirect_output
+
+
+class Counted:
+    """Object counting how often it is formatted."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "counted"
+
+
+@pytest.fixture
+def logging_cli(make_cli):
+    """Create a CLI with a logging command."""
+    cli = make_cli(name="log-cli")
+    payload = Counted()
+
+    @cli.command(name="work")
+    def work():
+        for _ in range(3):
+            cli.logger.debug("detail %s", payload)
+        cli.logger.info("info message")
+        cli.logger.warning("warning message")
+        print("output")
+
+    return cli, payload
+
+
+def test_verbosity_level():
+    """Test mapping of flag counts to levels."""
+    assert verbosity_level(0, 0) == logging.WARNING
+    assert verbosity_level(1, 0) == logging.INFO
+    assert verbosity_level(2, 0) == logging.DEBUG
+    assert verbosity_level(5, 0) == logging.DEBUG
+    assert verbosity_level(0, 1) == logging.ERROR
+    assert verbosity_level(0, 9) == logging.CRITICAL
+
+
+def test_default_level_skips_formatting(logging_cli, run):
+    """Test that suppressed messages are never formatted."""
+    cli, payload = logging_cli
+    code, stdout, stderr = run(cli, "work")
+    assert (code, stdout) == (0, "output\n")
+    assert stderr == "WARNING cli_builder.log-cli: warning message\n"
+    assert payload.calls == 0
+
+
+def test_verbose_flags(logging_cli, run):
+    """Test -v and -vv."""
+    cli, _ = logging_cli
+    _, _, stderr = run(cli, "-v", "work")
+    assert "INFO cli_builder.log-cli: info message" in stderr
+    assert "detail" not in stderr
+
+    _, _, stderr = run(cli, "-vv", "work")
+    assert stderr.count("DEBUG cli_builder.log-cli: detail counted") == 3
+    assert "DEBUG cli_builder.cli: work exited with code 0" in stderr
+
+    _, _, stderr = run(cli, "work")
+    assert stderr == "WARNING cli_builder.log-cli: warning message\n"
+
+
+def test_level_per_invocation(logging_cli, run):
+    """Test that concurrent invocations keep their own level."""
+    cli, _ = logging_cli
+
+    @cli.command(name="item")
+    @cli.argument("value")
+    def item(value):
+        cli.logger.info("item %s", value)
+
+    level = get_logger().level
+    lines = "".join(f"{number}\n" for number in range(32))
+    code, _, stderr = run(cli, "-v", "--map", "-j", "8", "item", stdin=lines)
+    assert code == 0
+    assert stderr.count("INFO cli_builder.log-cli: item") == 32
+    assert get_logger().level == level
+
+    _, _, stderr = run(cli, "work")
+    assert "INFO" not in stderr
+
+
+def test_handler_flushes_after_interval():
+    """Test that a record arriving after the flush interval flushes the buffer."""
+    stream = io.StringIO()
+    handler = BufferedStreamHandler(flush_interval=0.05)
+    logger = logging.getLogger("cli_builder.test-interval")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        with redirect_output(stderr=stream):
+            logger.warning("one")
+            assert stream.getvalue() == ""
+            time.sleep(0.1)
+            logger.warning("two")
+            assert stream.getvalue() == "one\ntwo\n"
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_quiet_flag(logging_cli, run):
+    """Test that -q hides warnings."""
+    cli, _ = logging_cli
+    assert run(cli, "--quiet", "work") == (0, "output\n", "")
+
+
+def test_handler_batches_writes():
+    """Test that records are written in batches per stream."""
+    writes = []
+
+    class Stream(io.StringIO):
+        def write(self, data):
+            writes.append(data)
+            return super().write(data)
+
+    handler = BufferedStreamHandler(capacity=3)
+    logger = logging.getLogger("cli_builder.test-batches")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        with redirect_output(stderr=Stream()):
+            logger.warning("one")
+            logger.warning("two")
+            assert writes == []
+            logger.warning("three")
+            assert writes == ["one\ntwo\nthree\n"]
+            logger.warning("four")
+            logger.error("five")
+            assert writes[1:] == ["four\nfive\n"]
+    finally:
+        logger.removeHandler(handler)
@@ -0,0 +1,129 @@
+"""Tests for running commands once per input item."""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from cli_builder.workers import WorkerPool
+
+
+@pytest.fixture(autouse=True)
+def state_home(monkeypatch, tmp_path):
+    """Keep map journals in a temporary directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI with commands used in map mode."""
+    cli = make_cli()
+
+    @cli.command(name="square")
+    @cli.argument("value", type=int)
+    def square(value):
+        print(value * value)
+
+    @cli.command(name="greet")
+    @cli.argument("name")
+    @cli.option("greeting", default="hello")
+    def greet(name, greeting):
+        print(f"{greeting} {name}")
+
+    @cli.command(name="check")
+    @cli.argument("value", type=int)
+    def check(value):
+        if value % 2:
+            print(f"{value} is odd", file=sys.stderr)
+            return 3
+        return 0
+
+    @cli.command(name="sleepy")
+    @cli.argument("delay", type=float)
+    def sleepy(delay):
+        time.sleep(delay)
+        print(delay)
+
+    return cli
+
+
+def test_item_appended(cli, run):
+    """Test that items are appended without a placeholder."""
+    code, out, _ = run(cli, "--map", "--keep-order", "square", stdin="1\n2\n\n3\n")
+    assert code == 0
+    assert out == "1\n4\n9\n"
+
+
+def test_placeholder_substitution(cli, run):
+    """Test that {} is replaced inside arguments."""
+    code, out, _ = run(
+        cli, "--map", "--keep-order", "greet", "--greeting={}!", "user-{}", stdin="a\nb\n"
+    )
+    assert code == 0
+    assert out == "a! user-a\nb! user-b\n"
+
+
+def test_global_options_are_forwarded(cli, run):
+    """Test that per-invocation global options apply to every item."""
+
+    @cli.command(name="pair")
+    @cli.argument("value")
+    def pair(value):
+        return [{"value": value}]
+
+    code, out, _ = run(cli, "--map", "--output", "jsonl", "-j", "2", "pair", stdin="x\ny\n")
+    assert code == 0
+    assert sorted(out.splitlines()) == ['{"value":"x"}', '{"value":"y"}']
+
+
+def test_failures(cli, run):
+    """Test that failures are reported and the first failure code returned."""
+    code, out, err = run(cli, "--map", "--keep-order", "check", stdin="2\n3\n4\n")
+    assert code == 3
+    assert err == "3 is odd\n"
+
+    code, _, err = run(cli, "--map", "square", stdin="nan\n")
+    assert code == 1
+    assert "invalid int value" in err
+
+
+def test_keep_order(cli, run):
+    """Test ordered and completion-ordered output."""
+    stdin = "0.3\n0.0\n"
+    _, out, _ = run(cli, "--map", "-j", "2", "--keep-order", "sleepy", stdin=stdin)
+    assert out == "0.3\n0.0\n"
+    _, out, _ = run(cli, "--map", "-j", "2", "sleepy", stdin=stdin)
+    assert out == "0.0\n0.3\n"
+
+
+def test_process_pool(cli, run):
+    """Test map mode with process workers."""
+    code, out, _ = run(cli, "--map", "--pool", "process", "-j", "2", "square", stdin="2\n3\n")
+    assert code == 0
+    assert sorted(out.splitlines()) == ["4", "9"]
+
+
+@pytest.mark.parametrize("keep_order", [True, False])
+def test_bounded_in_flight(cli, keep_order):
+    """Test that items are read lazily with bounded pending work."""
+    read = []
+    release = threading.Event()
+
+    @cli.command(name="block")
+    @cli.argument("value")
+    def block(value):
+        release.wait(5)
+
+    def items():
+        for index in range(1000):
+            read.append(index)
+            yield ["block", str(index)]
+
+    with WorkerPool(cli, max_workers=2) as pool:
+        results = pool.imap(items(), keep_order=keep_order, max_pending=4)
+        threading.Timer(0.2, release.set).start()
+        first = next(results)
+        assert len(read) <= 5
+        results.close()
+    assert first[1][0] == 0
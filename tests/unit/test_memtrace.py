@@ -0,0 +1,75 @@
+"""Tests for memory tracing of commands."""
+
+import re
+import tracemalloc
+
+import pytest
+
+from cli_builder.memtrace import format_size
+
+leaked = []
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI with a leaking and a clean command."""
+    cli = make_cli()
+
+    @cli.command(name="leak")
+    def leak():
+        leaked.append(bytearray(1024 * 1024))
+
+    @cli.command(name="clean")
+    def clean():
+        data = bytearray(4 * 1024 * 1024)
+        return 0 if data else 1
+
+    return cli
+
+
+def test_format_size():
+    """Test human-readable sizes."""
+    assert format_size(512) == "512 B"
+    assert format_size(1536) == "1.5 KiB"
+    assert format_size(-3 * 1024**2) == "-3.0 MiB"
+    assert format_size(5 * 1024**4) == "5120.0 GiB"
+
+
+def test_report_of_retained_memory(cli, run):
+    """Test peak, retained memory and allocation sites in the report."""
+    code, _, err = run(cli, "--trace-memory", "leak")
+    assert code == 0
+    first = err.splitlines()[0]
+    assert re.match(r"leak: peak 1\.\d MiB, retained 1\.\d MiB", first)
+    assert "test_memtrace.py" in err
+    assert not tracemalloc.is_tracing()
+
+
+def test_peak_of_freed_memory(cli, run):
+    """Test that freed memory shows in the peak but is not retained."""
+    _, _, err = run(cli, "--trace-memory", "clean")
+    peak, retained = re.match(r"clean: peak (.+), retained (.+)", err).groups()
+    assert peak.startswith("4.")
+    assert retained.endswith(" B") or retained.endswith("KiB")
+
+
+def test_peak_without_reset(cli, run, monkeypatch):
+    """Test the peak on Python versions without ``tracemalloc.reset_peak``."""
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    _, _, err = run(cli, "--trace-memory", "clean")
+    assert re.match(r"clean: peak 4\.\d MiB", err)
+
+    tracemalloc.start()
+    try:
+        bytearray(16 * 1024 * 1024)
+        _, _, err = run(cli, "--trace-memory", "leak")
+    finally:
+        tracemalloc.stop()
+    assert re.match(r"leak: peak 1\.\d MiB", err)
+
+
+def test_cumulative_growth(cli, run):
+    """Test growth accumulated over repeated runs of a command."""
+    run(cli, "--trace-memory", "leak")
+    _, _, err = run(cli, "--trace-memory", "leak")
+    assert re.search(r"leak: cumulative growth 2\.\d MiB over 2 runs", err)
@@ -0,0 +1,150 @@
+"""Tests for invocation metrics."""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import urllib.request
+
+import pytest
+
+from cli_builder.metrics import (
+    LATENCY_BUCKETS,
+    CommandMetrics,
+    MetricsRegistry,
+    merge_into_file,
+    render,
+)
+
+
+@pytest.fixture
+def metrics_cli(make_cli, tmp_path):
+    """Create CLIs with a succeeding and a failing command."""
+
+    def create():
+        cli = make_cli(state_dir=str(tmp_path))
+
+        @cli.command(name="ok")
+        def ok():
+            pass
+
+        @cli.command(name="fail")
+        def fail():
+            return 1
+
+        return cli
+
+    return create
+
+
+def test_registry_buckets_and_deltas():
+    """Test histogram buckets and deltas between flushes."""
+    registry = MetricsRegistry()
+    registry.observe("a", 0.003, False)
+    registry.observe("a", 0.2, True)
+    registry.observe("a", 60, False)
+
+    metrics = registry.snapshot()["a"]
+    assert (metrics.invocations, metrics.failures) == (3, 1)
+    assert metrics.buckets[0] == 1
+    assert metrics.buckets[LATENCY_BUCKETS.index(0.25)] == 1
+    assert metrics.buckets[-1] == 1
+
+    assert registry.deltas()["a"].invocations == 3
+    assert registry.deltas() == {}
+    registry.observe("a", 0.01, False)
+    assert registry.deltas()["a"].invocations == 1
+
+
+def test_render():
+    """Test the Prometheus exposition format."""
+    metrics = CommandMetrics(invocations=2, failures=1, duration_sum=0.5)
+    metrics.buckets[0] = 1
+    metrics.buckets[-1] = 1
+    text = render("my-tool", {'say "hi"': metrics})
+    assert "# TYPE my_tool_invocations_total counter" in text
+    assert 'my_tool_invocations_total{command="say \\"hi\\""} 2' in text
+    assert 'my_tool_failures_total{command="say \\"hi\\""} 1' in text
+    assert 'my_tool_duration_seconds_bucket{command="say \\"hi\\"",le="0.005"} 1' in text
+    assert 'my_tool_duration_seconds_bucket{command="say \\"hi\\"",le="10.0"} 1' in text
+    assert 'my_tool_duration_seconds_bucket{command="say \\"hi\\"",le="+Inf"} 2' in text
+    assert 'my_tool_duration_seconds_count{command="say \\"hi\\""} 2' in text
+
+
+def test_totals_accumulate_across_flushes(metrics_cli, tmp_path, run):
+    """Test persisted totals and the textfile output."""
+    textfile = tmp_path / "tool.prom"
+    cli = metrics_cli()
+    cli.enable_metrics(textfile=str(textfile), persist=False)
+    run(cli, "ok")
+    run(cli, "fail")
+    cli.flush_metrics()
+
+    other = metrics_cli()
+    other.enable_metrics(textfile=str(textfile), persist=False)
+    run(other, "ok")
+    other.flush_metrics()
+
+    text = textfile.read_text()
+    assert 'test_cli_invocations_total{command="ok"} 2' in text
+    assert 'test_cli_failures_total{command="fail"} 1' in text
+    assert 'test_cli_failures_total{command="ok"} 0' in text
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"commands": []},
+        {"commands": {"ok": [1, 0]}},
+        {"commands": {"ok": {"invocations": 1, "latency": 0.5}}},
+        {"commands": {"ok": {"invocations": "1"}}},
+    ],
+)
+def test_invalid_state_file_is_replaced(tmp_path, data):
+    """Test that a state file of unexpected shape is treated as empty."""
+    path = tmp_path / "metrics.json"
+    path.write_text(json.dumps(data))
+    totals = merge_into_file(str(path), {"ok": CommandMetrics(invocations=2)})
+    assert totals["ok"].invocations == 2
+    assert json.loads(path.read_text())["commands"]["ok"]["invocations"] == 2
+
+
+def test_flush_at_exit(tmp_path):
+    """Test that a CLI process saves its metrics when it exits."""
+    script = tmp_path / "tool.py"
+    script.write_text(textwrap.dedent(f"""
+            import sys
+            from cli_builder import CLI
+
+            cli = CLI(name="tool", state_dir={str(tmp_path)!r})
+            cli.enable_metrics(textfile={str(tmp_path / "tool.prom")!r})
+
+            @cli.command(name="ok")
+            def ok():
+                pass
+
+            sys.exit(cli.run())
+            """))
+    src = os.path.join(os.path.dirname(__file__), "..", "..", "src")
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(src))
+    for _ in range(2):
+        subprocess.run([sys.executable, str(script), "ok"], env=env, check=True, timeout=60)
+    assert 'tool_invocations_total{command="ok"} 2' in (tmp_path / "tool.prom").read_text()
+
+
+def test_http_endpoint(metrics_cli, tmp_path, run):
+    """Test serving in-memory metrics over HTTP."""
+    cli = metrics_cli()
+    server = cli.serve_metrics()
+    try:
+        run(cli, "ok")
+        host, port = server.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode()
+        assert 'test_cli_invocations_total{command="ok"} 1' in body
+    finally:
+        server.close()
+    assert not (tmp_path / "metrics.json").exists()
@@ -0,0 +1,159 @@
+"""Tests for streamed command output."""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from cli_builder.output import (
+    BROKEN_PIPE_EXIT_CODE,
+    LineWriter,
+    hold_open,
+    is_streamable,
+    write_items,
+)
+
+
+class CountingStream(io.StringIO):
+    """StringIO counting write calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+class ClosedPipe(io.StringIO):
+    """Stream whose reader went away after a number of writes."""
+
+    def __init__(self, accept):
+        super().__init__()
+        self.accept = accept
+
+    def write(self, data):
+        if not self.accept:
+            raise BrokenPipeError(32, "Broken pipe")
+        self.accept -= 1
+        return super().write(data)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(iter([]), True), ([1], True), ((1,), True), ("text", False), ({"a": 1}, False), (0, False)],
+)
+def test_is_streamable(value, expected):
+    """Test detection of item streams."""
+    assert is_streamable(value) is expected
+
+
+def test_generator_results_are_written(make_cli):
+    """Test that yielded items are written one per line."""
+    cli = make_cli()
+
+    @cli.command(name="numbers")
+    @cli.argument("count", type=int)
+    def numbers(count):
+        yield from range(count)
+
+    @cli.command(name="words")
+    def words():
+        return ["a", "b"]
+
+    out = io.StringIO()
+    assert cli.run(["numbers", "3"], stdout=out) == 0
+    assert cli.run(["words"], stdout=out) == 0
+    assert out.getvalue() == "0\n1\n2\na\nb\n"
+
+
+def test_writes_are_coalesced():
+    """Test that many lines result in few writes."""
+    stream = CountingStream()
+    assert write_items(range(10000), stream, buffer_size=4096, flush_interval=60) == 0
+    assert stream.getvalue() == "".join(f"{i}\n" for i in range(10000))
+    assert stream.writes < 20
+
+
+def test_time_based_flush(monkeypatch):
+    """Test that lines are flushed once the interval passed."""
+    clock = iter([0.0, 0.0, 5.0, 5.0])
+    monkeypatch.setattr("cli_builder.output.time.monotonic", lambda: next(clock))
+    stream = CountingStream()
+    writer = LineWriter(stream, buffer_size=4096, flush_interval=1.0)
+
+    writer.write_line("first")
+    assert stream.getvalue() == ""
+    writer.write_line("second")
+    assert stream.getvalue() == "first\nsecond\n"
+
+
+def test_broken_pipe_stops_generator():
+    """Test that a closed reader stops and closes the producer."""
+    produced = []
+    closed = []
+
+    def items():
+        try:
+            for i in range(10**9):
+                produced.append(i)
+                yield i
+        finally:
+            closed.append(True)
+
+    stream = ClosedPipe(accept=1)
+    code = write_items(items(), stream, buffer_size=10, flush_interval=60)
+    assert code == BROKEN_PIPE_EXIT_CODE
+    assert closed == [True]
+    assert len(produced) < 100
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="requires a POSIX shell")
+def test_pipe_to_head(tmp_path):
+    """Test a real `| head` pipeline exits quickly without a traceback."""
+    script = tmp_path / "tool.py"
+    script.write_text(textwrap.dedent("""
+            import sys
+            from cli_builder import CLI
+
+            cli = CLI(name="tool")
+
+            @cli.command(name="lines")
+            def lines():
+                return (f"line {i}" for i in range(10**8))
+
+            sys.exit(cli.run())
+            """))
+    src = os.path.join(os.path.dirname(__file__), "..", "..", "src")
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(src))
+    result = subprocess.run(
+        f"{sys.executable} {script} lines | head -n 2",
+        shell=True,
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=60,
+    )
+    assert result.stdout == "line 0\nline 1\n"
+    assert result.stderr == ""
+
+
+def test_hold_open_exits_after_stream():
+    """Test that held contexts exit when the stream ends or is closed."""
+    exits = []
+
+    def held(items):
+        stack = contextlib.ExitStack()
+        stack.callback(exits.append, "exit")
+        return hold_open(iter(items), stack)
+
+    assert list(held([1, 2])) == [1, 2]
+    assert exits == ["exit"]
+
+    held([1]).close()
+    assert exits == ["exit", "exit"]
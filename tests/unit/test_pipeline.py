@@ -0,0 +1,146 @@
+"""Tests for in-process command pipelines."""
+
+import io
+
+import pytest
+
+from cli_builder.streams import redirect_output
+
+
+@pytest.fixture
+def trace():
+    """Record the order in which pipeline stages run."""
+    return []
+
+
+@pytest.fixture
+def cli(make_cli, trace):
+    """Create a CLI with extract, filter and report stages."""
+    cli = make_cli()
+
+    @cli.command(name="extract")
+    @cli.argument("count", type=int)
+    def extract(count):
+        for value in range(count):
+            trace.append(f"extract {value}")
+            yield {"value": value}
+
+    @cli.command(name="filter", consumes="rows")
+    @cli.option("min", type=int, default=0)
+    def filter_rows(rows, min=0):
+        for row in rows:
+            if row["value"] >= min:
+                yield row
+
+    @cli.command(name="report", consumes="rows")
+    def report(rows):
+        total = 0
+        for row in rows:
+            trace.append(f"report {row['value']}")
+            total += row["value"]
+        print(f"total {total}")
+        return 0
+
+    @cli.command(name="values", consumes="rows")
+    def values(rows):
+        return (row["value"] for row in rows)
+
+    return cli
+
+
+def test_pipeline_streams_items_lazily(cli, trace, run):
+    """Test that items flow through stages one at a time."""
+    code, out, _ = run(cli, "extract", "4", ":::", "filter", "--min", "2", ":::", "report")
+    assert code == 0
+    assert out == "total 5\n"
+    assert trace == [
+        "extract 0",
+        "extract 1",
+        "extract 2",
+        "report 2",
+        "extract 3",
+        "report 3",
+    ]
+
+
+def test_pipeline_prints_final_items(cli, run):
+    """Test that items returned by the last stage are printed."""
+    assert run(cli, "extract", "3", ":::", "values") == (0, "0\n1\n2\n", "")
+
+
+def test_pipeline_api(cli):
+    """Test the run_pipeline API."""
+    out = io.StringIO()
+    assert cli.run(["extract", "3", ":::", "values"], stdout=out) == 0
+
+    api_out = io.StringIO()
+    with redirect_output(stdout=api_out):
+        assert cli.run_pipeline([["extract", "3"], ["filter", "--min", "1"], ["values"]]) == 0
+    assert api_out.getvalue() == "1\n2\n"
+
+
+def test_pipeline_errors(cli, run):
+    """Test stages without pipeline input and failing stages."""
+    code, _, err = run(cli, "extract", "3", ":::", "extract", "2")
+    assert code == 1
+    assert "does not accept pipeline input" in err
+
+    code, _, err = run(cli, "extract", "3", ":::", "missing")
+    assert code == 1
+
+    @cli.command(name="broken")
+    def broken():
+        yield {"value": 1}
+        raise ValueError("stage failed")
+
+    code, out, err = run(cli, "broken", ":::", "values")
+    assert (code, out, err) == (1, "1\n", "stage failed\n")
+
+
+def test_consuming_command_needs_piped_input(cli, run):
+    """Test that a stage consuming input cannot run on its own or first."""
+    message = "Command 'values' needs piped input: run it after ':::' in a pipeline\n"
+    assert run(cli, "values") == (1, "", message)
+    assert run(cli, "values", ":::", "report") == (1, "", message)
+
+
+def test_consumed_parameter_not_an_argument(make_cli):
+    """Test that auto decorators skip the consumed parameter."""
+    cli = make_cli()
+
+    @cli.auto_arguments
+    @cli.command(name="sink", consumes="items")
+    def sink(items, label: str):
+        return 0
+
+    assert [arg["name"] for arg in cli.commands["sink"].arguments] == ["label"]
+
+
+def test_pipeline_global_options(cli, tmp_path, run):
+    """Test that whole-pipeline options of the first stage apply to the output."""
+
+    @cli.command(name="noisy", consumes="rows")
+    def noisy(rows):
+        cli.logger.info("passing rows")
+        return (row["value"] * 2 for row in rows)
+
+    target = tmp_path / "out.txt"
+    code, out, err = run(cli, "--output-file", str(target), "-v", "extract", "2", ":::", "noisy")
+    assert (code, out) == (0, "")
+    assert target.read_text() == "0\n2\n"
+    assert "passing rows" in err
+
+    code, out, err = run(cli, "--trace-memory", "extract", "2", ":::", "values")
+    assert (code, out) == (0, "0\n1\n")
+    assert "extract ::: values" in err
+
+
+def test_pipeline_rejected_options(cli, run):
+    """Test options that cannot apply to a pipeline stage."""
+    code, out, err = run(cli, "extract", "2", ":::", "--output", "json", "values")
+    assert (code, out) == (1, "")
+    assert "--output must be given before the first pipeline command" in err
+
+    code, out, err = run(cli, "--watch", ".", "extract", "2", ":::", "values")
+    assert (code, out) == (1, "")
+    assert "--watch cannot be used with ':::'" in err
@@ -0,0 +1,81 @@
+"""Tests for profiling of commands."""
+
+import pstats
+import threading
+
+import pytest
+
+from cli_builder.profiling import SamplingProfiler
+
+
+def busy(n):
+    """Burn CPU time."""
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI with a CPU-bound command."""
+    cli = make_cli()
+
+    @cli.command(name="work")
+    @cli.argument("count", type=int)
+    def work(count):
+        print(busy(count))
+
+    return cli
+
+
+def test_bare_profile_flag(cli, run):
+    """Test that a bare --profile does not take the command name."""
+    code, out, err = run(cli, "--profile", "work", "1000")
+    assert code == 0
+    assert out == f"{busy(1000)}\n"
+    assert "cumulative" in err
+    assert "busy" in err
+    # Argument parsing is not profiled
+    assert "argparse" not in err
+
+
+def test_profile_to_pstats_file(cli, tmp_path, run):
+    """Test writing a pstats file."""
+    path = tmp_path / "work.prof"
+    code, _, _ = run(cli, f"--profile={path}", "work", "1000")
+    assert code == 0
+    stats = pstats.Stats(str(path))
+    assert any(name == "busy" for _, _, name in stats.stats)
+
+
+def test_sampling_profile_to_collapsed_file(cli, tmp_path, run):
+    """Test writing collapsed stacks with the sampling profiler."""
+    path = tmp_path / "work.folded"
+    code, _, err = run(cli, f"--profile={path}", "--profiler", "sampling", "work", "3000000")
+    assert code == 0
+    lines = path.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+    assert any("busy" in line.split(";")[-1] for line in lines)
+    assert "samples every" in err
+
+
+def test_sampling_in_worker_thread():
+    """Test sampling a thread other than the main thread."""
+    profiler = SamplingProfiler(interval=0.001)
+    done = []
+
+    def target():
+        profiler.start()
+        busy(2000000)
+        profiler.stop()
+        done.append(True)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    assert done
+    assert profiler.top(1)[0][0].startswith("busy")
@@ -0,0 +1,89 @@
+"""Tests for the interactive shell."""
+
+import io
+
+import pytest
+
+from cli_builder.repl import Shell
+from cli_builder.streams import redirect_output
+
+
+@pytest.fixture
+def shell_cli(make_cli):
+    """Create a CLI with the shell enabled."""
+    cli = make_cli(version="1.0.0")
+    cli.enable_standard_commands(help=True, shell=True)
+    state = {"loads": 0, "model": None}
+
+    @cli.command(name="greet")
+    @cli.argument("name")
+    @cli.option("loud", short="l", is_flag=True)
+    def greet(name, loud=False):
+        if state["model"] is None:
+            state["loads"] += 1
+            state["model"] = object()
+        text = f"Hello, {name}!"
+        print(text.upper() if loud else text)
+        return 0
+
+    @cli.command(name="fail")
+    def fail():
+        return 4
+
+    return cli, state
+
+
+def run_shell(cli, script):
+    """Run a shell over scripted input."""
+    out = io.StringIO()
+    shell = Shell(cli, stdin=io.StringIO(script), stdout=out)
+    shell.intro = ""
+    shell.prompt = ""
+    with redirect_output(stdout=out):
+        code = shell.run()
+    return code, out.getvalue()
+
+
+def test_shell_command_registered(make_cli, shell_cli):
+    """Test that the shell standard command is opt-in."""
+    cli = make_cli()
+    cli.enable_standard_commands()
+    assert "shell" not in cli.commands
+
+    cli, _ = shell_cli
+    assert "shell" in cli.commands
+
+
+def test_shell_runs_lines_in_one_process(shell_cli):
+    """Test that lines are run as invocations sharing state."""
+    cli, state = shell_cli
+    code, output = run_shell(cli, "greet bob\n\ngreet 'Ann Lee' --loud\nfail\nexit\n")
+
+    assert "Hello, bob!" in output
+    assert "HELLO, ANN LEE!" in output
+    assert state["loads"] == 1
+    assert code == 4
+
+
+def test_shell_handles_errors(shell_cli):
+    """Test parse errors, nested shells and end of input."""
+    cli, _ = shell_cli
+    code, output = run_shell(cli, "greet 'unterminated\nshell\ngreet ok\n")
+
+    assert "Parse error" in output
+    assert "Already in the interactive shell" in output
+    assert "Hello, ok!" in output
+    assert code == 0
+
+
+def test_shell_completion(shell_cli):
+    """Test completion from the command table."""
+    cli, _ = shell_cli
+    shell = Shell(cli, stdin=io.StringIO(), stdout=io.StringIO())
+
+    assert shell.completenames("gr") == ["greet"]
+    assert "shell" not in shell.completenames("")
+    assert "exit" in shell.completenames("")
+    assert shell.completedefault("--", "greet bob --", 10, 12) == ["--loud"]
+    assert shell.completedefault("-", "greet bob -", 10, 11) == ["--loud", "-l"]
+    assert shell.completedefault("x", "unknown x", 8, 9) == []
@@ -0,0 +1,182 @@
+"""Tests for shared resources."""
+
+import io
+import threading
+import time
+
+import pytest
+
+from cli_builder.resources import ResourcePool, ResourceRegistry
+
+
+@pytest.fixture
+def events():
+    """Record resource lifecycle events."""
+    return []
+
+
+@pytest.fixture
+def cli(make_cli, events):
+    """Create a CLI with a database resource and two commands."""
+    cli = make_cli()
+
+    @cli.resource()
+    def db():
+        events.append("open")
+        yield {"rows": [1, 2, 3]}
+        events.append("close")
+
+    @cli.command(name="count")
+    def count(db):
+        print(len(db["rows"]))
+        return 0
+
+    @cli.command(name="noop")
+    def noop():
+        return 0
+
+    return cli
+
+
+def test_resource_is_lazy_and_reused(cli, events):
+    """Test lazy creation, reuse across runs and teardown."""
+    assert cli.run(["noop"]) == 0
+    assert events == []
+
+    out = io.StringIO()
+    assert cli.run(["count"], stdout=out) == 0
+    assert cli.run(["count"], stdout=out) == 0
+    assert out.getvalue() == "3\n3\n"
+    assert events == ["open"]
+
+    cli.close_resources()
+    assert events == ["open", "close"]
+
+
+def test_resource_params_are_not_options(make_cli):
+    """Test that auto decorators skip resource parameters."""
+    cli = make_cli()
+
+    @cli.resource(name="client", teardown=lambda c: None)
+    def make_client():
+        return object()
+
+    @cli.auto_command()
+    def fetch(url: str, client, retries: int = 3):
+        """Fetch a URL."""
+        return 0
+
+    command = cli.commands["fetch"]
+    assert [arg["name"] for arg in command.arguments] == ["url"]
+    assert [opt["name"] for opt in command.options] == ["retries"]
+    assert cli.run(["fetch", "http://example.com"]) == 0
+
+
+def test_teardown_callable():
+    """Test teardown of plain factory instances."""
+    closed = []
+    pool = ResourcePool("conn", lambda: object(), teardown=closed.append)
+
+    instance = pool.acquire()
+    pool.release(instance)
+    assert pool.acquire() is instance
+    pool.release(instance)
+
+    pool.close()
+    assert closed == [instance]
+    assert pool.created == 0
+
+
+def test_pool_size_limits_concurrency():
+    """Test that at most pool_size instances exist concurrently."""
+    created = []
+    pool = ResourcePool("conn", lambda: created.append(1) or len(created), size=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def worker():
+        instance = pool.acquire(timeout=5)
+        with lock:
+            active.append(instance)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(instance)
+        pool.release(instance)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 2
+    assert max(peak) <= 2
+
+
+def test_acquire_timeout_and_factory_error():
+    """Test acquisition timeouts and failing factories."""
+    pool = ResourcePool("conn", lambda: object())
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+    failing = ResourcePool("broken", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.acquire()
+    assert failing.created == 0
+
+    with pytest.raises(ValueError):
+        ResourcePool("empty", lambda: None, size=0)
+
+
+def test_streamed_result_keeps_resource(make_cli, run):
+    """Test that a generator command holds its resource until consumed."""
+    cli = make_cli()
+    peak = []
+    started = threading.Event()
+
+    @cli.resource(pool_size=1)
+    def db():
+        return {"users": 0}
+
+    def use(db):
+        db["users"] += 1
+        peak.append(db["users"])
+
+    @cli.command(name="rows")
+    def rows(db):
+        use(db)
+        started.set()
+        try:
+            for index in range(3):
+                time.sleep(0.02)
+                yield index
+        finally:
+            db["users"] -= 1
+
+    @cli.command(name="other")
+    def other(db):
+        use(db)
+        db["users"] -= 1
+
+    streaming = threading.Thread(target=run, args=(cli, "rows"))
+    streaming.start()
+    assert started.wait(5)
+    assert run(cli, "other")[0] == 0
+    streaming.join()
+
+    assert peak == [1, 1]
+
+
+def test_resources_taken_in_name_order():
+    """Test that acquisition order does not depend on parameter order."""
+    created = []
+    registry = ResourceRegistry()
+    for name in ("b", "a"):
+        registry.register(ResourcePool(name, lambda name=name: created.append(name) or name))
+
+    with registry.acquire(("b", "a")) as taken:
+        assert taken == {"a": "a", "b": "b"}
+    assert created == ["a", "b"]
@@ -0,0 +1,140 @@
+"""Tests for full-text help search."""
+
+import json
+import time
+
+import pytest
+
+from cli_builder.command import Command
+from cli_builder.search import SearchIndex, commands_key, load_index, save_index, tokenize
+
+
+@pytest.fixture
+def search_cli(make_cli, tmp_path):
+    """Create CLIs with searchable commands."""
+
+    def create(count=0):
+        cli = make_cli(state_dir=str(tmp_path))
+
+        @cli.command(name="deploy-service", description="Roll out a service to a cluster")
+        @cli.argument("service", help="Service to deploy")
+        @cli.option("region", help="Target region of the rollout")
+        def deploy_service(service, region=None):
+            pass
+
+        @cli.command(name="backup-db", description="Dump a database to object storage")
+        @cli.option("bucket", help="Storage bucket receiving the dump")
+        def backup_db(bucket=None):
+            pass
+
+        @cli.command(name="restore-db", description="Restore a database from a dump")
+        def restore_db():
+            pass
+
+        for number in range(count):
+
+            @cli.command(name=f"task-{number}", description=f"Generated task number {number}")
+            def task():
+                pass
+
+        return cli.generate_help()
+
+    return create
+
+
+def test_tokenize():
+    """Test splitting into terms."""
+    assert tokenize("deploy-service --dry_run, Region2") == [
+        "deploy",
+        "service",
+        "dry",
+        "run",
+        "region2",
+    ]
+
+
+def test_ranking():
+    """Test BM25 ranking over names and help texts."""
+    commands = [
+        Command(name="backup-db", func=lambda: None, description="Dump a database"),
+        Command(name="restore-db", func=lambda: None, description="Restore a database dump"),
+        Command(name="list", func=lambda: None, description="List commands"),
+    ]
+    index = SearchIndex.build(commands)
+    assert [name for name, _ in index.search("database dump")] == ["backup-db", "restore-db"]
+    assert index.search("restore")[0][0] == "restore-db"
+    assert [name for name, _ in index.search("comm")] == ["list"]
+    assert index.search("nothing") == []
+    assert len(index.search("db", limit=1)) == 1
+
+
+def test_help_search_command(search_cli, run):
+    """Test ``help --search``."""
+    cli = search_cli()
+    code, stdout, _ = run(cli, "help", "--search", "rollout region")
+    assert code == 0
+    assert stdout.splitlines()[0].split() == [
+        "deploy-service",
+        "-",
+        "Roll",
+        "out",
+        "a",
+        "service",
+        "to",
+        "a",
+        "cluster",
+    ]
+
+    code, stdout, stderr = run(cli, "help", "-s", "kubernetes")
+    assert (code, stdout) == (1, "")
+    assert stderr == "No commands match 'kubernetes'\n"
+
+
+def test_index_persisted_and_invalidated(search_cli, tmp_path):
+    """Test that the saved index is reused until help texts change."""
+    cli = search_cli()
+    assert cli.search_commands("bucket")[0][0] == "backup-db"
+    path = tmp_path / "help-index.json"
+    data = json.loads(path.read_text())
+
+    commands = list(cli.commands.values())
+    key = commands_key(commands)
+    assert data["key"] == key
+    assert load_index(str(path), key).search("bucket")[0][0] == "backup-db"
+    assert load_index(str(path), "other") is None
+
+    # A fresh process loads the saved index
+    other = search_cli()
+    save_index(str(path), key, SearchIndex.build(commands[:1]))
+    assert other.search_commands("bucket") == []
+
+    changed = search_cli()
+
+    @changed.command(name="bucket-sync", description="Sync a bucket")
+    def bucket_sync():
+        pass
+
+    assert changed.search_commands("bucket")[0][0] == "bucket-sync"
+
+
+def test_index_rebuilt_for_new_options(make_cli, tmp_path):
+    """Test that options added after the first search are found."""
+    cli = make_cli(state_dir=str(tmp_path))
+
+    @cli.command(name="restore", description="Restore a database")
+    def restore():
+        pass
+
+    assert cli.search_commands("snapshot") == []
+    cli.option("snapshot", help="Snapshot to restore from")(restore)
+    assert cli.search_commands("snapshot")[0][0] == "restore"
+
+
+def test_search_speed(search_cli):
+    """Test that searching thousands of commands takes milliseconds."""
+    cli = search_cli(count=1000)
+    cli.search_commands("warmup")
+    start = time.perf_counter()
+    results = cli.search_commands("database storage")
+    assert time.perf_counter() - start < 0.05
+    assert results[0][0] == "backup-db"
@@ -0,0 +1,89 @@
+"""Tests for compressed output files."""
+
+import bz2
+import gzip
+import io
+import lzma
+
+import pytest
+
+from cli_builder import sinks
+from cli_builder.sinks import BackgroundWriter, compression_for, open_output_file
+
+
+class FailingFile(io.BytesIO):
+    """Binary file failing on every write."""
+
+    def write(self, data):
+        raise OSError("No space left on device")
+
+
+@pytest.fixture
+def cli(make_cli):
+    """Create a CLI producing many lines."""
+    cli = make_cli()
+
+    @cli.command(name="numbers")
+    @cli.argument("count", type=int)
+    def numbers(count):
+        print("header")
+        return (f"line {i}" for i in range(count))
+
+    return cli
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("out.txt", None),
+        ("out.jsonl.gz", "gzip"),
+        ("out.BZ2", "bz2"),
+        ("out.xz", "lzma"),
+        ("out.lzma", "lzma"),
+        ("out.zst", "zstd"),
+    ],
+)
+def test_compression_for(path, expected):
+    """Test compression inference from extensions."""
+    assert compression_for(path) == expected
+
+
+@pytest.mark.parametrize(
+    "suffix, opener",
+    [(".txt", open), (".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)],
+)
+def test_output_file_option(cli, tmp_path, suffix, opener):
+    """Test that command output is written to a compressed file."""
+    path = tmp_path / f"out{suffix}"
+    out = io.StringIO()
+    assert cli.run(["--output-file", str(path), "numbers", "1000"], stdout=out) == 0
+    assert out.getvalue() == ""
+    with opener(path, "rt") as file:
+        assert file.read() == "header\n" + "".join(f"line {i}\n" for i in range(1000))
+
+
+def test_small_chunks_and_queue(tmp_path):
+    """Test that data is complete with a tiny chunk size and queue."""
+    path = tmp_path / "out.gz"
+    with open_output_file(str(path), chunk_size=7, queue_size=1) as writer:
+        for i in range(5000):
+            writer.write(f"{i}\n")
+    assert gzip.decompress(path.read_bytes()).decode() == "".join(f"{i}\n" for i in range(5000))
+    with pytest.raises(ValueError):
+        writer.write("closed")
+
+
+def test_writer_errors_are_reported():
+    """Test that errors of the writer thread reach the producer."""
+    writer = BackgroundWriter(FailingFile(), chunk_size=1)
+    writer.write("data")
+    with pytest.raises(OSError, match="No space"):
+        writer.close()
+
+
+def test_zstd_requires_package(cli, monkeypatch, tmp_path, capsys):
+    """Test a clear error when zstandard is missing."""
+    monkeypatch.setattr(sinks, "zstandard", None)
+    path = tmp_path / "out.zst"
+    assert cli.run(["--output-file", str(path), "numbers", "1"]) == 1
+    assert "zstandard" in capsys.readouterr().err
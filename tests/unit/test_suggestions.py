@@ -0,0 +1,128 @@
+"""Tests for did-you-mean suggestions."""
+
+import random
+import string
+
+import pytest
+
+from cli_builder.suggestions import NGramIndex, closest, did_you_mean, edit_distance
+
+
+@pytest.fixture
+def suggest_cli(make_cli):
+    """Create CLIs with a few named commands and ``count`` generated ones."""
+
+    def create(count=0):
+        cli = make_cli()
+
+        @cli.command(name="build")
+        @cli.option("target", choices=["debug", "release", "profile"])
+        @cli.option("verbose-build", is_flag=True)
+        def build(target=None, verbose_build=False):
+            pass
+
+        @cli.command(name="bundle")
+        def bundle():
+            pass
+
+        for number in range(count):
+
+            @cli.command(name=f"generated-{number:05d}")
+            def generated():
+                pass
+
+        return cli
+
+    return create
+
+
+def test_edit_distance():
+    """Test edit distances."""
+    assert edit_distance("build", "build") == 0
+    assert edit_distance("biuld", "build") == 1
+    assert edit_distance("gne", "gen") == 1
+    assert edit_distance("ca", "abc") == 3
+    assert edit_distance("bild", "build") == 1
+    assert edit_distance("", "abc") == 3
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("kitten", "sitting", limit=1) == 2
+    assert edit_distance("a", "abcdef", limit=2) == 3
+
+
+def test_index_matches_linear_scan():
+    """Test that index searches find exactly the words a full scan finds."""
+    rng = random.Random(7)
+    alphabet = string.ascii_lowercase[:6]
+    words = {"".join(rng.choices(alphabet, k=rng.randint(3, 8))) for _ in range(500)}
+    index = NGramIndex(words)
+    assert index.size == len(words)
+    for _ in range(20):
+        query = "".join(rng.choices(alphabet, k=rng.randint(3, 8)))
+        expected = sorted((edit_distance(query, word), word) for word in words)
+        assert index.search(query, 2) == [pair for pair in expected if pair[0] <= 2]
+
+
+def test_closest_and_format():
+    """Test ranking and message formatting."""
+    index = NGramIndex(["build", "bundle", "list", "help"])
+    assert closest(index, "biuld") == ["build"]
+    assert closest(index, "zzzzzz") == []
+    assert did_you_mean(["build"]) == "did you mean 'build'?"
+    assert did_you_mean(["a", "b", "c"]) == "did you mean 'a', 'b' or 'c'?"
+
+
+def test_unknown_command_suggests_without_listing(suggest_cli, run):
+    """Test that a mistyped command reports close matches only."""
+    cli = suggest_cli(count=2000)
+    code, _, stderr = run(cli, "buld")
+    assert code == 1
+    assert "argument command: invalid choice: 'buld' (did you mean 'build'?)" in stderr
+    assert "generated-00001" not in stderr
+
+    code, _, stderr = run(cli, "zzzzzzzz")
+    assert "(2002 choices, see --help)" in stderr
+    assert "generated-00001" not in stderr
+
+
+def test_invalid_option_choice(suggest_cli, run):
+    """Test suggestions for option choices."""
+    cli = suggest_cli()
+    _, _, stderr = run(cli, "build", "--target", "relase")
+    assert "invalid choice: 'relase' (did you mean 'release'?)" in stderr
+    _, _, stderr = run(cli, "build", "--target", "xxxxxxxx")
+    assert "(choose from 'debug', 'release', 'profile')" in stderr
+
+
+def test_unrecognized_options(suggest_cli, run):
+    """Test suggestions for unknown options of commands and global options."""
+    cli = suggest_cli()
+    _, _, stderr = run(cli, "build", "--verbose-biuld")
+    assert "unrecognized arguments: --verbose-biuld (did you mean '--verbose-build'?)" in stderr
+    _, _, stderr = run(cli, "--no-cahce", "build", "--target=debug")
+    assert "--no-cahce (did you mean '--no-cache'?)" in stderr
+
+
+def test_option_suggestions_by_position(suggest_cli, run):
+    """Test that only options valid where the typo appears are suggested."""
+    cli = suggest_cli()
+    _, _, stderr = run(cli, "build", "--no-cahce")
+    assert "unrecognized arguments: --no-cahce\n" in stderr
+    _, _, stderr = run(cli, "build", "--trget", "debug")
+    assert "--trget (did you mean '--target'?)" in stderr
+    _, _, stderr = run(cli, "--trget", "debug", "build")
+    assert "did you mean '--target'" not in stderr
+
+
+def test_swapped_letters(suggest_cli, run):
+    """Test that a short word with two swapped letters gets a suggestion."""
+    cli = suggest_cli()
+
+    @cli.command(name="gen")
+    def gen():
+        pass
+
+    code, _, stderr = run(cli, "gne")
+    assert code == 1
+    assert "invalid choice: 'gne' (did you mean 'gen'?)" in stderr
+    _, _, stderr = run(cli, "build", "extra")
+    assert "unrecognized arguments: extra\n" in stderr
@@ -0,0 +1,198 @@
+"""Tests for command time limits."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cli_builder import CommandTimeout, check_cancelled, on_cancel
+from cli_builder.cancellation import CancelToken, bind_token, current_token, unbind_token
+from cli_builder.timeouts import TIMEOUT_EXIT_CODE, call_with_timeout
+
+
+@pytest.fixture
+def events():
+    """Record cancellation hooks and cleanups."""
+    return []
+
+
+@pytest.fixture
+def cli(make_cli, events):
+    """Create a CLI with slow sync and async commands."""
+    cli = make_cli()
+
+    @cli.command(name="spin", timeout=0.1)
+    def spin():
+        on_cancel(lambda: events.append("hook"))
+        try:
+            while True:
+                check_cancelled()
+                time.sleep(0.01)
+        finally:
+            events.append("cleanup")
+
+    @cli.command(name="quick", timeout=5)
+    def quick():
+        print("done")
+
+    @cli.command(name="wait")
+    async def wait():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            events.append("async cleanup")
+
+    @cli.command(name="answer")
+    async def answer():
+        await asyncio.sleep(0)
+        return ["42"]
+
+    return cli
+
+
+def test_sync_timeout_on_main_thread(cli, events, run):
+    """Test the command timeout enforced with SIGALRM."""
+    start = time.monotonic()
+    code, _, err = run(cli, "spin")
+    assert code == TIMEOUT_EXIT_CODE
+    assert err == "spin: timed out\n"
+    assert events == ["hook", "cleanup"]
+    assert time.monotonic() - start < 1
+
+
+def test_sync_timeout_in_worker_thread(cli, events, run):
+    """Test the command timeout enforced by a watchdog thread."""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(run(cli, "spin")))
+    thread.start()
+    thread.join(5)
+    assert results[0][0] == TIMEOUT_EXIT_CODE
+    assert events == ["hook", "cleanup"]
+
+
+def test_global_timeout_overrides_command(cli, run):
+    """Test that --timeout takes precedence over the declared limit."""
+    assert run(cli, "--timeout", "5", "quick") == (0, "done\n", "")
+    code, _, _ = run(cli, "--timeout", "0.05", "spin")
+    assert code == TIMEOUT_EXIT_CODE
+
+
+def test_async_commands(cli, events, run):
+    """Test running async commands with and without a time limit."""
+    assert run(cli, "answer") == (0, "42\n", "")
+
+    code, _, err = run(cli, "--timeout", "0.1", "wait")
+    assert code == TIMEOUT_EXIT_CODE
+    assert err == "wait: timed out\n"
+    assert events == ["async cleanup"]
+
+
+@pytest.mark.parametrize("in_thread", [False, True])
+def test_uncooperative_code_is_interrupted(in_thread):
+    """Test that code ignoring cancellation is interrupted after the grace period."""
+    errors = []
+
+    def target():
+        try:
+            call_with_timeout(lambda: [time.sleep(0.01) for _ in range(1000)], 0.05, grace=0.05)
+        except CommandTimeout as e:
+            errors.append(e)
+
+    start = time.monotonic()
+    if in_thread:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join(5)
+    else:
+        target()
+    assert len(errors) == 1
+    assert time.monotonic() - start < 2
+
+
+def test_no_timeout_after_completion():
+    """Test that finished calls are never interrupted later."""
+    assert call_with_timeout(lambda: 7, 0.01, grace=0) == 7
+    time.sleep(0.05)
+
+
+@pytest.mark.parametrize("in_thread", [False, True])
+def test_streamed_result_is_timed(make_cli, run, in_thread):
+    """Test that the limit covers consuming a generator result."""
+    cli = make_cli()
+
+    @cli.command(name="rows", timeout=0.3)
+    def rows():
+        for index in range(15):
+            time.sleep(0.1)
+            yield index
+
+    results = []
+    start = time.monotonic()
+    if in_thread:
+        thread = threading.Thread(target=lambda: results.append(run(cli, "rows")))
+        thread.start()
+        thread.join(5)
+    else:
+        results.append(run(cli, "rows"))
+    code, out, err = results[0]
+
+    assert code == TIMEOUT_EXIT_CODE
+    assert err == "rows: timed out\n"
+    assert out.splitlines()[:2] == ["0", "1"]
+    assert len(out.splitlines()) < 5
+    assert time.monotonic() - start < 1.2
+    assert current_token() is None
+
+
+def test_pipeline_stage_is_timed(make_cli, run):
+    """Test that the limit of a stage covers the items it streams downstream."""
+    cli = make_cli()
+
+    @cli.command(name="slow", timeout=0.2)
+    def slow():
+        while True:
+            check_cancelled()
+            time.sleep(0.02)
+            yield 1
+
+    @cli.command(name="double", consumes="items", timeout=5)
+    def double(items):
+        return (item * 2 for item in items)
+
+    code, _, err = run(cli, "slow", ":::", "double")
+    assert code == TIMEOUT_EXIT_CODE
+    assert err.endswith(": timed out\n")
+    assert current_token() is None
+
+
+def test_child_token_is_detached():
+    """Test that a finished call does not stay registered on the parent token."""
+    parent = CancelToken()
+    reset = bind_token(parent)
+    try:
+        for _ in range(3):
+            assert call_with_timeout(lambda: 1, 5) == 1
+    finally:
+        unbind_token(reset)
+    assert parent._callbacks == []
+
+
+def test_watchdog_never_fires_after_return():
+    """Test calls finishing around the deadline in a thread."""
+    outcomes = []
+
+    def target():
+        for _ in range(30):
+            try:
+                outcomes.append(call_with_timeout(lambda: time.sleep(0.01) or 1, 0.01, grace=0))
+            except CommandTimeout:
+                outcomes.append("timeout")
+        time.sleep(0.05)
+        outcomes.append("done")
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join(5)
+    assert outcomes[-1] == "done"
+    assert len(outcomes) == 31
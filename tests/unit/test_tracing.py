@@ -0,0 +1,127 @@
+"""Tests for span-based tracing."""
+
+import asyncio
+import io
+import json
+import threading
+
+import pytest
+
+from cli_builder.tracing import NullSpan, Tracer
+
+
+@pytest.fixture
+def cli(make_cli, tmp_path):
+    """Create a CLI with a command using spans."""
+    cli = make_cli(state_dir=str(tmp_path))
+
+    @cli.span("step")
+    def step(number):
+        return number
+
+    @cli.command(name="work")
+    def work():
+        with cli.span("load", source="db") as span:
+            span.set_attribute("rows", step(3))
+        print("done")
+
+    return cli
+
+
+def spans_by_name(events):
+    """Index complete events by span name."""
+    return {event["name"]: event for event in events if event["ph"] == "X"}
+
+
+def test_disabled_is_noop(cli, tmp_path):
+    """Test that spans do nothing while tracing is off."""
+    assert isinstance(cli.span("anything"), NullSpan)
+    stdout = io.StringIO()
+    assert cli.run(["work"], stdout=stdout) == 0
+    assert stdout.getvalue() == "done\n"
+    cli.write_trace()
+    assert not (tmp_path / "trace.json").exists()
+
+
+def test_phases_and_nested_spans(cli, tmp_path):
+    """Test the recorded hierarchy and the written trace file."""
+    path = tmp_path / "out" / "trace.json"
+    cli.enable_tracing(str(path))
+    assert cli.run(["work"], stdout=io.StringIO()) == 0
+    cli.write_trace()
+
+    data = json.loads(path.read_text())
+    events = data["traceEvents"]
+    assert events[0] == {
+        "name": "process_name",
+        "ph": "M",
+        "pid": events[1]["pid"],
+        "args": {"name": "test-cli"},
+    }
+    spans = spans_by_name(events)
+    assert set(spans) == {"run", "parse", "execute", "load", "step"}
+    ids = {name: event["args"]["span_id"] for name, event in spans.items()}
+    assert "parent_id" not in spans["run"]["args"]
+    assert spans["parse"]["args"]["parent_id"] == ids["run"]
+    assert spans["execute"]["args"]["parent_id"] == ids["run"]
+    assert spans["load"]["args"]["parent_id"] == ids["execute"]
+    assert spans["step"]["args"]["parent_id"] == ids["load"]
+
+    assert spans["run"]["args"]["args"] == "work"
+    assert spans["execute"]["args"]["command"] == "work"
+    assert spans["execute"]["args"]["exit_code"] == 0
+    assert spans["load"]["args"]["source"] == "db"
+    assert spans["load"]["args"]["rows"] == 3
+
+    run = spans["run"]
+    for name in ("parse", "execute"):
+        assert run["ts"] <= spans[name]["ts"]
+        assert spans[name]["ts"] + spans[name]["dur"] <= run["ts"] + run["dur"]
+
+
+def test_default_path_in_state_dir(cli, tmp_path):
+    """Test that the trace is written to the state directory by default."""
+    cli.enable_tracing()
+    cli.run(["work"], stdout=io.StringIO())
+    cli.write_trace()
+    assert (tmp_path / "trace.json").exists()
+
+
+def test_errors_and_threads(tmp_path):
+    """Test error attributes and independent nesting per thread."""
+    tracer = Tracer(str(tmp_path / "trace.json"))
+
+    try:
+        with tracer.span("failing"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+
+    def worker():
+        with tracer.span("thread"):
+            pass
+
+    with tracer.span("outer"):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+    spans = spans_by_name(tracer.events)
+    assert spans["failing"]["args"]["error"] == "ValueError"
+    assert "parent_id" not in spans["thread"]["args"]
+    assert spans["thread"]["tid"] != spans["outer"]["tid"]
+
+
+def test_async_decorator(tmp_path):
+    """Test decorating a coroutine function."""
+    tracer = Tracer(str(tmp_path / "trace.json"))
+
+    @tracer.span("fetch")
+    async def fetch():
+        return 1
+
+    assert asyncio.run(fetch()) == 1
+    assert asyncio.run(fetch()) == 1
+    events = tracer.events
+    assert [event["name"] for event in events] == ["fetch", "fetch"]
+    assert events[0]["args"]["span_id"] != events[1]["args"]["span_id"]
@@ -0,0 +1,149 @@
+"""Tests for watch mode."""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from cli_builder import check_cancelled, is_cancelled
+from cli_builder.cancellation import CancelToken, CommandCancelled, raise_in_thread
+from cli_builder.watch import InotifyWatcher, PollingWatcher, WatchLoop, create_watcher
+
+WATCHERS = [lambda paths: PollingWatcher(paths, interval=0.01)]
+if sys.platform.startswith("linux"):
+    WATCHERS.append(InotifyWatcher)
+
+
+def wait_for(predicate, timeout=5.0):
+    """Wait until predicate is true."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.mark.parametrize("make_watcher", WATCHERS)
+def test_watcher_detects_changes(tmp_path, make_watcher):
+    """Test file modification and creation in watched directories."""
+    (tmp_path / "sub").mkdir()
+    target = tmp_path / "sub" / "a.txt"
+    target.write_text("a")
+    single = tmp_path / "single.txt"
+    single.write_text("s")
+    other = tmp_path / "other.txt"
+    other.write_text("o")
+
+    watcher = make_watcher([str(tmp_path / "sub"), str(single)])
+    try:
+        assert watcher.wait(0.05) == set()
+
+        target.write_text("changed")
+        assert str(target) in watcher.wait(2)
+
+        other.write_text("ignored")
+        single.write_text("changed too")
+        changed = watcher.wait(2)
+        assert str(single) in changed
+        assert str(other) not in changed
+    finally:
+        watcher.close()
+
+
+def test_create_watcher_prefers_inotify(tmp_path):
+    """Test platform watcher selection."""
+    watcher = create_watcher([str(tmp_path)])
+    try:
+        expected = InotifyWatcher if sys.platform.startswith("linux") else PollingWatcher
+        assert isinstance(watcher, expected)
+    finally:
+        watcher.close()
+
+
+def test_watch_loop_debounces_and_reruns(tmp_path):
+    """Test that a burst of changes causes a single re-run."""
+    target = tmp_path / "a.txt"
+    target.write_text("0")
+    runs = []
+    stop = threading.Event()
+
+    def execute():
+        runs.append(target.read_text())
+        return 0
+
+    loop = WatchLoop([str(tmp_path)], execute, debounce=0.2)
+    thread = threading.Thread(target=loop.run, args=(stop,))
+    thread.start()
+    try:
+        assert wait_for(lambda: len(runs) == 1)
+        for index in range(5):
+            target.write_text(str(index + 1))
+        assert wait_for(lambda: len(runs) == 2)
+        time.sleep(0.3)
+        assert runs == ["0", "5"]
+    finally:
+        stop.set()
+        thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_watch_loop_cancels_in_flight_run(tmp_path):
+    """Test that new changes cancel a run that is still in progress."""
+    target = tmp_path / "a.txt"
+    target.write_text("0")
+    events = []
+    stop = threading.Event()
+
+    def execute():
+        events.append("start")
+        for _ in range(500):
+            if is_cancelled():
+                events.append("cancelled")
+                return 130
+            time.sleep(0.01)
+        events.append("done")
+        return 0
+
+    loop = WatchLoop([str(tmp_path)], execute, debounce=0.05)
+    thread = threading.Thread(target=loop.run, args=(stop,))
+    thread.start()
+    try:
+        assert wait_for(lambda: events == ["start"])
+        target.write_text("1")
+        assert wait_for(lambda: events == ["start", "cancelled", "start"])
+    finally:
+        stop.set()
+        thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_cancel_uncooperative_thread():
+    """Test forced cancellation of code that never checks the token."""
+    caught = []
+
+    def busy():
+        try:
+            while True:
+                time.sleep(0.001)
+        except CommandCancelled:
+            caught.append(True)
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    assert raise_in_thread(thread)
+    thread.join(5)
+    assert caught == [True]
+    assert not raise_in_thread(thread)
+
+
+def test_check_cancelled_outside_invocation():
+    """Test cancellation helpers without a bound token."""
+    assert not is_cancelled()
+    check_cancelled()
+
+    token = CancelToken()
+    assert not token.wait(0)
+    token.cancel()
+    assert token.cancelled